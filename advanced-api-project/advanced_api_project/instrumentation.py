@@ -0,0 +1,184 @@
+# Byte-identical copies of this module live at:
+#   social_media_api/social_media_api/instrumentation.py
+#   advanced-api-project/advanced_api_project/instrumentation.py
+#   django_blog/django_blog/instrumentation.py
+# Apply every change to all of them.
+"""
+Per-request query, timing and size metrics.
+
+`RequestMetricsMiddleware` wraps every database connection with an execute
+wrapper for the duration of the request and records, per route (the URL
+name): SQL query count, total DB time, render time (DRF/template rendering,
+i.e. turning the serialized data into bytes), total time and response size.
+
+- With `REQUEST_SERVER_TIMING` (default: DEBUG) the numbers are sent back as a
+  `Server-Timing` header, which browser dev tools show next to the request.
+- The last `REQUEST_METRICS_WINDOW` samples per route are kept in memory;
+  `request_stats.snapshot()` gives p50/p95/p99 for each route.
+- `REQUEST_BUDGETS` maps route names (or '*') to limits such as
+  `{'queries': 10, 'db_ms': 50}`. A request over budget is logged, or raises
+  QueryBudgetExceeded with `REQUEST_BUDGET_ACTION = 'raise'` (for tests/CI).
+- Single queries slower than `SLOW_QUERY_MS` are logged with their SQL.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('queries', 'db_ms', 'render_ms', 'total_ms', 'bytes')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+
+    def __init__(self, slow_ms=None):
+        self.count = 0
+        self.seconds = 0.0
+        self.slow_ms = slow_ms
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            if self.slow_ms is not None and elapsed * 1000 >= self.slow_ms:
+                logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, sql)
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile of an already sorted list.
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+class RequestStats:
+    """
+    Rolling per-route samples; thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, route, sample):
+        window = getattr(settings, 'REQUEST_METRICS_WINDOW', 1000)
+        with self._lock:
+            samples = self._samples.get(route)
+            if samples is None or samples.maxlen != window:
+                samples = self._samples[route] = deque(samples or (), maxlen=window)
+            samples.append(sample)
+
+    def percentiles(self, route, fractions=(0.5, 0.95, 0.99)):
+        """
+        {metric: {'p50': ..., 'p95': ..., 'p99': ...}} for `route`.
+        """
+        with self._lock:
+            samples = list(self._samples.get(route, ()))
+        if not samples:
+            return {}
+        result = {'count': len(samples)}
+        for metric in METRICS:
+            values = sorted(sample[metric] for sample in samples)
+            result[metric] = {f'p{round(fraction * 100)}': percentile(values, fraction) for fraction in fractions}
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            routes = list(self._samples)
+        return {route: self.percentiles(route) for route in routes}
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+request_stats = RequestStats()
+
+
+def over_budget(route, sample):
+    """
+    Human-readable list of the limits `sample` exceeds for `route`.
+    """
+    budgets = getattr(settings, 'REQUEST_BUDGETS', {})
+    budget = budgets.get(route, budgets.get('*', {}))
+    return [
+        f'{metric} {sample[metric]:g} > {limit:g}'
+        for metric, limit in budget.items()
+        if sample.get(metric, 0) > limit
+    ]
+
+
+def server_timing(sample):
+    return ', '.join([
+        f'db;dur={sample["db_ms"]:.1f};desc="{sample["queries"]} queries"',
+        f'render;dur={sample["render_ms"]:.1f}',
+        f'total;dur={sample["total_ms"]:.1f}',
+        f'size;desc="{sample["bytes"]} bytes"',
+    ])
+
+
+class RequestMetricsMiddleware:
+    """
+    Put this first in MIDDLEWARE so the numbers cover the whole stack.
+
+    Sync-only; Django adapts around it under ASGI. Streaming responses are
+    sent after the middleware has finished, so only their setup is timed.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder(getattr(settings, 'SLOW_QUERY_MS', None))
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        match = request.resolver_match
+        if match is None:
+            return response
+        route = match.view_name or match.route
+        sample = {
+            'queries': recorder.count,
+            'db_ms': recorder.seconds * 1000,
+            'render_ms': getattr(request, '_metrics_render_seconds', 0.0) * 1000,
+            'total_ms': total * 1000,
+            'bytes': 0 if response.streaming else len(response.content),
+        }
+        request_stats.record(route, sample)
+        if getattr(settings, 'REQUEST_SERVER_TIMING', settings.DEBUG):
+            response['Server-Timing'] = server_timing(sample)
+
+        problems = over_budget(route, sample)
+        if problems:
+            message = f'{request.method} {request.path} ({route}) over budget: {", ".join(problems)}'
+            if getattr(settings, 'REQUEST_BUDGET_ACTION', 'log') == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_template_response(self, request, response):
+        # Runs right before Django renders the response; DRF Responses and
+        # TemplateResponses both go through here.
+        start = time.perf_counter()
+
+        def rendered(response):
+            request._metrics_render_seconds = time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
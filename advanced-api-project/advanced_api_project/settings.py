@@ -53,6 +53,7 @@ REST_FRAMEWORK = {
 
 
 MIDDLEWARE = [
+    'advanced_api_project.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -133,3 +134,30 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Request metrics (advanced_api_project.instrumentation): Server-Timing headers,
+# in-memory percentiles over the last REQUEST_METRICS_WINDOW requests per
+# route, and per-route budgets, e.g. {'author-list': {'queries': 10, 'db_ms': 50}}.
+# REQUEST_BUDGET_ACTION is 'log' or 'raise'.
+REQUEST_SERVER_TIMING = DEBUG
+REQUEST_METRICS_WINDOW = 1000
+REQUEST_BUDGETS = {}
+REQUEST_BUDGET_ACTION = 'log'
+SLOW_QUERY_MS = 200
+
+# In-process inverted index for ?search= on BookListView (api.inverted_index).
+# Off by default: each worker holds its own copy, and writes from other workers
+# appear after `manage.py build_search_index` refreshes the shared snapshot.
+SEARCH_INDEX_ENABLED = False
+SEARCH_INDEX_DIR = BASE_DIR / 'search_index'
+SEARCH_INDEX_MAX_RESULTS = 1000
+
+# Largest list accepted by the bulk book endpoint (api.views.BookBulkView).
+BULK_MAX_ITEMS = 10000
+
+# Rows fetched and sent per chunk by the streaming exports (api.export).
+EXPORT_CHUNK_SIZE = 2000
+
+# Most recent books nested in each author (api.serializers.AuthorSerializer);
+# `books_count` has the full number.
+AUTHOR_BOOKS_LIMIT = 20
@@ -0,0 +1,26 @@
+# Byte-identical copies of this module live at:
+#   social_media_api/posts/filters.py
+#   advanced-api-project/api/filters.py
+# Apply every change to all of them.
+from django.conf import settings
+from rest_framework import filters
+
+
+class InvertedIndexSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter that looks `?search=` up in the view's `search_index` (an
+    inverted_index.ModelIndex) instead of OR-ing icontains over
+    `search_fields`.
+
+    Only the best SEARCH_INDEX_MAX_RESULTS matches are kept; the view's own
+    ordering and pagination apply to them as usual. Without an index, or with
+    SEARCH_INDEX_ENABLED off, this is plain SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        index = getattr(view, 'search_index', None)
+        terms = self.get_search_terms(request)
+        if index is None or not terms or not getattr(settings, 'SEARCH_INDEX_ENABLED', False):
+            return super().filter_queryset(request, queryset, view)
+        ids = index.search(' '.join(terms), 0, getattr(settings, 'SEARCH_INDEX_MAX_RESULTS', 1000))
+        return queryset.filter(pk__in=ids)
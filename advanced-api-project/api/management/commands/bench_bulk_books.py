@@ -0,0 +1,80 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.models import Author, Book
+from api.views import BookBulkView, BookCreateView, BookDeleteView, BookUpdateView
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare creating, updating and deleting books one request at a time with the bulk endpoint. "
+        "Views are called directly (no middleware); everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=10000, help="Books per run.")
+
+    def timed(self, func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+    def call(self, view, method, user, data, **kwargs):
+        request = getattr(self.factory, method)('/', data, format='json')
+        force_authenticate(request, user=user)
+        response = view(request, **kwargs)
+        assert response.status_code < 300, response.data
+        return response
+
+    def single(self, user, author, count):
+        create = BookCreateView.as_view()
+        update = BookUpdateView.as_view()
+        delete = BookDeleteView.as_view()
+        ids = []
+        results = {}
+        results['create'] = self.timed(lambda: ids.extend(
+            self.call(create, 'post', user, {'title': f"Book {i}", 'publication_year': 2000, 'author': author.pk}).data['id']
+            for i in range(count)
+        ))
+        results['update'] = self.timed(
+            lambda: [self.call(update, 'patch', user, {'publication_year': 2001}, pk=pk) for pk in ids]
+        )
+        results['delete'] = self.timed(lambda: [self.call(delete, 'delete', user, None, pk=pk) for pk in ids])
+        return results
+
+    def bulk(self, user, author, count):
+        view = BookBulkView.as_view()
+        ids = []
+        results = {}
+        results['create'] = self.timed(lambda: ids.extend(book['id'] for book in self.call(
+            view, 'post', user, [{'title': f"Book {i}", 'publication_year': 2000, 'author': author.pk} for i in range(count)]
+        ).data))
+        results['update'] = self.timed(lambda: self.call(
+            view, 'patch', user, [{'id': pk, 'publication_year': 2001} for pk in ids]
+        ))
+        results['delete'] = self.timed(lambda: self.call(view, 'delete', user, {'ids': ids}))
+        return results
+
+    def handle(self, *args, **options):
+        count = options['books']
+        self.factory = APIRequestFactory()
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(username='bench-bulk-books')
+            author = Author.objects.create(name="Bench Author")
+            single = self.single(user, author, count)
+            bulk = self.bulk(user, author, count)
+            assert not Book.objects.filter(author=author).exists()
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{count} books:")
+        for operation in ('create', 'update', 'delete'):
+            self.stdout.write(
+                f"  {operation:<7} single {single[operation] * 1000:9.1f} ms   bulk {bulk[operation] * 1000:9.1f} ms"
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"  {operation}: bulk is {single[operation] / bulk[operation]:.1f}x faster"
+            ))
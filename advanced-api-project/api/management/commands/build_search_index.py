@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.search import book_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the in-process book search index and write its snapshot.'
+
+    def handle(self, *args, **options):
+        count = book_index.rebuild()
+        self.stdout.write(f'Indexed {count} books into {book_index.path or "memory only"}.')
@@ -0,0 +1,145 @@
+import csv
+import io
+import json
+import sys
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import Author, Book
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream books from a CSV or NDJSON file (or - for stdin) into the database in batches. "
+        "Rows need title, publication_year and author (the author's name); an optional id column "
+        "keeps the book's id, so re-running an import skips the rows already loaded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or - for stdin.")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="Defaults to the file extension, else csv.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Books per bulk_create.")
+        parser.add_argument('--progress-every', type=int, default=100000, help="Report throughput every N rows.")
+
+    def read_rows(self, handle, fmt):
+        """
+        Yield (row number, row); NDJSON lines that aren't valid JSON are skipped here.
+        """
+        if fmt == 'ndjson':
+            rows = (line for line in handle if line.strip())
+        else:
+            rows = csv.DictReader(handle)
+        for number, row in enumerate(rows, 1):
+            self.rows_read = number
+            if fmt == 'ndjson':
+                try:
+                    row = json.loads(row)
+                except json.JSONDecodeError as error:
+                    self.skipped += 1
+                    self.stderr.write(f"Skipped row {number}: {error!r}")
+                    continue
+            yield number, row
+
+    def batches(self, rows, size):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def resolve_authors(self, names):
+        """
+        Fill self.author_ids for `names`, creating the authors that don't exist.
+        """
+        missing = {name for name in names if name not in self.author_ids}
+        if not missing:
+            return
+        # Author names aren't unique; the oldest author with a name wins.
+        for pk, name in Author.objects.filter(name__in=missing).order_by('-pk').values_list('pk', 'name'):
+            self.author_ids[name] = pk
+        created = Author.objects.bulk_create([Author(name=name) for name in missing - self.author_ids.keys()])
+        for author in created:
+            self.author_ids[author.name] = author.pk
+        self.authors_created += len(created)
+
+    def build(self, row, number):
+        try:
+            title = row['title']
+            year = int(row['publication_year'])
+            author = row['author']
+        except (KeyError, TypeError, ValueError) as error:
+            raise ValueError(f"row {number}: {error!r}")
+        if not isinstance(title, str) or not isinstance(author, str) or not title or not author:
+            raise ValueError(f"row {number}: title and author are required")
+        if year > self.current_year:
+            raise ValueError(f"row {number}: publication_year cannot be in the future")
+        book = Book(title=title, publication_year=year)
+        book.author_name = author
+        if row.get('id') not in (None, ''):
+            book.pk = int(row['id'])
+        return book
+
+    def import_batch(self, batch):
+        """
+        Write one batch of (row number, row); returns how many books were inserted.
+        """
+        books = []
+        for number, row in batch:
+            try:
+                books.append(self.build(row, number))
+            except ValueError as error:
+                self.skipped += 1
+                self.stderr.write(f"Skipped {error}")
+        with transaction.atomic():
+            self.resolve_authors({book.author_name for book in books})
+            for book in books:
+                book.author_id = self.author_ids[book.author_name]
+            # ignore_conflicts skips rows whose id already exists; count those first.
+            ids = [book.pk for book in books if book.pk is not None]
+            present = set(Book.objects.filter(pk__in=ids).values_list('pk', flat=True)) if ids else set()
+            Book.objects.bulk_create(books, batch_size=self.batch_size, ignore_conflicts=True)
+        return len(books) - len(ids) + len(set(ids) - present)
+
+    def handle(self, *args, **options):
+        path, self.batch_size = options['path'], options['batch_size']
+        if self.batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        self.author_ids = {}
+        self.authors_created = self.skipped = self.rows_read = 0
+        self.current_year = date.today().year
+
+        if path == '-':
+            handle = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+        else:
+            try:
+                handle = open(path, encoding='utf-8', newline='')
+            except OSError as error:
+                raise CommandError(error)
+
+        inserted, start, next_report = 0, time.perf_counter(), options['progress_every']
+        with handle:
+            for batch in self.batches(self.read_rows(handle, fmt), self.batch_size):
+                inserted += self.import_batch(batch)
+                read = self.rows_read
+                if read >= next_report:
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(f"{read} rows in {elapsed:.1f} s ({read / elapsed:.0f} rows/s)")
+                    next_report += options['progress_every']
+
+        elapsed = time.perf_counter() - start
+        read = self.rows_read
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {read} rows in {elapsed:.1f} s ({read / elapsed if elapsed else 0:.0f} rows/s): "
+            f"{inserted} books and {self.authors_created} authors created, "
+            f"{read - inserted - self.skipped} already present, {self.skipped} skipped."
+        ))
+        if getattr(settings, 'SEARCH_INDEX_ENABLED', False):
+            self.stdout.write("Run build_search_index to add the new books to the search index.")
@@ -6,6 +6,7 @@ class Author(models.Model):
 
     Fields:
     - name: CharField to store the author's full name.
+    - updated_at: DateTimeField set on every save; used for API ETags.
 
     Relationship:
     - One author can have many books (one-to-many). The Book model will declare
@@ -13,6 +14,7 @@ class Author(models.Model):
     """
 
     name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -26,6 +28,7 @@ class Book(models.Model):
     - title: CharField holding the title of the book.
     - publication_year: IntegerField for the year the book was published.
     - author: ForeignKey to Author establishing a one-to-many relationship.
+    - updated_at: DateTimeField set on every save; used for API ETags.
 
     Notes:
     - `author` uses `on_delete=models.CASCADE` to remove books when an author is deleted.
@@ -35,6 +38,15 @@ class Book(models.Model):
     title = models.CharField(max_length=500)
     publication_year = models.IntegerField()
     author = models.ForeignKey(Author, related_name='books', on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # BookListView filters on publication_year and/or title and
+            # orders by title.
+            models.Index(fields=['publication_year', 'title'], name='api_book_year_title_idx'),
+            models.Index(fields=['title'], name='api_book_title_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.publication_year})"
@@ -0,0 +1,15 @@
+"""
+Inverted-index search over books (see api.inverted_index).
+
+Used by InvertedIndexSearchFilter on BookListView when SEARCH_INDEX_ENABLED
+is on; otherwise the view keeps DRF's icontains SearchFilter.
+"""
+from .inverted_index import ModelIndex
+from .models import Book
+
+
+def book_document(book):
+    return [(book.title, 3), (book.author.name, 1)]
+
+
+book_index = ModelIndex(Book, book_document, 'books', queryset=Book.objects.select_related('author'))
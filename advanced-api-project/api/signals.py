@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Author
+from .search import book_index
+
+# Keep the in-process search index (api.search) current.
+book_index.connect()
+
+
+@receiver(post_save, sender=Author)
+def reindex_author_books(sender, instance, raw=False, **kwargs):
+    # Books are indexed with their author's name.
+    if not raw and book_index.loaded:
+        for book in instance.books.all():
+            book_index.update(book)
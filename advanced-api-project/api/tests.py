@@ -1,3 +1,380 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from advanced_api_project.instrumentation import request_stats
+
+from .models import Author, Book
+from .query_planning import plan_queryset
+from .search import book_index
+from .serializers import AuthorSerializer
+
+
+class ConstantQueryCountMixin:
+    """
+    TestCase mixin: assert a list endpoint does not issue N+1 queries.
+    """
+
+    def assertListQueriesConstant(self, url, add_rows, sizes=(1, 5)):
+        """
+        `add_rows(n)` must create `n` more rows that `url` lists. The endpoint
+        is fetched with 1 and then 5 rows (by default) on the page and must
+        issue the same number of queries both times.
+        """
+        counts, created = [], 0
+        for size in sizes:
+            add_rows(size - created)
+            created = size
+            separator = '&' if '?' in url else '?'
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(f'{url}{separator}page_size={size}')
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(context.captured_queries))
+        if len(set(counts)) > 1:
+            queries = '\n'.join(query['sql'] for query in context.captured_queries)
+            self.fail(f'{url} issued {counts} queries for {list(sizes)} rows:\n{queries}')
+
+
+class IndexUsageMixin:
+    """
+    TestCase mixin: assert a query is answered from an index (SQLite).
+    """
+
+    def assertUsesIndex(self, queryset, index, ordered=True):
+        """
+        `queryset` must read its table through `index` (a regular expression
+        matched against the index name) and, with `ordered`, return rows in
+        index order without a temporary sort.
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN checks are written for SQLite')
+        plan = queryset.explain()
+        self.assertRegex(plan, rf'(SEARCH|SCAN) \S+ USING (COVERING )?INDEX {index}\b', plan)
+        if ordered:
+            self.assertNotIn('TEMP B-TREE', plan, plan)
+
+
+class QueryPlanningTestCase(ConstantQueryCountMixin, TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def add_authors(self, count):
+        for _ in range(count):
+            author = Author.objects.create(name="a")
+            Book.objects.create(title="b1", publication_year=2000, author=author)
+            Book.objects.create(title="b2", publication_year=2001, author=author)
+
+    def test_author_list_prefetches_books(self):
+        self.assertListQueriesConstant('/api/authors/', self.add_authors)
+
+    def test_planned_queryset_serializes_without_extra_queries(self):
+        self.add_authors(3)
+        authors = list(plan_queryset(Author.objects.all(), AuthorSerializer))
+        with self.assertNumQueries(0):
+            data = AuthorSerializer(authors, many=True).data
+        self.assertEqual(len(data[0]['books']), 2)
+
+    def test_expanded_author_list_is_constant_and_capped(self):
+        self.assertListQueriesConstant('/api/authors/?expand=books', self.add_authors)
+
+        author = Author.objects.create(name="prolific")
+        field = AuthorSerializer().fields['books']
+        Book.objects.bulk_create(
+            [Book(title=f"b{i}", publication_year=1900 + i, author=author) for i in range(field.limit + 5)]
+        )
+        data = self.client.get(f'/api/authors/{author.pk}/?expand=books').json()
+        self.assertEqual(data['books_count'], field.limit + 5)
+        self.assertEqual(len(data['books']), field.limit)
+        self.assertEqual(data['books'][0]['publication_year'], 1900 + field.limit + 4)
+        # Unplanned instances are capped and counted too.
+        self.assertEqual(AuthorSerializer(author).data['books'], data['books'])
+        self.assertEqual(AuthorSerializer(author).data['books_count'], field.limit + 5)
+
+    def test_books_are_only_nested_on_request(self):
+        self.add_authors(2)
+        data = self.client.get('/api/authors/').json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['results'][0], {'id': data['results'][0]['id'], 'name': "a", 'books_count': 2})
+
+
+@override_settings(REQUEST_SERVER_TIMING=True, REQUEST_BUDGETS={})
+class RequestMetricsTestCase(TestCase):
+
+    def setUp(self):
+        request_stats.clear()
+
+    def test_server_timing_header_and_percentiles(self):
+        response = self.client.get('/api/authors/')
+        self.assertIn('queries', response['Server-Timing'])
+        self.assertEqual(request_stats.percentiles('author-list')['count'], 1)
+
+
+class InvertedIndexSearchTestCase(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(SEARCH_INDEX_ENABLED=True, SEARCH_INDEX_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        book_index.reset()
+        self.addCleanup(book_index.reset)
+        self.author = Author.objects.create(name="Ursula Le Guin")
+        self.book = Book.objects.create(title="The Dispossessed", publication_year=1974, author=self.author)
+
+    def search(self, query):
+        response = self.client.get('/api/books/', {'search': query})
+        return [row['id'] for row in response.data]
+
+    def test_search_by_title_and_author(self):
+        self.assertEqual(self.search('dispos'), [self.book.pk])
+        self.assertEqual(self.search('guin'), [self.book.pk])
+        self.assertEqual(self.search('tolkien'), [])
+
+    def test_books_route_is_filtered(self):
+        other = Book.objects.create(title="Lathe of Heaven", publication_year=1971, author=self.author)
+        self.assertEqual(self.search('lathe'), [other.pk])
+        response = self.client.get('/api/books/', {'publication_year': 1974})
+        self.assertEqual([row['id'] for row in response.data], [self.book.pk])
+        response = self.client.get('/api/books/', {'ordering': 'publication_year'})
+        self.assertEqual([row['id'] for row in response.data], [other.pk, self.book.pk])
+
+    def test_author_rename_reindexes_books(self):
+        self.search('guin')
+        self.author.name = "U. K. Le Guin"
+        self.author.save()
+        self.assertEqual(self.search('ursula'), [])
+        self.assertEqual(self.search('guin'), [self.book.pk])
+
+
+class ConditionalGetTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.author = Author.objects.create(name="Ursula")
+        self.book = Book.objects.create(title="The Dispossessed", publication_year=1974, author=self.author)
+
+    def assertNotModified(self, url, etag):
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def etag(self, url):
+        response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_unchanged_list_and_detail_return_304(self):
+        for url in ('/api/authors/', f'/api/authors/{self.author.pk}/', '/api/books/', f'/api/books/{self.book.pk}/'):
+            self.assertNotModified(url, self.etag(url))
+
+    def test_etag_follows_nested_books(self):
+        url = '/api/authors/'
+        etag = self.etag(url)
+        book = Book.objects.create(title="Always Coming Home", publication_year=1985, author=self.author)
+        self.assertNotEqual(self.etag(url), etag)
+
+        etag = self.etag(url)
+        book.title = "Always Coming Home (2019)"
+        book.save()
+        self.assertNotEqual(self.etag(url), etag)
+
+        etag = self.etag(url)
+        book.delete()
+        self.assertNotEqual(self.etag(url), etag)
+
+    def test_author_pages_are_fingerprinted_separately(self):
+        Author.objects.bulk_create([Author(name=f"Author {i}") for i in range(3)])
+        url = '/api/authors/?page_size=2'
+        etag = self.etag(url)
+        self.assertNotModified(url, etag)
+
+        # Page 2 changed, and only the page count moved on page 1.
+        last = Author.objects.order_by('pk').last()
+        last.name = "Renamed"
+        last.save()
+        self.assertEqual(self.etag(url), etag)
+        Author.objects.create(name="New")
+        self.assertNotEqual(self.etag(url), etag)
+
+    def test_deleting_a_row_on_the_page_changes_the_etag(self):
+        Author.objects.bulk_create([Author(name=f"Author {i}") for i in range(3)])
+        url = '/api/authors/?page_size=2'
+        etag = self.etag(url)
+        Author.objects.order_by('pk')[1].delete()
+        Author.objects.create(name="Refill")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_query_parameters(self):
+        self.assertNotEqual(self.etag('/api/books/'), self.etag('/api/books/?page=2'))
+
+    def test_missing_detail_is_still_404(self):
+        self.assertEqual(self.client.get('/api/books/999/', HTTP_IF_NONE_MATCH='"x"').status_code, 404)
+
+
+class BookBulkTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="editor"))
+        self.author = Author.objects.create(name="Iain")
+        self.url = '/api/books/bulk/'
+
+    def test_create_validates_in_one_pass_and_writes_all_or_nothing(self):
+        books = [{'title': f"Book {i}", 'publication_year': 1990 + i, 'author': self.author.pk} for i in range(5)]
+        # One query for the authors, one INSERT, plus the transaction.
+        with self.assertNumQueries(4):
+            response = self.client.post(self.url, books, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([book['title'] for book in response.data], [book['title'] for book in books])
+        self.assertTrue(all(book['id'] for book in response.data))
+
+        response = self.client.post(self.url, [
+            {'title': "Fine", 'publication_year': 2000, 'author': self.author.pk},
+            {'title': "Future", 'publication_year': 3000, 'author': self.author.pk},
+            {'title': "Nobody's", 'publication_year': 2000, 'author': 999},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {1, 2})
+        self.assertIn('publication_year', response.data[1])
+        self.assertIn('author', response.data[2])
+        self.assertEqual(Book.objects.count(), 5)
+
+    def test_update_and_delete(self):
+        books = Book.objects.bulk_create(
+            [Book(title=f"Book {i}", publication_year=2000, author=self.author) for i in range(4)]
+        )
+        response = self.client.patch(self.url, [
+            {'id': books[0].pk, 'title': "Renamed"},
+            {'id': books[1].pk, 'publication_year': 2010},
+            {'id': books[2].pk, 'publication_year': 2010},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(Book.objects.order_by('pk').values_list('title', 'publication_year')),
+            [("Renamed", 2000), ("Book 1", 2010), ("Book 2", 2010), ("Book 3", 2000)],
+        )
+
+        response = self.client.patch(self.url, [{'id': books[0].pk, 'title': "x"}, {'id': 999, 'title': "y"}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('id', response.data[1])
+        self.assertEqual(Book.objects.get(pk=books[0].pk).title, "Renamed")
+
+        response = self.client.delete(self.url, {'ids': [books[0].pk, 999]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['missing'], [999])
+        response = self.client.delete(self.url, {'ids': [books[0].pk, books[1].pk]}, format='json')
+        self.assertEqual(response.data, {'deleted': 2})
+        self.assertEqual(Book.objects.count(), 2)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.le_guin = Author.objects.create(name="Ursula, K.")
+        self.banks = Author.objects.create(name="Iain")
+        self.lathe = Book.objects.create(title="Lathe", publication_year=1971, author=self.le_guin)
+        Book.objects.create(title="Excession", publication_year=1996, author=self.banks)
+        self.dispossessed = Book.objects.create(title="Dispossessed", publication_year=1974, author=self.le_guin)
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_is_the_default_and_follows_list_filters(self):
+        response = self.client.get('/api/books/export/', {'author': self.le_guin.pk, 'ordering': '-publication_year'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual(lines, [
+            {'id': self.dispossessed.pk, 'title': "Dispossessed", 'publication_year': 1974, 'author': self.le_guin.pk},
+            {'id': self.lathe.pk, 'title': "Lathe", 'publication_year': 1971, 'author': self.le_guin.pk},
+        ])
+
+    def test_csv(self):
+        response = self.client.get('/api/books/export/?format=csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="books.csv"')
+        rows = list(csv.reader(io.StringIO(self.content(response))))
+        self.assertEqual(rows[0], ['id', 'title', 'publication_year', 'author'])
+        self.assertEqual([row[1] for row in rows[1:]], ["Dispossessed", "Excession", "Lathe"])
+
+        response = self.client.get('/api/authors/export/', HTTP_ACCEPT='text/csv')
+        self.assertEqual(
+            self.content(response), f'id,name\r\n{self.le_guin.pk},"Ursula, K."\r\n{self.banks.pk},Iain\r\n'
+        )
+
+    def test_empty_csv_has_header(self):
+        response = self.client.get('/api/books/export/?format=csv&publication_year=1800')
+        self.assertEqual(self.content(response), 'id,title,publication_year,author\r\n')
+
+
+class ImportBooksTestCase(TestCase):
+
+    def run_import(self, content, suffix):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as handle:
+            handle.write(content)
+        self.addCleanup(os.unlink, handle.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_books', handle.name, batch_size=2, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_resolves_authors_and_skips_bad_rows(self):
+        existing = Author.objects.create(name="Iain")
+        out, err = self.run_import(
+            'title,publication_year,author\n'
+            'Excession,1996,Iain\n'
+            'Lathe,1971,Ursula\n'
+            'Future,3000,Ursula\n'
+            'Dispossessed,1974,Ursula\n',
+            '.csv',
+        )
+        self.assertIn("3 books and 1 authors created", out)
+        self.assertIn("row 3", err)
+        self.assertEqual(Book.objects.get(title="Excession").author, existing)
+        self.assertEqual(Author.objects.get(name="Ursula").books.count(), 2)
+
+    def test_ndjson_import_with_ids_is_repeatable(self):
+        author = Author.objects.create(name="Ursula")
+        content = ''.join(
+            json.dumps({'id': pk, 'title': f"Book {pk}", 'publication_year': 1970, 'author': "Ursula"}) + '\n'
+            for pk in (10, 11, 12)
+        )
+        self.run_import(content, '.ndjson')
+        out, _ = self.run_import(content, '.ndjson')
+        self.assertIn("0 books and 0 authors created, 3 already present", out)
+        self.assertEqual(sorted(author.books.values_list('pk', flat=True)), [10, 11, 12])
+
+    def test_malformed_ndjson_line_is_skipped(self):
+        out, err = self.run_import(
+            json.dumps({'id': 10, 'title': "Book 10", 'publication_year': 1970, 'author': "Ursula"}) + '\n'
+            + '{"title": "Broken",\n'
+            + json.dumps({'id': 10, 'title': "Again", 'publication_year': 1970, 'author': "Ursula"}) + '\n'
+            + json.dumps({'title': "Book 11", 'publication_year': 1971, 'author': "Ursula"}) + '\n',
+            '.ndjson',
+        )
+        self.assertIn("Skipped row 2:", err)
+        self.assertIn("Read 4 rows", out)
+        self.assertIn("2 books and 1 authors created, 1 already present, 1 skipped", out)
+        self.assertEqual(Book.objects.count(), 2)
+
+
+class IndexUsageTestCase(IndexUsageMixin, TestCase):
+
+    def test_book_list_filters_and_ordering(self):
+        self.assertUsesIndex(Book.objects.filter(publication_year=2000).order_by('title'), 'api_book_year_title_idx')
+        self.assertUsesIndex(Book.objects.filter(title="Lathe"), 'api_book_title_idx')
+        self.assertUsesIndex(Book.objects.order_by('title')[:20], 'api_book_title_idx')
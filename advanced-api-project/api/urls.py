@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     BookListView, BookDetailView, BookCreateView,
     BookUpdateView, BookDeleteView,
+    BookBulkView, BookExportView, AuthorExportView,
     AuthorViewSet, BookViewSet
 )
 
@@ -11,6 +12,10 @@ router.register(r'authors', AuthorViewSet, basename='author')
 router.register(r'books', BookViewSet, basename='book')
 
 urlpatterns = [
+    # Before the router, whose <pk>/ routes would match bulk/ and export/.
+    path('books/bulk/', BookBulkView.as_view(), name='book-bulk'),
+    path('books/export/', BookExportView.as_view(), name='book-export'),
+    path('authors/export/', AuthorExportView.as_view(), name='author-export'),
     path('', include(router.urls)),
     path('books/', BookListView.as_view(), name='book-list'),
     path('books/<int:pk>/', BookDetailView.as_view(), name='book-detail'),
@@ -1,71 +1,226 @@
 from django.shortcuts import render
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
 from rest_framework import viewsets
 from .models import Author, Book
-from .serializers import AuthorSerializer, BookSerializer
+from .serializers import AuthorSerializer, AuthorSummarySerializer, BookSerializer
 from django_filters import rest_framework
 from rest_framework import filters
 from rest_framework import generics, permissions
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework import status
+from .query_planning import QueryPlanMixin
+from .conditional import ConditionalGetMixin
+from .filters import InvertedIndexSearchFilter
+from .search import book_index
+from .export import CSVRenderer, NDJSONRenderer, export_response
 
 
 
-class AuthorViewSet(viewsets.ModelViewSet):
-    queryset = Author.objects.all()
+class AuthorPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class AuthorViewSet(ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
+    """
+    Authors with `books_count`; `?expand=books` adds each author's most
+    recent books (capped, see AuthorSerializer). Either way a page costs a
+    fixed number of queries.
+    """
+    queryset = Author.objects.order_by('pk')
     serializer_class = AuthorSerializer
+    pagination_class = AuthorPagination
 
+    def get_serializer_class(self):
+        expand = self.request.query_params.get('expand', '').split(',')
+        if self.request.method in SAFE_METHODS and 'books' not in expand:
+            return AuthorSummarySerializer
+        return AuthorSerializer
+    # Authors are serialized with their books, so those count too.
+    etag_aggregates = {
+        'updated': Max('updated_at'),
+        'count': Count('pk', distinct=True),
+        'books_updated': Max('books__updated_at'),
+        'books': Count('books'),
+    }
 
-class BookViewSet(viewsets.ModelViewSet):
-    queryset = Book.objects.all()
-    serializer_class = BookSerializer
 
 # List all books — public access
-class BookListView(generics.ListAPIView):
+class BookListView(ConditionalGetMixin, QueryPlanMixin, generics.ListAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [permissions.AllowAny]
 
 # Retrieve a single book — public access
-class BookDetailView(generics.RetrieveAPIView):
+class BookDetailView(ConditionalGetMixin, QueryPlanMixin, generics.RetrieveAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [permissions.AllowAny]
 
 # Create a book — authenticated users only
-class BookCreateView(generics.CreateAPIView):
+class BookCreateView(QueryPlanMixin, generics.CreateAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 # Update a book — authenticated users only
-class BookUpdateView(generics.UpdateAPIView):
+class BookUpdateView(QueryPlanMixin, generics.UpdateAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 # Delete a book — authenticated users only
-class BookDeleteView(generics.DestroyAPIView):
+class BookDeleteView(QueryPlanMixin, generics.DestroyAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class BookListView(generics.ListAPIView):
+class BookListView(ConditionalGetMixin, QueryPlanMixin, generics.ListAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     
     # Filtering, searching, and ordering
     filter_backends = [
         rest_framework.DjangoFilterBackend,
-        filters.SearchFilter,
+        InvertedIndexSearchFilter,
         filters.OrderingFilter
     ]
     
     # Filtering fields
     filterset_fields = ['title', 'author', 'publication_year']
     
-    # Search fields
-    search_fields = ['title', 'author']
+    # Search fields (used when the inverted index is off)
+    search_fields = ['title', 'author__name']
+    search_index = book_index
     
     # Ordering fields
     ordering_fields = ['title', 'publication_year']
     ordering = ['title']  # default ordering
 
+
+# The router serves /api/books/ with this viewset (its routes come before
+# BookListView's), so it needs the same filters and ordering.
+class BookViewSet(ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
+    queryset = Book.objects.all()
+    serializer_class = BookSerializer
+    filter_backends = BookListView.filter_backends
+    filterset_fields = BookListView.filterset_fields
+    search_fields = BookListView.search_fields
+    search_index = book_index
+    ordering_fields = BookListView.ordering_fields
+    ordering = BookListView.ordering
+
+
+# Bulk create/update/delete — authenticated users only
+class BookBulkView(APIView):
+    """
+    Many books per request, all or nothing.
+
+    - POST a list of books to create them.
+    - PUT/PATCH a list of books, each with its `id`, to update them.
+    - DELETE {"ids": [...]} to delete them.
+
+    Invalid input writes nothing and returns 400 with the errors keyed by
+    item index. At most BULK_MAX_ITEMS items are accepted per request.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_serializer(self, *args, **kwargs):
+        return BookSerializer(
+            *args, many=True, max_length=getattr(settings, 'BULK_MAX_ITEMS', 10000), **kwargs
+        )
+
+    def reindex(self, books):
+        # bulk_create/bulk_update send no post_save for the search index.
+        if book_index.loaded:
+            for book in books:
+                book_index.update(book)
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        books = serializer.save()
+        self.reindex(books)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def put(self, request, partial=False):
+        items = request.data if isinstance(request.data, list) else []
+        ids = self.parse_ids(item.get('id') for item in items if isinstance(item, dict))
+        books = Book.objects.select_related('author').filter(pk__in=ids)
+        serializer = self.get_serializer(books, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        books = serializer.save()
+        self.reindex(books)
+        return Response(serializer.data)
+
+    def patch(self, request):
+        return self.put(request, partial=True)
+
+    def delete(self, request):
+        values = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(values, list) or not values:
+            return Response({'ids': ['Expected a non-empty list of book ids.']}, status=status.HTTP_400_BAD_REQUEST)
+        ids = self.parse_ids(values)
+        found = set(Book.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        missing = [pk for pk in ids if pk not in found]
+        if missing or len(ids) != len(values):
+            return Response(
+                {'ids': ['Every id must be the id of an existing book.'], 'missing': missing},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        with transaction.atomic():
+            deleted, _ = Book.objects.filter(pk__in=ids).delete()
+        return Response({'deleted': deleted})
+
+    def parse_ids(self, values):
+        ids = []
+        for value in values:
+            try:
+                ids.append(int(str(value)))
+            except (TypeError, ValueError):
+                pass
+        return ids
+
+
+# Streaming exports — public access, like the list views
+class ExportView(generics.GenericAPIView):
+    """
+    Stream every row matching the view's filters as NDJSON (default) or CSV.
+
+    Pick the format with `?format=ndjson|csv` or the Accept header.
+    """
+    permission_classes = [permissions.AllowAny]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    pagination_class = None
+    export_fields = ()
+    export_name = None
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(queryset, self.export_fields, request.accepted_renderer.format, self.export_name)
+
+
+class BookExportView(ExportView):
+    queryset = Book.objects.all()
+    # Same filters and ordering as BookListView.
+    filter_backends = BookListView.filter_backends
+    filterset_fields = BookListView.filterset_fields
+    search_fields = BookListView.search_fields
+    search_index = book_index
+    ordering_fields = BookListView.ordering_fields
+    ordering = BookListView.ordering
+    export_fields = ('id', 'title', 'publication_year', ('author', 'author_id'))
+    export_name = 'books'
+
+
+class AuthorExportView(ExportView):
+    queryset = Author.objects.order_by('pk')
+    filter_backends = []
+    export_fields = ('id', 'name')
+    export_name = 'authors'
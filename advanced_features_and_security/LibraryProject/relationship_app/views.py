@@ -5,7 +5,7 @@ from .models import Library
 
 # Function-Based View: List all books with their authors
 def list_books(request):
-    books = Book.objects.all()
+    books = Book.objects.only('title', 'author')
     return render(request, 'relationship_app/list_books.html', {'books': books})
 
 # Class-Based View: Show details of a specific library and its books
@@ -56,7 +56,7 @@ from django.shortcuts import render
 from .models import UserProfile
 
 def book_list(request):
-    books = Book.objects.all()
+    books = Book.objects.only('title', 'author')
     return render(request, 'relationship_app/book_list.html', {'books': books})
 
 def is_admin(user):
@@ -103,7 +103,7 @@ def delete_book(request, book_id):
 
 @permission_required('relationship_app.can_view', raise_exception=True)
 def book_list(request):
-    books = Book.objects.all()
+    books = Book.objects.only('title', 'author')
     return render(request, 'relationship_app/book_list.html', {'books': books})
 
 @permission_required('relationship_app.can_create', raise_exception=True)
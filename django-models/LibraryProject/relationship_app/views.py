@@ -5,7 +5,7 @@ from .models import Library
 
 # Function-Based View: List all books with their authors
 def list_books(request):
-    books = Book.objects.all()
+    books = Book.objects.only('title', 'author')
     return render(request, 'relationship_app/list_books.html', {'books': books})
 
 # Class-Based View: Show details of a specific library and its books
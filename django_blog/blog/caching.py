@@ -0,0 +1,124 @@
+"""
+Versions for the cached post fragments and HTTP validators for anonymous pages.
+
+The post list and detail templates wrap their markup in `{% cache %}` blocks
+keyed on the post id and `Post.updated`, so an edit changes the key instead of
+having to find and delete old fragments. Comments don't touch the post row,
+so the detail page also keys on `comments_version(post_id)`, which the
+signals in `blog.signals` bump on every comment save and delete. The list
+keys on `posts_version()`, bumped on every post save and delete. Cached tag
+pages (`blog.tag_stats`) key on `tag_posts_version(tag_id)`, bumped when the
+tag is put on or taken off a post.
+
+Versions are nanosecond timestamps kept in the cache. A missing version is
+recreated from the clock rather than starting again at 1, so an evicted
+version never brings back fragments rendered for an older one.
+
+`anonymous_condition` adds ETag/Last-Modified (and 304 responses) to the same
+pages for anonymous visitors; logged-in pages vary per user and are skipped.
+"""
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+from .models import Post
+
+POSTS_VERSION_KEY = 'blog:posts:version'
+
+
+def _comments_key(post_id):
+    return f'blog:post_comments:{post_id}:version'
+
+
+def _tag_posts_key(tag_id):
+    return f'blog:tag_posts:{tag_id}:version'
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key) or time.time_ns()
+    return version
+
+
+def _bump(key):
+    cache.set(key, time.time_ns(), None)
+
+
+def comments_version(post_id):
+    return _version(_comments_key(post_id))
+
+
+def posts_version():
+    return _version(POSTS_VERSION_KEY)
+
+
+def tag_posts_version(tag_id):
+    return _version(_tag_posts_key(tag_id))
+
+
+def comments_changed(post_id):
+    _bump(_comments_key(post_id))
+
+
+def tag_posts_changed(tag_id):
+    _bump(_tag_posts_key(tag_id))
+
+
+def posts_changed():
+    _bump(POSTS_VERSION_KEY)
+
+
+def _as_datetime(version):
+    return datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
+
+
+def _post_validators(request, pk):
+    # Both callbacks run for one request; look the post up once.
+    validators = getattr(request, '_blog_post_validators', None)
+    if validators is None:
+        updated = Post.objects.filter(pk=pk).values_list('updated', flat=True).first()
+        if updated is None:
+            validators = (None, None)
+        else:
+            version = comments_version(pk)
+            validators = (f'post-{pk}-{updated.timestamp():.6f}-{version}', max(updated, _as_datetime(version)))
+        request._blog_post_validators = validators
+    return validators
+
+
+def post_etag(request, pk, **kwargs):
+    return _post_validators(request, pk)[0]
+
+
+def post_last_modified(request, pk, **kwargs):
+    return _post_validators(request, pk)[1]
+
+
+def post_list_etag(request, *args, **kwargs):
+    # The page number and any other query arguments select what is shown.
+    return f'posts-{posts_version()}-{request.GET.urlencode()}'
+
+
+def post_list_last_modified(request, *args, **kwargs):
+    return _as_datetime(posts_version())
+
+
+def anonymous_condition(etag_func=None, last_modified_func=None):
+    """
+    Like django.views.decorators.http.condition, for anonymous requests only.
+    """
+    def decorator(view):
+        conditional = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            return conditional(request, *args, **kwargs)
+        return wrapper
+    return decorator
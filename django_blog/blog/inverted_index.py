@@ -0,0 +1,362 @@
+# Byte-identical copies of this module live at:
+#   social_media_api/posts/inverted_index.py
+#   advanced-api-project/api/inverted_index.py
+#   django_blog/blog/inverted_index.py
+# Apply every change to all of them.
+"""
+In-process inverted index with BM25 ranking.
+
+Fallback search for databases without a full-text engine, where the only
+alternative is a LIKE scan. Documents are tokenized into weighted fields; each
+term's posting list is a sorted `array('I')` of document ids with a parallel
+`array('I')` of (weighted) term frequencies. Query terms are prefix-matched
+and every term must match; results are ranked with BM25.
+
+`ModelIndex` keeps one index per model in process memory and updates it
+incrementally from post_save/post_delete. `save()` writes a snapshot file
+that other workers open with mmap on startup instead of rebuilding from the
+database: posting lists are read straight from the mapping (shared page
+cache) and only copied once a write touches them. Writes handled by other
+processes after the snapshot was taken show up once it is rebuilt, so run
+the project's search index command (`build_search_index`, or
+`rebuild_search_index` in django_blog) after bulk changes or on a schedule.
+Results are always loaded from the database, so deleted rows never leak.
+"""
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+MAGIC = b'INVIDX01'
+_HEADER = struct.Struct('<Q')
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+# BM25 parameters.
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    return _WORD.findall(text.lower()) if text else []
+
+
+class InvertedIndex:
+    """
+    Term -> posting list map. Not thread-safe; ModelIndex serializes access.
+    """
+
+    def __init__(self):
+        # term -> (ids, tfs); memoryviews into the snapshot until first written.
+        self._postings = {}
+        self._doc_lengths = {}
+        self._doc_terms = {}
+        self._total_length = 0
+        self._sorted_terms = None
+        self._mapping = None
+        self._snapshot_terms = None
+        self._snapshot_docs = {}
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._doc_lengths
+
+    def _terms_of(self, doc_id):
+        if doc_id in self._doc_terms:
+            return self._doc_terms[doc_id]
+        starts, term_list = self._snapshot_docs['starts'], self._snapshot_docs['terms']
+        position = self._snapshot_docs['positions'][doc_id]
+        return tuple(self._snapshot_terms[i] for i in term_list[starts[position]:starts[position + 1]])
+
+    def _writable(self, term):
+        posting = self._postings.get(term)
+        if posting is None:
+            posting = self._postings[term] = (array('I'), array('I'))
+            self._sorted_terms = None
+        elif not isinstance(posting[0], array):
+            posting = self._postings[term] = (array('I', posting[0]), array('I', posting[1]))
+        return posting
+
+    def add(self, doc_id, fields):
+        """
+        Index `doc_id` from (text, weight) pairs, replacing any earlier version.
+        """
+        self.remove(doc_id)
+        counts = {}
+        for text, weight in fields:
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + weight
+        for term, tf in counts.items():
+            ids, tfs = self._writable(term)
+            if not ids or ids[-1] < doc_id:
+                # Builds add rows in id order, so this is the common case.
+                ids.append(doc_id)
+                tfs.append(tf)
+            else:
+                position = bisect_left(ids, doc_id)
+                ids.insert(position, doc_id)
+                tfs.insert(position, tf)
+        length = sum(counts.values())
+        self._doc_terms[doc_id] = tuple(counts)
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+
+    def remove(self, doc_id):
+        if doc_id not in self._doc_lengths:
+            return
+        for term in self._terms_of(doc_id):
+            ids, tfs = self._writable(term)
+            position = bisect_left(ids, doc_id)
+            if position < len(ids) and ids[position] == doc_id:
+                del ids[position]
+                del tfs[position]
+            if not ids:
+                del self._postings[term]
+                self._sorted_terms = None
+        self._doc_terms.pop(doc_id, None)
+        self._snapshot_docs.get('positions', {}).pop(doc_id, None)
+        self._total_length -= self._doc_lengths.pop(doc_id)
+
+    def _expand(self, prefix):
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        terms = self._sorted_terms
+        position = bisect_left(terms, prefix)
+        while position < len(terms) and terms[position].startswith(prefix):
+            yield terms[position]
+            position += 1
+
+    def scores(self, query):
+        """
+        {doc_id: BM25 score} for documents matching every term of `query`.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self._doc_lengths:
+            return {}
+        documents = len(self._doc_lengths)
+        average_length = self._total_length / documents or 1
+        lengths = self._doc_lengths
+        scores = None
+        for prefix in terms:
+            term_scores = {}
+            for term in self._expand(prefix):
+                ids, tfs = self._postings[term]
+                idf = math.log(1 + (documents - len(ids) + 0.5) / (len(ids) + 0.5))
+                for doc_id, tf in zip(ids, tfs):
+                    norm = K1 * (1 - B + B * lengths[doc_id] / average_length)
+                    term_scores[doc_id] = term_scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {doc_id: score + term_scores[doc_id] for doc_id, score in scores.items() if doc_id in term_scores}
+            if not scores:
+                return {}
+        return scores
+
+    def search(self, query, offset=0, limit=10):
+        """
+        Ids of the best matches, highest score first (newest id on ties).
+        """
+        scores = self.scores(query)
+        best = heapq.nsmallest(offset + limit, scores.items(), key=lambda item: (-item[1], -item[0]))
+        return [doc_id for doc_id, _ in best[offset:]]
+
+    def save(self, path):
+        """
+        Atomically write a snapshot that `load` can map.
+        """
+        terms = sorted(self._postings)
+        numbers = {term: number for number, term in enumerate(terms)}
+        doc_ids = sorted(self._doc_lengths)
+        chunks, offset, term_entries = [], 0, []
+
+        def put(values):
+            nonlocal offset
+            data = array('I', values).tobytes()
+            chunks.append(data)
+            offset += len(data)
+
+        for term in terms:
+            ids, tfs = self._postings[term]
+            term_entries.append([term, offset, len(ids)])
+            put(ids)
+            put(tfs)
+        starts, term_list = [0], []
+        for doc_id in doc_ids:
+            term_list.extend(numbers[term] for term in self._terms_of(doc_id))
+            starts.append(len(term_list))
+        sections = {}
+        for name, values in (
+            ('ids', doc_ids),
+            ('lengths', [self._doc_lengths[doc_id] for doc_id in doc_ids]),
+            ('starts', starts),
+            ('terms', term_list),
+        ):
+            sections[name] = [offset, len(values)]
+            put(values)
+
+        header = json.dumps({
+            'byteorder': sys.byteorder,
+            'itemsize': array('I').itemsize,
+            'terms': term_entries,
+            'docs': sections,
+        }).encode()
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as handle:
+            handle.write(MAGIC)
+            handle.write(_HEADER.pack(len(header)))
+            handle.write(header)
+            for chunk in chunks:
+                handle.write(chunk)
+        os.replace(handle.name, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Map a snapshot written by `save`; raises ValueError if it is unusable.
+        """
+        with open(path, 'rb') as handle:
+            mapping = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapping[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a search index snapshot')
+        (header_length,) = _HEADER.unpack_from(mapping, len(MAGIC))
+        start = len(MAGIC) + _HEADER.size
+        header = json.loads(mapping[start:start + header_length])
+        if header['byteorder'] != sys.byteorder or header['itemsize'] != array('I').itemsize:
+            raise ValueError(f'{path} was written on an incompatible platform')
+        base = start + header_length
+        view = memoryview(mapping)
+
+        def section(offset, count):
+            size = array('I').itemsize
+            return view[base + offset:base + offset + count * size].cast('I')
+
+        index = cls()
+        index._mapping = mapping
+        for term, offset, count in header['terms']:
+            index._postings[term] = (section(offset, count), section(offset + count * array('I').itemsize, count))
+        index._snapshot_terms = [term for term, _, _ in header['terms']]
+        docs = {name: section(*location) for name, location in header['docs'].items()}
+        index._doc_lengths = dict(zip(docs['ids'], docs['lengths']))
+        index._total_length = sum(docs['lengths'])
+        index._snapshot_docs = {
+            'starts': docs['starts'],
+            'terms': docs['terms'],
+            'positions': {doc_id: position for position, doc_id in enumerate(docs['ids'])},
+        }
+        return index
+
+
+class ModelIndex:
+    """
+    An InvertedIndex over one model's rows, loaded or built on first use.
+
+    `document(instance)` returns the (text, weight) pairs to index. Call
+    `connect()` from AppConfig.ready() to follow the model's signals.
+    """
+
+    def __init__(self, model, document, name, queryset=None):
+        self.model = model
+        self.document = document
+        self.name = name
+        self._queryset = queryset
+        self._lock = threading.RLock()
+        self._index = None
+
+    @property
+    def path(self):
+        directory = getattr(settings, 'SEARCH_INDEX_DIR', None)
+        return os.path.join(directory, f'{self.name}.idx') if directory else None
+
+    @property
+    def loaded(self):
+        return self._index is not None
+
+    def get_queryset(self):
+        if self._queryset is not None:
+            return self._queryset.all()
+        return self.model._default_manager.all()
+
+    def build(self):
+        index = InvertedIndex()
+        for instance in self.get_queryset().iterator(chunk_size=2000):
+            index.add(instance.pk, self.document(instance))
+        return index
+
+    def _get(self):
+        if self._index is None:
+            path = self.path
+            try:
+                self._index = InvertedIndex.load(path) if path else None
+            except (OSError, ValueError):
+                self._index = None
+            if self._index is None:
+                self._index = self.build()
+                self.save()
+        return self._index
+
+    def rebuild(self):
+        """
+        Rebuild from the database and write a fresh snapshot.
+        """
+        index = self.build()
+        with self._lock:
+            self._index = index
+            self.save()
+        return len(index)
+
+    def save(self):
+        with self._lock:
+            if self._index is not None and self.path:
+                self._index.save(self.path)
+
+    def reset(self):
+        """
+        Drop the in-memory index; the next query loads or builds it again.
+        """
+        with self._lock:
+            self._index = None
+
+    def update(self, instance):
+        # Only an index this process already holds is kept current; one loaded
+        # later comes from the database or a snapshot anyway.
+        with self._lock:
+            if self._index is not None:
+                self._index.add(instance.pk, self.document(instance))
+
+    def discard(self, pk):
+        with self._lock:
+            if self._index is not None:
+                self._index.remove(pk)
+
+    def search(self, query, offset=0, limit=10):
+        with self._lock:
+            return self._get().search(query, offset, limit)
+
+    def count(self, query):
+        with self._lock:
+            return len(self._get().scores(query))
+
+    def connect(self):
+        post_save.connect(self._saved, sender=self.model, weak=False, dispatch_uid=f'inverted_index:{self.name}')
+        post_delete.connect(self._deleted, sender=self.model, weak=False, dispatch_uid=f'inverted_index:{self.name}')
+
+    def _saved(self, sender, instance, raw=False, **kwargs):
+        if not raw:
+            self.update(instance)
+
+    def _deleted(self, sender, instance, **kwargs):
+        self.discard(instance.pk)
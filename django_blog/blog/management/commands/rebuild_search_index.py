@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Post
+from blog.search import InvertedIndexSearchBackend, get_backend, post_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the blog full-text search index from blog_post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if isinstance(backend, InvertedIndexSearchBackend):
+            count = post_index.rebuild()
+            self.stdout.write(f'Indexed {count} posts into {post_index.path or "memory only"}.')
+            return
+        posts = Post.objects.prefetch_related('tags').order_by('pk')
+        count = 0
+        with transaction.atomic():
+            backend.clear()
+            for post in posts.iterator(chunk_size=options['batch_size']):
+                backend.index(post)
+                count += 1
+        self.stdout.write(f'Indexed {count} posts with {type(backend).__name__}.')
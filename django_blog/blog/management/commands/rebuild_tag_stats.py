@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.tag_stats import rebuild_tag_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute blog tag post counts and related-tag counts from taggit.'
+
+    def handle(self, *args, **options):
+        count = rebuild_tag_stats()
+        self.stdout.write(f'Rebuilt statistics for {count} tags.')
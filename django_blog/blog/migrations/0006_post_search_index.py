@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:05
+
+from django.db import migrations
+
+TAGS_SQL = """
+    SELECT {aggregate} FROM taggit_taggeditem ti
+    JOIN taggit_tag t ON t.id = ti.tag_id
+    JOIN django_content_type ct ON ct.id = ti.content_type_id
+    WHERE ct.app_label = 'blog' AND ct.model = 'post' AND ti.object_id = p.id
+"""
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+        tags = TAGS_SQL.format(aggregate="group_concat(t.name, ' ')")
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE blog_post_fts USING fts5(title, content, tags, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            'INSERT INTO blog_post_fts (rowid, title, content, tags) '
+            f"SELECT p.id, p.title, p.content, COALESCE(({tags}), '') FROM blog_post p"
+        )
+    elif connection.vendor == 'postgresql':
+        tags = TAGS_SQL.format(aggregate="string_agg(t.name, ' ')")
+        schema_editor.execute(
+            'CREATE TABLE blog_post_search ('
+            'post_id bigint PRIMARY KEY REFERENCES blog_post (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute('CREATE INDEX blog_post_search_document_idx ON blog_post_search USING GIN (document)')
+        schema_editor.execute(
+            'INSERT INTO blog_post_search (post_id, document) '
+            "SELECT p.id, setweight(to_tsvector('english', p.title), 'A') || "
+            f"setweight(to_tsvector('english', COALESCE(({tags}), '')), 'B') || "
+            "setweight(to_tsvector('english', p.content), 'C') FROM blog_post p"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    schema_editor.execute('DROP TABLE IF EXISTS blog_post_fts')
+    schema_editor.execute('DROP TABLE IF EXISTS blog_post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_post_tags'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
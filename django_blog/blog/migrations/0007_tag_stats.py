@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:53
+
+from collections import Counter
+from itertools import permutations
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_tag_stats(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    TagStat = apps.get_model('blog', 'TagStat')
+    TagPair = apps.get_model('blog', 'TagPair')
+    post_type = ContentType.objects.filter(app_label='blog', model='post').first()
+    if post_type is None:
+        return
+    tags_by_post = {}
+    for post_id, tag_id in TaggedItem.objects.filter(content_type=post_type).values_list('object_id', 'tag_id'):
+        tags_by_post.setdefault(post_id, set()).add(tag_id)
+    counts, pairs = Counter(), Counter()
+    for tag_ids in tags_by_post.values():
+        counts.update(tag_ids)
+        pairs.update(permutations(tag_ids, 2))
+    TagStat.objects.bulk_create([TagStat(tag_id=tag_id, post_count=n) for tag_id, n in counts.items()], batch_size=1000)
+    TagPair.objects.bulk_create([TagPair(tag_id=a, related_id=b, count=n) for (a, b), n in pairs.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_post_search_index'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagStat',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='blog_stat', serialize=False, to='taggit.tag')),
+                ('post_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-post_count'], name='blog_tagstat_count_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TagPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='taggit.tag')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='taggit.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', '-count'], name='blog_tagpair_tag_count_idx')],
+                'unique_together': {('tag', 'related')},
+            },
+        ),
+        migrations.RunPython(backfill_tag_stats, migrations.RunPython.noop),
+    ]
@@ -3,15 +3,23 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from django.urls import reverse
 from taggit.managers import TaggableManager
+from taggit.models import Tag
 
 
 class Post(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
     published_date = models.DateTimeField(default=timezone.now)
+    updated = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     tags = TaggableManager()  # ✅ Tagging is set up
 
+    class Meta:
+        indexes = [
+            # Post list and tag pages, newest first.
+            models.Index(fields=['-published_date', '-id'], name='blog_post_published_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -38,3 +46,33 @@ class Profile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
+
+
+class TagStat(models.Model):
+    """
+    Number of posts carrying a tag, maintained by blog.tag_stats.
+    """
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE, primary_key=True, related_name='blog_stat')
+    post_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['-post_count'], name='blog_tagstat_count_idx')]
+
+    def __str__(self):
+        return f"{self.tag_id}: {self.post_count}"
+
+
+class TagPair(models.Model):
+    """
+    Number of posts carrying both `tag` and `related`; stored in both directions.
+    """
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='+')
+    related = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('tag', 'related')
+        indexes = [models.Index(fields=['tag', '-count'], name='blog_tagpair_tag_count_idx')]
+
+    def __str__(self):
+        return f"{self.tag_id} + {self.related_id}: {self.count}"
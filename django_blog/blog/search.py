@@ -0,0 +1,235 @@
+"""
+Full-text search for blog posts.
+
+Posts are mirrored into a shadow index table that the database can search
+without scanning `blog_post`:
+
+- SQLite: an FTS5 virtual table `blog_post_fts(title, content, tags)` keyed by
+  post id, ranked with bm25().
+- PostgreSQL: `blog_post_search(post_id, document tsvector)` with a GIN index,
+  ranked with ts_rank_cd().
+
+Migration 0006 creates whichever table the database supports; the signals in
+`blog.signals` keep it in sync on post save/delete and tag changes, and
+`manage.py rebuild_search_index` refills it. On any other database (or SQLite
+built without FTS5) `get_backend()` falls back to the in-process inverted
+index in `blog.inverted_index`.
+
+Title matches rank above tag matches, which rank above body matches.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .inverted_index import ModelIndex
+from .models import Post
+
+SQLITE_TABLE = 'blog_post_fts'
+POSTGRES_TABLE = 'blog_post_search'
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query):
+    return _WORD.findall(query or '')
+
+
+def document_fields(post):
+    """
+    (title, content, tags) text for `post`.
+    """
+    return post.title, post.content, ' '.join(tag.name for tag in post.tags.all())
+
+
+def post_document(post):
+    title, content, tags = document_fields(post)
+    return [(title, 3), (tags, 2), (content, 1)]
+
+
+post_index = ModelIndex(Post, post_document, 'blog_posts', queryset=Post.objects.prefetch_related('tags'))
+
+
+class LikeSearchBackend:
+    """
+    Substring match on title, content and tag names; newest first.
+    """
+
+    def _queryset(self, query):
+        match = Q()
+        for term in search_terms(query):
+            match &= Q(title__icontains=term) | Q(content__icontains=term) | Q(tags__name__icontains=term)
+        return Post.objects.filter(match).distinct().order_by('-published_date', '-pk')
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, query, offset, limit):
+        return list(self._queryset(query).values_list('pk', flat=True)[offset:offset + limit])
+
+    def count(self, query):
+        return self._queryset(query).count()
+
+
+class InvertedIndexSearchBackend:
+    """
+    BM25 over the in-process index; writes only touch this process's copy.
+    """
+
+    def index(self, post):
+        post_index.update(post)
+
+    def remove(self, post_id):
+        post_index.discard(post_id)
+
+    def clear(self):
+        post_index.reset()
+
+    def search(self, query, offset, limit):
+        return post_index.search(query, offset, limit)
+
+    def count(self, query):
+        return post_index.count(query)
+
+
+class SqliteSearchBackend:
+
+    def _match(self, query):
+        # Quote every term so user input is never parsed as FTS5 syntax, and
+        # prefix-match it so "djan" still finds "django".
+        return ' '.join('"%s"*' % term for term in search_terms(query))
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, title, content, tags) VALUES (%s, %s, %s, %s)',
+                [post.pk, *document_fields(post)],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE}')
+
+    def search(self, query, offset, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s '
+                f'ORDER BY bm25({SQLITE_TABLE}, 10.0, 1.0, 5.0), rowid DESC LIMIT %s OFFSET %s',
+                [self._match(query), limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def count(self, query):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s', [self._match(query)])
+            return cursor.fetchone()[0]
+
+
+class PostgresSearchBackend:
+    config = 'english'
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {POSTGRES_TABLE} (post_id, document) VALUES (%s, '
+                'setweight(to_tsvector(%s::regconfig, %s), \'A\') || '
+                'setweight(to_tsvector(%s::regconfig, %s), \'C\') || '
+                'setweight(to_tsvector(%s::regconfig, %s), \'B\')) '
+                'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document',
+                [post.pk, *(value for field in document_fields(post) for value in (self.config, field))],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {POSTGRES_TABLE} WHERE post_id = %s', [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {POSTGRES_TABLE}')
+
+    def search(self, query, offset, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id FROM {POSTGRES_TABLE}, websearch_to_tsquery(%s::regconfig, %s) query '
+                'WHERE document @@ query ORDER BY ts_rank_cd(document, query) DESC, post_id DESC LIMIT %s OFFSET %s',
+                [self.config, query, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def count(self, query):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {POSTGRES_TABLE} WHERE document @@ websearch_to_tsquery(%s::regconfig, %s)',
+                [self.config, query],
+            )
+            return cursor.fetchone()[0]
+
+
+_backend = None
+
+
+def get_backend():
+    """
+    The search backend for the default database, chosen once per process.
+
+    `BLOG_SEARCH_BACKEND` can force 'like' or 'memory'; the default 'auto'
+    uses the shadow table when migration 0006 was able to create it.
+    """
+    global _backend
+    if _backend is None:
+        choice = getattr(settings, 'BLOG_SEARCH_BACKEND', 'auto')
+        tables = set(connection.introspection.table_names())
+        if choice == 'like':
+            _backend = LikeSearchBackend()
+        elif choice == 'memory':
+            _backend = InvertedIndexSearchBackend()
+        elif connection.vendor == 'sqlite' and SQLITE_TABLE in tables:
+            _backend = SqliteSearchBackend()
+        elif connection.vendor == 'postgresql' and POSTGRES_TABLE in tables:
+            _backend = PostgresSearchBackend()
+        else:
+            _backend = InvertedIndexSearchBackend()
+    return _backend
+
+
+class SearchResults:
+    """
+    Ranked posts for `query`, sliced lazily so it can be handed to Paginator.
+    """
+
+    def __init__(self, query, backend=None):
+        self.query = query
+        self.backend = backend or get_backend()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.query) if search_terms(self.query) else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        if stop is None:
+            stop = self.count()
+        if stop <= start or not search_terms(self.query):
+            return []
+        ids = self.backend.search(self.query, start, stop - start)
+        posts = Post.objects.select_related('author').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
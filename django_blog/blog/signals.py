@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Profile
+from .models import Comment, Post, Profile
+from .caching import comments_changed, posts_changed
+from .search import get_backend
+from .tag_stats import tags_changed
 
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
@@ -11,3 +14,56 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
         # ensure profile exists
         Profile.objects.get_or_create(user=instance)
 
+# --- Search index (blog.search) ---
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_backend().index(instance)
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    get_backend().remove(instance.pk)
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def reindex_post_tags(sender, instance, action, **kwargs):
+    # Tags are saved after the post itself (form.save_m2m), so refresh them here.
+    if isinstance(instance, Post) and action in ('post_add', 'post_remove', 'post_clear'):
+        get_backend().index(instance)
+
+# --- Tag statistics (blog.tag_stats) ---
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_tag_stats(sender, instance, action, pk_set, **kwargs):
+    if not isinstance(instance, Post):
+        return
+    if action == 'post_add':
+        tags_changed(instance, added=pk_set)
+    elif action == 'pre_remove':
+        tags_changed(instance, removed=pk_set)
+    elif action == 'pre_clear':
+        tags_changed(instance, removed=instance.tags.values_list('pk', flat=True))
+
+@receiver(pre_delete, sender=Post)
+def untag_deleted_post(sender, instance, **kwargs):
+    # taggit deletes the tagged items without sending m2m_changed.
+    tags_changed(instance, removed=instance.tags.values_list('pk', flat=True))
+
+# --- Page caches (blog.caching) ---
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def expire_post_pages(sender, instance, **kwargs):
+    # Post fragments are keyed on Post.updated; this covers the list validators.
+    posts_changed()
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def expire_post_pages_on_tags(sender, instance, action, **kwargs):
+    # The list page shows the tag cloud.
+    if isinstance(instance, Post) and action in ('post_add', 'post_remove', 'post_clear'):
+        posts_changed()
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def expire_post_comments(sender, instance, **kwargs):
+    comments_changed(instance.post_id)
@@ -0,0 +1,189 @@
+"""
+Per-tag post counts, related-tag counts and cached post lists.
+
+`TagStat` holds how many posts carry each tag and `TagPair` how many posts
+carry two tags together (both directions are stored, so "related to X" is one
+index range scan). The signals in `blog.signals` apply each tag add/remove
+and post delete as a delta, so the tables are never recounted on a request;
+`manage.py rebuild_tag_stats` recomputes them from scratch if they drift.
+
+`tag_post_ids(tag_id, start, stop)` is one page of the tag's post ids, newest
+first, cached so a tag page doesn't join `taggit_taggeditem` per request.
+Only pages that are served get cached, and the page count comes from
+`TagStat`. Pages are keyed on the tag's version (`blog.caching`), which is
+bumped when the tag is put on or taken off a post (post deletes included);
+editing a post doesn't change which tag pages it is on.
+"""
+from collections import Counter
+from itertools import permutations
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from taggit.models import Tag, TaggedItem
+
+from .caching import tag_posts_changed, tag_posts_version
+from .models import Post, TagPair, TagStat
+
+
+def _page_key(tag_id, version, start, stop):
+    return f'blog:tag_posts:{tag_id}:{version}:{start}:{stop}'
+
+
+def _apply(count_deltas, pair_deltas):
+    with transaction.atomic():
+        if count_deltas:
+            TagStat.objects.bulk_create([TagStat(tag_id=tag_id) for tag_id in count_deltas], ignore_conflicts=True)
+            for tag_id, delta in count_deltas.items():
+                TagStat.objects.filter(tag_id=tag_id).update(post_count=Greatest(F('post_count') + delta, 0))
+        if pair_deltas:
+            TagPair.objects.bulk_create(
+                [TagPair(tag_id=tag_id, related_id=related_id) for tag_id, related_id in pair_deltas],
+                ignore_conflicts=True,
+            )
+            by_tag = {}
+            for (tag_id, related_id), delta in pair_deltas.items():
+                by_tag.setdefault((tag_id, delta), []).append(related_id)
+            for (tag_id, delta), related_ids in by_tag.items():
+                TagPair.objects.filter(tag_id=tag_id, related_id__in=related_ids).update(count=Greatest(F('count') + delta, 0))
+            TagPair.objects.filter(tag_id__in={tag_id for tag_id, _ in pair_deltas}, count=0).delete()
+
+
+def tags_changed(post, added=(), removed=()):
+    """
+    Record that `added` tag ids were put on `post` and `removed` taken off.
+
+    Call after an add and before a remove, so `post.tags` holds the added
+    tags and still holds the removed ones.
+    """
+    added, removed = set(added), set(removed)
+    if not added and not removed:
+        return
+    current = set(post.tags.values_list('pk', flat=True))
+    count_deltas = Counter()
+    pair_deltas = Counter()
+    for changed, delta in ((added, 1), (removed, -1)):
+        if not changed:
+            continue
+        kept = current - changed
+        for tag_id in changed:
+            count_deltas[tag_id] += delta
+            for other in kept:
+                pair_deltas[(tag_id, other)] += delta
+                pair_deltas[(other, tag_id)] += delta
+        for pair in permutations(changed, 2):
+            pair_deltas[pair] += delta
+    _apply(
+        {tag_id: delta for tag_id, delta in count_deltas.items() if delta},
+        {pair: delta for pair, delta in pair_deltas.items() if delta},
+    )
+    invalidate_post_ids(added | removed)
+
+
+def invalidate_post_ids(tag_ids):
+    tag_ids = list(tag_ids)
+    for tag_id in tag_ids:
+        tag_posts_changed(tag_id)
+
+    def bump():
+        # Again after commit, in case a reader cached the old page in between.
+        for tag_id in tag_ids:
+            tag_posts_changed(tag_id)
+    transaction.on_commit(bump)
+
+
+def tag_post_ids(tag_id, start, stop):
+    """
+    Ids of the posts tagged `tag_id`, newest first, from `start` to `stop`.
+    """
+    key = _page_key(tag_id, tag_posts_version(tag_id), start, stop)
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(
+            Post.objects.filter(tags__id=tag_id)
+            .order_by('-published_date', '-pk')
+            .values_list('pk', flat=True)[start:stop]
+        )
+        cache.set(key, ids, getattr(settings, 'BLOG_TAG_POSTS_CACHE_SECONDS', 3600))
+    return ids
+
+
+class TagPostList:
+    """
+    A tag's posts as a lazily sliced sequence, for Paginator.
+
+    `post_count` is the tag's `TagStat.post_count`.
+    """
+
+    def __init__(self, tag_id, post_count=0):
+        self.tag_id = tag_id
+        self.post_count = post_count if tag_id is not None else 0
+
+    def count(self):
+        return self.post_count
+
+    def __len__(self):
+        return self.post_count
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, step = index.indices(self.post_count)
+        if step != 1:
+            raise ValueError('TagPostList only supports contiguous slices.')
+        if start >= stop:
+            return []
+        ids = tag_post_ids(self.tag_id, start, stop)
+        posts = Post.objects.select_related('author').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def popular_tags(limit=20):
+    """
+    The most used tags, each annotated with `post_count`.
+    """
+    return list(
+        Tag.objects.filter(blog_stat__post_count__gt=0)
+        .annotate(post_count=F('blog_stat__post_count'))
+        .order_by('-post_count', 'name')[:limit]
+    )
+
+
+def related_tags(tag_id, limit=10):
+    """
+    Tags most often used together with `tag_id`, each annotated with `count`.
+    """
+    pairs = list(
+        TagPair.objects.filter(tag_id=tag_id, count__gt=0)
+        .select_related('related')
+        .order_by('-count', 'related__name')[:limit]
+    )
+    for pair in pairs:
+        pair.related.count = pair.count
+    return [pair.related for pair in pairs]
+
+
+def rebuild_tag_stats():
+    """
+    Recompute both tables from taggit_taggeditem. Returns the number of tags.
+    """
+    post_type = ContentType.objects.get_for_model(Post)
+    tags_by_post = {}
+    for post_id, tag_id in TaggedItem.objects.filter(content_type=post_type).values_list('object_id', 'tag_id'):
+        tags_by_post.setdefault(post_id, set()).add(tag_id)
+    counts, pairs = Counter(), Counter()
+    for tag_ids in tags_by_post.values():
+        counts.update(tag_ids)
+        pairs.update(permutations(tag_ids, 2))
+    with transaction.atomic():
+        TagStat.objects.all().delete()
+        TagPair.objects.all().delete()
+        TagStat.objects.bulk_create([TagStat(tag_id=tag_id, post_count=n) for tag_id, n in counts.items()], batch_size=1000)
+        TagPair.objects.bulk_create(
+            [TagPair(tag_id=a, related_id=b, count=n) for (a, b), n in pairs.items()], batch_size=1000
+        )
+    invalidate_post_ids(counts)
+    return len(counts)
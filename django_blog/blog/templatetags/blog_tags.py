@@ -0,0 +1,24 @@
+from django import template
+
+from blog.tag_stats import popular_tags, related_tags
+
+register = template.Library()
+
+
+@register.inclusion_tag('blog/tag_cloud.html')
+def tag_cloud(limit=30):
+    """
+    The `limit` most used tags, alphabetically, each with a 1-5 `weight`.
+    """
+    tags = popular_tags(limit)
+    if tags:
+        low = min(tag.post_count for tag in tags)
+        spread = max(tag.post_count for tag in tags) - low or 1
+        for tag in tags:
+            tag.weight = 1 + round(4 * (tag.post_count - low) / spread)
+    return {'tags': sorted(tags, key=lambda tag: tag.name.lower())}
+
+
+@register.inclusion_tag('blog/related_tags.html')
+def tag_related(tag, limit=10):
+    return {'tags': related_tags(tag.pk, limit) if tag else []}
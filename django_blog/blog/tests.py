@@ -1,3 +1,235 @@
-from django.test import TestCase
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .models import Comment, Post, TagPair, TagStat
+from .tag_stats import popular_tags, rebuild_tag_stats, related_tags
+from .search import InvertedIndexSearchBackend, LikeSearchBackend, SearchResults, SqliteSearchBackend, get_backend, post_index
+
+
+class SearchTestCase(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass1234')
+
+    def post(self, title, content='', tags=()):
+        post = Post.objects.create(title=title, content=content, author=self.author)
+        if tags:
+            post.tags.add(*tags)
+        return post
+
+    def ids(self, query):
+        return [post.pk for post in SearchResults(query)[:20]]
+
+    def test_sqlite_uses_fts5_index(self):
+        self.assertIsInstance(get_backend(), SqliteSearchBackend)
+
+    def test_index_follows_save_tags_and_delete(self):
+        post = self.post('Caching views', 'Using memcached')
+        self.assertEqual(self.ids('memcached'), [post.pk])
+
+        post.content = 'Using redis'
+        post.save()
+        self.assertEqual(self.ids('memcached'), [])
+        post.tags.add('performance')
+        self.assertEqual(self.ids('performance'), [post.pk])
+
+        post.delete()
+        self.assertEqual(self.ids('redis'), [])
+
+    def test_title_matches_rank_first_and_prefixes_match(self):
+        body = self.post('Notes', 'django tips and django tricks')
+        title = self.post('Django', 'misc')
+        self.assertEqual(self.ids('djan'), [title.pk, body.pk])
+
+    def test_query_syntax_is_not_interpreted(self):
+        post = self.post('AND OR NOT', 'x')
+        self.assertEqual(self.ids('"AND" (OR*'), [post.pk])
+        self.assertEqual(self.ids(''), [])
+
+    def test_like_backend_matches_the_same_posts(self):
+        post = self.post('Caching', 'x', tags=['perf'])
+        results = SearchResults('perf', backend=LikeSearchBackend())
+        self.assertEqual([p.pk for p in results[:10]], [post.pk])
+
+    def test_search_view_paginates(self):
+        for i in range(12):
+            self.post(f'Post {i}', 'searchable')
+        response = self.client.get(reverse('search-posts'), {'q': 'searchable', 'page': 2})
+        self.assertEqual(len(response.context['posts']), 2)
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+
+    def test_rebuild_command(self):
+        post = self.post('Rebuilt', 'x')
+        get_backend().clear()
+        self.assertEqual(self.ids('rebuilt'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.ids('rebuilt'), [post.pk])
+
+    def test_inverted_index_backend_matches_and_ranks(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(post_index.reset)
+        with override_settings(SEARCH_INDEX_DIR=directory.name), \
+                mock.patch('blog.search._backend', InvertedIndexSearchBackend()):
+            post_index.reset()
+            body = self.post('Notes', 'about caching')
+            title = self.post('Caching', 'x')
+            self.assertEqual(self.ids('cach'), [title.pk, body.pk])
+
+            tagged = self.post('Other', 'x')
+            tagged.tags.add('caching')
+            self.assertEqual(SearchResults('caching').count(), 3)
+
+
+class TagStatsTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass1234')
+
+    def post(self, title, tags):
+        post = Post.objects.create(title=title, content='x', author=self.author)
+        post.tags.add(*tags)
+        return post
+
+    def counts(self):
+        return (
+            {stat.tag.name: stat.post_count for stat in TagStat.objects.select_related('tag') if stat.post_count},
+            {(pair.tag.name, pair.related.name): pair.count for pair in TagPair.objects.select_related('tag', 'related')},
+        )
+
+    def test_counts_follow_add_remove_clear_and_delete(self):
+        first = self.post('one', ['django', 'python'])
+        second = self.post('two', ['django'])
+        second.tags.add('python', 'orm')
+        self.assertEqual(popular_tags(1)[0].post_count, 2)
+        self.assertEqual([(tag.name, tag.count) for tag in related_tags(first.tags.get(name='django').pk)],
+                         [('python', 2), ('orm', 1)])
+
+        second.tags.remove('python')
+        first.tags.clear()
+        incremental = self.counts()
+        self.assertEqual(incremental, ({'django': 1, 'orm': 1}, {('django', 'orm'): 1, ('orm', 'django'): 1}))
+
+        second.delete()
+        self.assertEqual(self.counts(), ({}, {}))
+
+    def test_rebuild_matches_incremental_counts(self):
+        self.post('one', ['a', 'b', 'c'])
+        post = self.post('two', ['a', 'b'])
+        post.tags.set(['b', 'c'])
+        incremental = self.counts()
+        rebuild_tag_stats()
+        self.assertEqual(self.counts(), incremental)
+
+    def test_tag_page_uses_cached_ids(self):
+        older = self.post('older', ['django'])
+        newer = self.post('newer', ['django'])
+        url = reverse('post-by-tag', args=['django'])
+        self.assertEqual(list(self.client.get(url).context['posts']), [newer, older])
+
+        # Tag lookup, one page of posts, related tags; no taggit_taggeditem join.
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+        newer.tags.remove('django')
+        self.assertEqual(list(self.client.get(url).context['posts']), [older])
+
+    def test_only_tag_changes_expire_tag_pages(self):
+        post = self.post('one', ['django'])
+        url = reverse('post-by-tag', args=['django'])
+        self.client.get(url)
+        post.title = 'edited'
+        post.save()
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url).context['posts'][0].title, 'edited')
+
+        post.tags.add('python')
+        post.tags.remove('django')
+        self.assertEqual(list(self.client.get(url).context['posts']), [])
+
+    def test_drifted_counts_do_not_go_below_zero(self):
+        post = self.post('one', ['django', 'python'])
+        TagStat.objects.update(post_count=0)
+        TagPair.objects.update(count=0)
+        post.tags.remove('django')
+        self.assertEqual(set(TagStat.objects.values_list('post_count', flat=True)), {0})
+
+    def test_api(self):
+        self.post('one', ['django', 'python'])
+        self.assertEqual(self.client.get(reverse('tag-stats')).json()['tags'][0]['post_count'], 1)
+        related = self.client.get(reverse('tag-related', args=['django'])).json()['related']
+        self.assertEqual(related, [{'name': 'python', 'slug': 'python', 'count': 1}])
+
+
+class PageCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass1234')
+        self.post = Post.objects.create(title='Cached', content='Original body', author=self.author)
+        self.url = reverse('post_detail', args=[self.post.pk])
+
+    def test_detail_fragments_are_reused_until_post_or_comments_change(self):
+        self.client.get(self.url)
+        # Validators and post lookup only; the body and comments are cached.
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+        Post.objects.filter(pk=self.post.pk).update(content='Changed behind the cache')
+        self.assertContains(self.client.get(self.url), 'Original body')
+
+        self.post.content = 'Edited body'
+        self.post.save()
+        self.assertContains(self.client.get(self.url), 'Edited body')
+
+        comment = Comment.objects.create(post=self.post, author=self.author, content='First!')
+        self.assertContains(self.client.get(self.url), 'First!')
+        comment.delete()
+        self.assertContains(self.client.get(self.url), 'No comments yet.')
+
+    def test_comment_edit_links_are_per_user(self):
+        comment = Comment.objects.create(post=self.post, author=self.author, content='Mine')
+        edit = reverse('comment_edit', args=[comment.pk])
+        self.assertNotContains(self.client.get(self.url), edit)
+        self.client.login(username='author', password='pass1234')
+        self.assertContains(self.client.get(self.url), edit)
+
+    def test_anonymous_pages_are_conditional(self):
+        for url in (self.url, reverse('post-detail', args=[self.post.pk]), reverse('post-list')):
+            response = self.client.get(url)
+            self.assertTrue(response.has_header('Last-Modified'))
+            self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+
+        etag = self.client.get(self.url)['ETag']
+        Comment.objects.create(post=self.post, author=self.author, content='New')
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 200)
+
+        list_etag = self.client.get(reverse('post-list'))['ETag']
+        Post.objects.create(title='Another', content='x', author=self.author)
+        self.assertEqual(self.client.get(reverse('post-list'), headers={'If-None-Match': list_etag}).status_code, 200)
+
+    def test_logged_in_pages_have_no_validators(self):
+        self.client.login(username='author', password='pass1234')
+        self.assertFalse(self.client.get(self.url).has_header('ETag'))
+
+
+class IndexUsageTestCase(TestCase):
+
+    def assertUsesIndex(self, queryset, index):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN checks are written for SQLite')
+        plan = queryset.explain()
+        self.assertRegex(plan, rf'(SEARCH|SCAN) \S+ USING (COVERING )?INDEX {index}\b', plan)
+        self.assertNotIn('TEMP B-TREE', plan, plan)
+
+    def test_post_list_newest_first(self):
+        self.assertUsesIndex(Post.objects.order_by('-published_date', '-id')[:10], 'blog_post_published_idx')
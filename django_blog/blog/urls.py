@@ -18,6 +18,7 @@ urlpatterns = [
     path('logout/', auth_views.LogoutView.as_view(template_name='blog/logout.html'), name='logout'),
 
     # Post CRUD
+    path('posts/', PostListView.as_view(), name='post-list'),
     path('post/<int:pk>/', PostDetailView.as_view(), name='post-detail'),
     path('post/new/', PostCreateView.as_view(), name='post-create'),
     path('post/<int:pk>/update/', PostUpdateView.as_view(), name='post-update'),
@@ -38,6 +39,10 @@ urlpatterns = [
 
     # Posts filtered by tag
     path('tags/<slug:tag_slug>/', PostByTagListView.as_view(), name='post-by-tag'),
+
+    # Tag statistics
+    path('api/tags/', views.tag_stats_api, name='tag-stats'),
+    path('api/tags/<slug:tag_slug>/related/', views.related_tags_api, name='tag-related'),
 ]
 
 
@@ -4,9 +4,23 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from django.db.models import Q
+from django.core.paginator import Paginator
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from taggit.models import Tag
 
 from .models import Post, Comment
+from .caching import (
+    anonymous_condition,
+    comments_version,
+    post_etag,
+    post_last_modified,
+    post_list_etag,
+    post_list_last_modified,
+)
+from .search import SearchResults
+from .tag_stats import TagPostList, popular_tags, related_tags
 from .forms import (
     RegisterForm,
     UserUpdateForm,
@@ -44,15 +58,36 @@ def profile(request):
 def home(request):
     return render(request, "blog/index.html")
 
+def fragment_context(post=None):
+    # Timeout and versions for the {% cache %} blocks (blog.caching).
+    context = {'fragment_cache_seconds': getattr(settings, 'BLOG_FRAGMENT_CACHE_SECONDS', 3600)}
+    if post is not None:
+        context['comments_version'] = comments_version(post.pk)
+    return context
+
+@method_decorator(anonymous_condition(post_list_etag, post_list_last_modified), name='dispatch')
 class PostListView(ListView):
     model = Post
     template_name = 'blog/post_list.html'
     context_object_name = 'posts'
     ordering = ['-published_date']
+    def get_queryset(self):
+        return super().get_queryset().select_related('author')
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx.update(fragment_context())
+        return ctx
 
+@method_decorator(anonymous_condition(post_etag, post_last_modified), name='dispatch')
 class PostDetailView(DetailView):
     model = Post
     template_name = 'blog/post_detail.html'
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        # Only evaluated when the comments fragment isn't cached.
+        ctx['comments'] = self.object.comments.select_related('author').order_by('-created_at')
+        ctx.update(fragment_context(self.object))
+        return ctx
 
 class PostCreateView(LoginRequiredMixin, CreateView):
     model = Post
@@ -81,9 +116,10 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 
 # --- Comment Views (Function-Based) ---
 
+@anonymous_condition(post_etag, post_last_modified)
 def post_detail(request, pk):
     post = get_object_or_404(Post, pk=pk)
-    comments = post.comments.all().order_by('-created_at')
+    comments = post.comments.select_related('author').order_by('-created_at')
     form = CommentForm(request.POST or None)
     if request.method == "POST" and request.user.is_authenticated and form.is_valid():
         comment = form.save(commit=False)
@@ -91,7 +127,12 @@ def post_detail(request, pk):
         comment.author = request.user
         comment.save()
         return redirect('post_detail', pk=pk)
-    return render(request, 'blog/post_detail.html', {'post': post, 'comments': comments, 'form': form})
+    return render(request, 'blog/post_detail.html', {
+        'post': post,
+        'comments': comments,
+        'form': form,
+        **fragment_context(post),
+    })
 
 @login_required
 def comment_edit(request, pk):
@@ -140,28 +181,59 @@ class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     def test_func(self):
         return self.request.user == self.get_object().author
     def get_success_url(self):
-        return reverse_lazy('post-detail', kwargs={'pk': self.get_object().post.pk}')
+        return reverse_lazy('post-detail', kwargs={'pk': self.get_object().post.pk})
 
 # --- Search Functionality ---
 
 def search_posts(request):
     query = request.GET.get('q', '')
-    results = Post.objects.filter(
-        Q(title__icontains=query) |
-        Q(content__icontains=query) |
-        Q(tags__name__icontains=query)
-    ).distinct()
-    return render(request, 'blog/search_results.html', {'posts': results, 'query': query})
+    # Ranked ids come from the full-text index (blog.search); only the
+    # current page of posts is loaded.
+    paginator = Paginator(SearchResults(query), 10)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(request, 'blog/search_results.html', {
+        'posts': page_obj.object_list,
+        'page_obj': page_obj,
+        'query': query,
+    })
 
 # --- Filter by Tag View ---
 
 class PostByTagListView(ListView):
     template_name = 'blog/posts_by_tag.html'
     context_object_name = 'posts'
+    paginate_by = 10
     def get_queryset(self):
-        return Post.objects.filter(tags__slug=self.kwargs['tag_slug']).distinct()
+        # Pages of post ids are cached per tag (blog.tag_stats); the count is
+        # the tag's TagStat, read with the tag.
+        self.tag = Tag.objects.select_related('blog_stat').filter(slug=self.kwargs['tag_slug']).first()
+        if self.tag is None:
+            return TagPostList(None)
+        stat = getattr(self.tag, 'blog_stat', None)
+        return TagPostList(self.tag.pk, stat.post_count if stat else 0)
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx['tag_slug'] = self.kwargs['tag_slug']
+        ctx['tag'] = self.tag
+        ctx['tag_name'] = self.tag.name if self.tag else self.kwargs['tag_slug']
         return ctx
 
+# --- Tag statistics API ---
+
+def tag_stats_api(request):
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+    except ValueError:
+        limit = 20
+    tags = popular_tags(limit)
+    return JsonResponse({
+        'tags': [{'name': tag.name, 'slug': tag.slug, 'post_count': tag.post_count} for tag in tags],
+    })
+
+def related_tags_api(request, tag_slug):
+    tag = get_object_or_404(Tag, slug=tag_slug)
+    return JsonResponse({
+        'tag': tag.slug,
+        'related': [{'name': other.name, 'slug': other.slug, 'count': other.count} for other in related_tags(tag.pk)],
+    })
+
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'django_blog.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -148,3 +149,23 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Request metrics (django_blog.instrumentation): Server-Timing headers,
+# in-memory percentiles over the last REQUEST_METRICS_WINDOW requests per
+# route, and per-route budgets, e.g. {'home': {'queries': 10, 'db_ms': 50}}.
+# REQUEST_BUDGET_ACTION is 'log' or 'raise'.
+REQUEST_SERVER_TIMING = DEBUG
+REQUEST_METRICS_WINDOW = 1000
+REQUEST_BUDGETS = {}
+REQUEST_BUDGET_ACTION = 'log'
+SLOW_QUERY_MS = 200
+
+# Blog search (blog.search): 'auto' uses the FTS5/tsvector table when the
+# database has one and the in-process inverted index otherwise; 'like' and
+# 'memory' force a backend. The inverted index snapshot lives in SEARCH_INDEX_DIR.
+BLOG_SEARCH_BACKEND = 'auto'
+SEARCH_INDEX_DIR = BASE_DIR / 'search_index'
+
+# Post list/detail fragments (blog.caching) are versioned, so this only bounds
+# how long unused ones stay in the cache.
+BLOG_FRAGMENT_CACHE_SECONDS = 3600
@@ -0,0 +1,172 @@
+"""
+Token authentication with a two-tier lookup cache.
+
+DRF's `TokenAuthentication` runs a Token + User join on every request.
+`CachedTokenAuthentication` keeps a snapshot of the token and its user (every
+user column except the password hash) in:
+
+* a bounded in-process LRU (`TOKEN_AUTH_LOCAL_MAX_ENTRIES` entries, each
+  trusted for `TOKEN_AUTH_LOCAL_SECONDS`), so repeat requests to the same
+  worker need no I/O at all, and
+* the shared Django cache (`TOKEN_AUTH_CACHE_SECONDS`), so other workers
+  skip the database too.
+
+Every token has a version in the shared cache. A snapshot is stored with
+the version read *before* its database lookup and only served while that
+version is current. Deleting a token or saving its user (deactivation,
+password change, ...) bumps the version after the transaction commits, so a
+request that read the token before the change can't cache it afterwards.
+Other processes' local tiers can serve the old snapshot for at most
+`TOKEN_AUTH_LOCAL_SECONDS`; keep it short.
+
+Cached keys are SHA-256 digests, so raw tokens never reach the cache.
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def _token_key(key):
+    return 'accounts:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _version_key(cache_key):
+    return f'{cache_key}:version'
+
+
+def _shared_seconds():
+    return getattr(settings, 'TOKEN_AUTH_CACHE_SECONDS', 300)
+
+
+def _snapshot_fields(user_model):
+    return [field for field in user_model._meta.concrete_fields if field.attname != 'password']
+
+
+def _snapshot(token):
+    # Plain token and user column values, without the password hash. Raw
+    # values, not attributes: a FieldFile would pickle the whole instance.
+    user = token.user
+    values = [field.get_prep_value(getattr(user, field.attname)) for field in _snapshot_fields(type(user))]
+    return token.key, token.created, values
+
+
+def _restore(data):
+    # Token and user rebuilt from _snapshot(); the password is left deferred,
+    # so it is loaded on access and never overwritten by save().
+    key, created, values = data
+    user_model = get_user_model()
+    field_names = [field.attname for field in _snapshot_fields(user_model)]
+    user = user_model.from_db(router.db_for_read(user_model), field_names, values)
+    token = Token.from_db(router.db_for_read(Token), ['key', 'user_id', 'created'], [key, user.pk, created])
+    token.user = user
+    return token
+
+
+class TokenCache:
+
+    def __init__(self):
+        # {cache key: (monotonic expiry, pickled snapshot)}, least recently used first.
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _version(self, cache_key):
+        version = cache.get(_version_key(cache_key))
+        if version is None:
+            # A lost version is replaced by a new one, which only invalidates.
+            cache.add(_version_key(cache_key), time.time_ns(), _shared_seconds() * 2)
+            version = cache.get(_version_key(cache_key)) or time.time_ns()
+        return version
+
+    def _remember(self, cache_key, data):
+        max_entries = getattr(settings, 'TOKEN_AUTH_LOCAL_MAX_ENTRIES', 10000)
+        expires = time.monotonic() + getattr(settings, 'TOKEN_AUTH_LOCAL_SECONDS', 10)
+        self._local[cache_key] = (expires, data)
+        self._local.move_to_end(cache_key)
+        while len(self._local) > max_entries:
+            self._local.popitem(last=False)
+
+    def get(self, key):
+        """
+        (Token with `.user` or None, version); pass the version to `set()` after a miss.
+        """
+        cache_key = _token_key(key)
+        with self._lock:
+            entry = self._local.get(cache_key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._local[cache_key]
+                entry = None
+            if entry is not None:
+                self._local.move_to_end(cache_key)
+                return _restore(pickle.loads(entry[1])), None
+        found = cache.get_many([cache_key, _version_key(cache_key)])
+        version = found.get(_version_key(cache_key))
+        if version is None:
+            return None, self._version(cache_key)
+        stored = found.get(cache_key)
+        if stored is None or stored[0] != version:
+            return None, version
+        with self._lock:
+            self._remember(cache_key, stored[1])
+        return _restore(pickle.loads(stored[1])), version
+
+    def set(self, key, token, version):
+        """
+        Cache `token`, read from the database after `get()` returned `version`.
+        """
+        cache_key = _token_key(key)
+        pickled = pickle.dumps(_snapshot(token), pickle.HIGHEST_PROTOCOL)
+        # A fill that lost a race with an invalidation carries the old
+        # version and is never served.
+        cache.set(cache_key, (version, pickled), _shared_seconds())
+        with self._lock:
+            if cache.get(_version_key(cache_key)) == version:
+                self._remember(cache_key, pickled)
+
+    def _forget(self, cache_key):
+        with self._lock:
+            cache.set(_version_key(cache_key), time.time_ns(), _shared_seconds() * 2)
+            self._local.pop(cache_key, None)
+        cache.delete(cache_key)
+
+    def invalidate(self, key):
+        self._forget(_token_key(key))
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    `TokenAuthentication` that answers repeat tokens from `token_cache`.
+    """
+
+    def authenticate_credentials(self, key):
+        token, version = token_cache.get(key)
+        if token is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if token.user.is_active:
+                token_cache.set(key, token, version)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
@@ -0,0 +1,187 @@
+"""
+Follower graph cached as compact id arrays.
+
+For every user the cache holds two sorted `array('q')` blobs: the ids they
+follow and the ids following them (8 bytes per id, against several times that
+for a pickled set). A blob is loaded from `UserFollower` on first use and
+after that kept current by the signals in `accounts.signals`, which insert or
+remove the one id a follow/unfollow changes instead of reloading it.
+
+Updates take a short cache lock per key. When an update can't be applied in
+place (the list isn't cached, or another writer holds the lock) the key is
+replaced by a short-lived `STALE` tombstone instead: a reader that queried
+the database before the change then fails its `cache.add`, so its older list
+is never cached, and reads go to the database until the tombstone expires.
+
+`FollowIds` answers membership with a binary search over the array and
+intersects two id lists with a merge, so "is A following B" and "who that
+you follow also follows B" need no query once both lists are cached.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserFollower
+
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+LOCK_SECONDS = 5
+# Marks a list that changed while it wasn't cached. It only has to outlive a
+# load already in flight; until it lapses that list is read from the database.
+STALE = 'stale'
+STALE_SECONDS = 5
+
+
+def _key(kind, user_id):
+    return f'accounts:{kind}:{user_id}'
+
+
+class FollowIds:
+    """
+    A sorted, read-only list of user ids.
+    """
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __contains__(self, user_id):
+        position = bisect_left(self.ids, user_id)
+        return position < len(self.ids) and self.ids[position] == user_id
+
+    def intersection(self, other):
+        """
+        Ids in both lists, ascending.
+        """
+        if not isinstance(other, FollowIds):
+            other = FollowIds(array('q', sorted(set(other))))
+        small, large = sorted((self, other), key=len)
+        if len(small) * 8 < len(large):
+            # Far apart in size: look each small id up in the large one.
+            return [user_id for user_id in small if user_id in large]
+        result, i, j = [], 0, 0
+        a, b = small.ids, large.ids
+        while i < len(a) and j < len(b):
+            if a[i] == b[j]:
+                result.append(a[i])
+                i += 1
+                j += 1
+            elif a[i] < b[j]:
+                i += 1
+            else:
+                j += 1
+        return result
+
+
+class FollowGraph:
+
+    def timeout(self):
+        return getattr(settings, 'FOLLOW_GRAPH_CACHE_SECONDS', 3600)
+
+    def _query(self, kind, user_ids):
+        if kind == FOLLOWING:
+            rows = UserFollower.objects.filter(from_user_id__in=user_ids).values_list('from_user_id', 'to_user_id')
+        else:
+            rows = UserFollower.objects.filter(to_user_id__in=user_ids).values_list('to_user_id', 'from_user_id')
+        found = {user_id: [] for user_id in user_ids}
+        for user_id, other_id in rows.iterator(chunk_size=5000):
+            found[user_id].append(other_id)
+        return {user_id: array('q', sorted(ids)) for user_id, ids in found.items()}
+
+    def _load(self, kind, user_ids):
+        """
+        {user_id: array} for `user_ids`, from the cache or (for misses) one query.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        keys = {_key(kind, user_id): user_id for user_id in user_ids}
+        cached = cache.get_many(keys)
+        result = {}
+        for key, data in cached.items():
+            if data == STALE:
+                continue
+            ids = array('q')
+            ids.frombytes(data)
+            result[keys[key]] = ids
+        missing = [user_id for user_id in user_ids if user_id not in result]
+        if missing:
+            loaded = self._query(kind, missing)
+            for user_id, ids in loaded.items():
+                # add(), not set(): fails if the list was updated or
+                # tombstoned since the query above, which may predate that change.
+                cache.add(_key(kind, user_id), ids.tobytes(), self.timeout())
+            result.update(loaded)
+        return result
+
+    def following(self, user_id):
+        return FollowIds(self._load(FOLLOWING, [user_id])[user_id])
+
+    def followers(self, user_id):
+        return FollowIds(self._load(FOLLOWERS, [user_id])[user_id])
+
+    def is_following(self, follower_id, author_id):
+        return author_id in self.following(follower_id)
+
+    def followed_by_following(self, user_id, target_id):
+        """
+        Ids of the people `user_id` follows who follow `target_id`.
+        """
+        return self.following(user_id).intersection(self.followers(target_id))
+
+    def counts(self, user_ids):
+        """
+        {user_id: {'followers': n, 'following': m}} with one cache round trip per kind.
+        """
+        followers = self._load(FOLLOWERS, user_ids)
+        following = self._load(FOLLOWING, user_ids)
+        return {
+            user_id: {'followers': len(followers[user_id]), 'following': len(following[user_id])}
+            for user_id in followers
+        }
+
+    def _update(self, kind, user_id, other_id, add):
+        key = _key(kind, user_id)
+        lock = f'{key}:lock'
+        if not cache.add(lock, 1, LOCK_SECONDS):
+            cache.set(key, STALE, STALE_SECONDS)
+            return
+        try:
+            data = cache.get(key)
+            if data is None or data == STALE:
+                # A load may be in flight with the list from before this change.
+                cache.set(key, STALE, STALE_SECONDS)
+                return
+            ids = array('q')
+            ids.frombytes(data)
+            position = bisect_left(ids, other_id)
+            present = position < len(ids) and ids[position] == other_id
+            if add and not present:
+                ids.insert(position, other_id)
+            elif not add and present:
+                del ids[position]
+            else:
+                return
+            cache.set(key, ids.tobytes(), self.timeout())
+        finally:
+            cache.delete(lock)
+
+    def followed(self, follower_id, author_id):
+        self._update(FOLLOWING, follower_id, author_id, add=True)
+        self._update(FOLLOWERS, author_id, follower_id, add=True)
+
+    def unfollowed(self, follower_id, author_id):
+        self._update(FOLLOWING, follower_id, author_id, add=False)
+        self._update(FOLLOWERS, author_id, follower_id, add=False)
+
+    def forget(self, *user_ids):
+        keys = [_key(kind, user_id) for user_id in user_ids for kind in (FOLLOWING, FOLLOWERS)]
+        cache.set_many(dict.fromkeys(keys, STALE), STALE_SECONDS)
+
+
+follow_graph = FollowGraph()
@@ -0,0 +1,63 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from accounts.authentication import CachedTokenAuthentication, token_cache
+
+
+class WhoAmIView(APIView):
+
+    def get(self, request):
+        return Response({'id': request.user.pk})
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare TokenAuthentication with CachedTokenAuthentication: queries and time per request "
+        "for a view that only reads request.user. Sample users are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000, help="Requests per run.")
+        parser.add_argument('--users', type=int, default=100, help="Distinct tokens the requests cycle through.")
+
+    def run(self, authentication_class, keys, count):
+        view = WhoAmIView.as_view(authentication_classes=[authentication_class])
+        factory = APIRequestFactory()
+        requests = [factory.get('/', HTTP_AUTHORIZATION=f'Token {keys[i % len(keys)]}') for i in range(count)]
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for request in requests:
+                response = view(request)
+                assert response.status_code == 200, response.data
+            elapsed = time.perf_counter() - start
+        return len(queries) / count, elapsed / count
+
+    def handle(self, *args, **options):
+        count, users = options['requests'], options['users']
+        with transaction.atomic():
+            User = get_user_model()
+            created = User.objects.bulk_create([User(username=f'bench-token-{i}') for i in range(users)])
+            keys = [Token.objects.create(user=user).key for user in created]
+            token_cache.clear_local()
+            results = {
+                'TokenAuthentication': self.run(TokenAuthentication, keys, count),
+                'CachedTokenAuthentication': self.run(CachedTokenAuthentication, keys, count),
+            }
+            for key in keys:
+                token_cache.invalidate(key)
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{count} requests over {users} tokens (includes the cold first request per token):")
+        for name, (queries, seconds) in results.items():
+            self.stdout.write(f"  {name:<26} {queries:6.3f} queries/request {seconds * 1e6:9.1f} us/request")
+        removed = results['TokenAuthentication'][0] - results['CachedTokenAuthentication'][0]
+        self.stdout.write(self.style.SUCCESS(f"  Cached lookup removes {removed:.3f} queries per request."))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.recommendations import build_suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every user's \"who to follow\" suggestions from the follow graph. "
+        "Meant to run periodically (e.g. nightly from cron); the suggestions endpoint only reads the results."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Users whose suggestions are replaced per transaction.")
+        parser.add_argument('--limit', type=int, help="Suggestions per user; defaults to FOLLOW_SUGGESTIONS_PER_USER.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        start = time.perf_counter()
+        users, written = build_suggestions(batch_size=options['batch_size'], limit=options['limit'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} suggestions for {users} users in {elapsed:.1f} s."))
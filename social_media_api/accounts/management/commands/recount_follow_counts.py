@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import CustomUser, UserFollower
+
+
+def _count_of(field):
+    rows = UserFollower.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk'))
+    return Coalesce(Subquery(rows.values('total')), 0)
+
+
+class Command(BaseCommand):
+    help = "Recompute CustomUser.followers_count and following_count from the UserFollower table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help="Number of user ids updated per UPDATE statement.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = CustomUser.objects.aggregate(last=Max('pk'))['last'] or 0
+        updated = 0
+        # One correlated UPDATE per id range keeps each transaction short.
+        for start in range(0, last_id + 1, batch_size):
+            updated += CustomUser.objects.filter(pk__gte=start, pk__lt=start + batch_size).update(
+                followers_count=_count_of('to_user'),
+                following_count=_count_of('from_user'),
+            )
+        self.stdout.write(self.style.SUCCESS(f"Recounted followers and following for {updated} users."))
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_followers(apps, schema_editor):
+    # The auto-created through table stores (followed, follower) as
+    # (from_customuser, to_customuser); UserFollower stores follower -> followed.
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    UserFollower = apps.get_model('accounts', 'UserFollower')
+    rows = CustomUser.followers.through.objects.values_list('from_customuser_id', 'to_customuser_id')
+    UserFollower.objects.bulk_create(
+        [UserFollower(from_user_id=follower, to_user_id=followed) for followed, follower in rows.iterator()],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_customuser_bio_alter_customuser_followers'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='bio',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='UserFollower',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('from_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='following_set', to=settings.AUTH_USER_MODEL)),
+                ('to_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='follower_set', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('from_user', 'to_user')},
+            },
+        ),
+        migrations.RunPython(copy_followers, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='followers',
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='followers',
+            field=models.ManyToManyField(blank=True, related_name='following', through='accounts.UserFollower', through_fields=('to_user', 'from_user'), to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    UserFollower = apps.get_model('accounts', 'UserFollower')
+
+    def count_of(field):
+        rows = UserFollower.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk'))
+        return Coalesce(Subquery(rows.values('total')), 0)
+
+    CustomUser.objects.update(followers_count=count_of('to_user'), following_count=count_of('from_user'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_userfollower'),
+    ]
+
+    operations = [
+        # Build the composite indexes before dropping the single-column ones they replace.
+        migrations.AddIndex(
+            model_name='userfollower',
+            index=models.Index(fields=['to_user', '-created_at', '-id'], name='accounts_follower_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userfollower',
+            index=models.Index(fields=['from_user', '-created_at', '-id'], name='accounts_following_recent_idx'),
+        ),
+        migrations.AlterField(
+            model_name='userfollower',
+            name='from_user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='following_set', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='userfollower',
+            name='to_user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='follower_set', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
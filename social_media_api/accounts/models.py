@@ -1,7 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+
 
 class CustomUser(AbstractUser):
     """
@@ -14,44 +13,55 @@ class CustomUser(AbstractUser):
         "self",
         symmetrical=False,
         through="UserFollower",
+        through_fields=("to_user", "from_user"),
         related_name="following",
+        blank=True,
     )
+    # Denormalized from UserFollower by accounts.signals; repaired by the
+    # recount_follow_counts command.
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Set on every save; post ETags (posts.conditional) use it to notice a
+    # renamed author.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.username
 
 
 class UserFollower(models.Model):
     """
     Intermediate model to handle the followers relationship.
+
+    A row means `from_user` follows `to_user`.
     """
-    from_user = models.ForeignKey(CustomUser, related_name="following_set", on_delete=models.CASCADE)
-    to_user = models.ForeignKey(CustomUser, related_name="follower_set", on_delete=models.CASCADE)
+    from_user = models.ForeignKey(CustomUser, related_name="following_set", on_delete=models.CASCADE, db_index=False)
+    to_user = models.ForeignKey(CustomUser, related_name="follower_set", on_delete=models.CASCADE, db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ('from_user', 'to_user')
+        indexes = [
+            # Newest-first follower and following pages (and follower counts).
+            models.Index(fields=['to_user', '-created_at', '-id'], name='accounts_follower_recent_idx'),
+            models.Index(fields=['from_user', '-created_at', '-id'], name='accounts_following_recent_idx'),
+        ]
 
 
-class CustomUser(AbstractUser):
-    bio = models.TextField(blank=True, null=True)
-    profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
-    followers = models.ManyToManyField(
-        'self', 
-        symmetrical=False, 
-        related_name='following',
-        blank=True
-    )
-
-    def __str__(self):
-        return self.username
-
-class CustomUser(AbstractUser):
+class FollowSuggestion(models.Model):
     """
-    Extend Django's AbstractUser with additional fields.
+    A precomputed "who to follow" entry, written by build_follow_suggestions.
+
+    `mutual_count` is how many of the people `user` follows follow
+    `suggested`; popularity fallbacks have 0.
     """
-    bio = models.TextField(blank=True, null=True)
-    profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
-    followers = models.ManyToManyField(
-        'self',
-        symmetrical=False,
-        related_name='following',
-        blank=True
-    )
+    user = models.ForeignKey(CustomUser, related_name="follow_suggestions", on_delete=models.CASCADE, db_index=False)
+    suggested = models.ForeignKey(CustomUser, related_name="+", on_delete=models.CASCADE)
+    score = models.FloatField()
+    mutual_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-score', 'suggested'], name='accounts_suggestion_user_idx'),
+        ]
@@ -0,0 +1,130 @@
+"""
+"Who to follow" suggestions, computed offline.
+
+`build_suggestions()` loads the whole follow graph with one query into a CSR
+adjacency matrix (an offsets array and a targets array, 8 bytes per edge)
+and scores every user against it in memory:
+
+* friends of friends: row `u` of A·A, i.e. for every account `u` follows,
+  the accounts *they* follow, counted with `Counter.update` over array
+  slices. The count is the number of people `u` follows who follow the
+  candidate.
+* popularity: the most-followed accounts fill any remaining slots, scored
+  below every friend-of-friend.
+
+Accounts `u` already follows (and `u` itself) are never suggested. Results
+replace each batch of users' `FollowSuggestion` rows in one DELETE plus one
+bulk INSERT, so there is no per-user query; the request path only reads them.
+"""
+import heapq
+from array import array
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import CustomUser, FollowSuggestion, UserFollower
+
+
+def suggestions_per_user():
+    return getattr(settings, 'FOLLOW_SUGGESTIONS_PER_USER', 20)
+
+
+class FollowAdjacency:
+    """
+    The follow graph as a CSR sparse matrix: the ids user `u` follows are
+    `targets[offsets[rows[u]]:offsets[rows[u] + 1]]`, sorted.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.offsets = array('q', [0])
+        self.targets = array('q')
+
+    @classmethod
+    def load(cls):
+        adjacency = cls()
+        edges = UserFollower.objects.order_by('from_user_id', 'to_user_id').values_list('from_user_id', 'to_user_id')
+        current = None
+        for from_id, to_id in edges.iterator(chunk_size=10000):
+            if from_id != current:
+                if current is not None:
+                    adjacency.offsets.append(len(adjacency.targets))
+                adjacency.rows[from_id] = len(adjacency.rows)
+                current = from_id
+            adjacency.targets.append(to_id)
+        if current is not None:
+            adjacency.offsets.append(len(adjacency.targets))
+        return adjacency
+
+    def following(self, user_id):
+        row = self.rows.get(user_id)
+        if row is None:
+            return ()
+        # A memoryview slice iterates the ids without copying them.
+        return memoryview(self.targets)[self.offsets[row]:self.offsets[row + 1]]
+
+    def friends_of_friends(self, user_id):
+        """
+        Counter {candidate_id: people user_id follows who follow them}.
+        """
+        followed = self.following(user_id)
+        counts = Counter()
+        for friend_id in followed:
+            counts.update(self.following(friend_id))
+        for excluded in (user_id, *followed):
+            counts.pop(excluded, None)
+        return counts
+
+
+def popular_accounts(limit):
+    """
+    [(user_id, followers_count)] of the `limit` most-followed accounts.
+    """
+    return list(
+        CustomUser.objects.filter(followers_count__gt=0)
+        .order_by('-followers_count', 'pk')
+        .values_list('pk', 'followers_count')[:limit]
+    )
+
+
+def suggest(adjacency, user_id, popular, limit):
+    """
+    Up to `limit` unsaved FollowSuggestions for `user_id`, best first.
+    """
+    counts = adjacency.friends_of_friends(user_id)
+    best = heapq.nsmallest(limit, counts.items(), key=lambda item: (-item[1], item[0]))
+    suggestions = [
+        FollowSuggestion(user_id=user_id, suggested_id=candidate, score=float(mutuals), mutual_count=mutuals)
+        for candidate, mutuals in best
+    ]
+    if len(suggestions) < limit and popular:
+        taken = {user_id, *adjacency.following(user_id), *counts}
+        # Scaled into [0, 1) so a popular account never outranks a mutual.
+        top = popular[0][1] + 1
+        for candidate, followers in popular:
+            if candidate not in taken:
+                suggestions.append(FollowSuggestion(user_id=user_id, suggested_id=candidate, score=followers / top))
+                if len(suggestions) == limit:
+                    break
+    return suggestions
+
+
+def build_suggestions(batch_size=1000, limit=None):
+    """
+    Recompute every user's suggestions; returns (users, suggestions) written.
+    """
+    limit = limit or suggestions_per_user()
+    adjacency = FollowAdjacency.load()
+    # Enough spares for users who already follow most of the top accounts.
+    popular = popular_accounts(limit * 5)
+    user_ids = array('q', CustomUser.objects.order_by('pk').values_list('pk', flat=True))
+    written = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        suggestions = [entry for user_id in batch for entry in suggest(adjacency, user_id, popular, limit)]
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(user_id__in=batch).delete()
+            FollowSuggestion.objects.bulk_create(suggestions, batch_size=5000)
+        written += len(suggestions)
+    return len(user_ids), written
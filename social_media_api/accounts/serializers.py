@@ -2,25 +2,79 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework.authtoken.models import Token
 
+from .models import FollowSuggestion, UserFollower
 
 
 class CustomUserSerializer(serializers.ModelSerializer):
-    password = serializers.CharField()
+    password = serializers.CharField(write_only=True)
+
     class Meta:
         model = get_user_model()
-        fields = ['username', 'email', 'bio', 'profile_picture', 'followers', 'following']
+        # Counts, not the follower/following id lists: those are paged
+        # through FollowerListView and FollowingListView.
+        fields = ['id', 'username', 'email', 'password', 'bio', 'profile_picture', 'followers_count', 'following_count']
+        read_only_fields = ['followers_count', 'following_count']
 
     def create(self, validated_data):
         user = get_user_model().objects.create_user(**validated_data)
+        Token.objects.create(user=user)
         return user
-    
-    def create(self, validated_data):
-        user = get_user_model().objects.create_user(validated_data)
-        if 'password' in validated_data:
-            user.set_password(validated_data['password'])
-            user.save()
-            token = Token.objects.create(user=user)
-        return user, token
+
+
+class PublicUserSerializer(serializers.ModelSerializer):
+    """
+    What any signed-in user may see of another user's profile.
+    """
+
+    class Meta:
+        model = get_user_model()
+        fields = ['id', 'username', 'bio', 'profile_picture', 'followers_count', 'following_count']
+        read_only_fields = fields
+
+
+class OwnProfileSerializer(PublicUserSerializer):
+    """
+    The current user's own profile, which also shows their email address.
+    """
+
+    class Meta(PublicUserSerializer.Meta):
+        fields = PublicUserSerializer.Meta.fields + ['email']
+        read_only_fields = fields
+
+
+# Compact user stubs for the follower/following pages; the views load only
+# these columns.
+class FollowerSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='from_user_id')
+    username = serializers.CharField(source='from_user.username')
+    profile_picture = serializers.ImageField(source='from_user.profile_picture')
+    followed_at = serializers.DateTimeField(source='created_at')
+
+    class Meta:
+        model = UserFollower
+        fields = ['id', 'username', 'profile_picture', 'followed_at']
+
+
+class FollowingSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='to_user_id')
+    username = serializers.CharField(source='to_user.username')
+    profile_picture = serializers.ImageField(source='to_user.profile_picture')
+    followed_at = serializers.DateTimeField(source='created_at')
+
+    class Meta:
+        model = UserFollower
+        fields = ['id', 'username', 'profile_picture', 'followed_at']
+
+
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='suggested_id')
+    username = serializers.CharField(source='suggested.username')
+    profile_picture = serializers.ImageField(source='suggested.profile_picture')
+
+    class Meta:
+        model = FollowSuggestion
+        fields = ['id', 'username', 'profile_picture', 'mutual_count']
+
 
 class TokenSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,98 @@
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .graph import follow_graph
+from .models import CustomUser, UserFollower
+
+
+def follow_pairs(instance, reverse, pk_set):
+    # `user.followers.add(...)` sends reverse=False, `user.following.add(...)`
+    # sends reverse=True; normalise both to (follower_id, author_id).
+    if reverse:
+        return [(instance.pk, pk) for pk in pk_set]
+    return [(pk, instance.pk) for pk in pk_set]
+
+
+def _shift_counts(pairs, delta):
+    """
+    Add `delta` to the following/followers counts of every (follower, author) pair.
+    """
+    for field, ids in (('following_count', [f for f, _ in pairs]), ('followers_count', [a for _, a in pairs])):
+        by_count = {}
+        for user_id in ids:
+            by_count[user_id] = by_count.get(user_id, 0) + delta
+        # One UPDATE per distinct step: the `instance` side of an add/remove
+        # moves by len(pk_set), every other user by one.
+        steps = {}
+        for user_id, step in by_count.items():
+            steps.setdefault(step, []).append(user_id)
+        for step, user_ids in steps.items():
+            CustomUser.objects.filter(pk__in=user_ids).update(**{field: Greatest(F(field) + step, 0)})
+
+
+@receiver(m2m_changed, sender=UserFollower)
+def sync_follow_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        # Django only reports the pairs it actually inserted.
+        _shift_counts(follow_pairs(instance, reverse, pk_set), 1)
+    elif action in ('pre_remove', 'pre_clear'):
+        # remove() reports every id it was given, so count the rows that
+        # exist; locking them makes a concurrent unfollow wait and skip them.
+        side, other = ('from_user', 'to_user_id') if reverse else ('to_user', 'from_user_id')
+        rows = UserFollower.objects.select_for_update().filter(**{side: instance})
+        if action == 'pre_remove':
+            rows = rows.filter(**{f'{other}__in': pk_set})
+        _shift_counts(follow_pairs(instance, reverse, list(rows.values_list(other, flat=True))), -1)
+
+
+@receiver(m2m_changed, sender=UserFollower)
+def sync_follow_graph(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        related = instance.following if reverse else instance.followers
+        pk_set = set(related.values_list('pk', flat=True))
+        update = follow_graph.unfollowed
+    elif action == 'post_add':
+        update = follow_graph.followed
+    elif action == 'post_remove':
+        update = follow_graph.unfollowed
+    else:
+        return
+    # After commit, so a reader that loads the lists from the database in
+    # the meantime can't cache them without this change.
+    for follower_id, author_id in follow_pairs(instance, reverse, pk_set):
+        transaction.on_commit(lambda f=follower_id, a=author_id: update(f, a))
+
+
+@receiver(pre_delete, sender=CustomUser)
+def forget_deleted_user(sender, instance, **kwargs):
+    # The cascade deletes the user's UserFollower rows without m2m signals,
+    # so fix the other side's counts and drop every cached list that
+    # mentions them.
+    pairs = list(
+        UserFollower.objects.filter(Q(from_user=instance) | Q(to_user=instance)).values_list('from_user_id', 'to_user_id')
+    )
+    _shift_counts(pairs, -1)
+    user_ids = {instance.pk}.union(*pairs)
+    transaction.on_commit(lambda: follow_graph.forget(*user_ids))
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    # Read the key now; delete() clears it (it is the primary key).
+    key = instance.key
+    transaction.on_commit(lambda: token_cache.invalidate(key))
+
+
+@receiver(post_save, sender=CustomUser)
+def forget_user_snapshot(sender, instance, created, **kwargs):
+    # Any save may deactivate the user or change what request.user shows.
+    if not created:
+        # Looked up in the database, not the cache: a request may be about to
+        # cache this token from a read taken before the save.
+        for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+            transaction.on_commit(lambda key=key: token_cache.invalidate(key))
@@ -1,3 +1,358 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from posts.tests import IndexUsageMixin
+
+from .authentication import token_cache
+from .graph import FollowIds, follow_graph
+from .models import FollowSuggestion, UserFollower
+from .recommendations import FollowAdjacency, build_suggestions
+
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RegistrationTestCase(TestCase):
+
+    def test_anonymous_user_can_register_and_log_in(self):
+        client = APIClient()
+        response = client.post('/accounts/register/', {'username': 'newbie', 'email': 'n@example.com', 'password': 'pass1234'})
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertNotIn('password', response.data)
+
+        response = client.post('/accounts/login/', {'username': 'newbie', 'password': 'pass1234'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['token'], Token.objects.get(user__username='newbie').key)
+
+        response = client.post('/accounts/login/', {'username': 'newbie', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FollowGraphTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob, self.carol, self.dave = (
+            User.objects.create_user(username=name, password="pass1234") for name in ('alice', 'bob', 'carol', 'dave')
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def follow(self, follower, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            follower.following.add(author)
+
+    def test_lists_are_loaded_once_then_served_from_cache(self):
+        self.follow(self.alice, self.bob)
+        self.follow(self.carol, self.bob)
+        # Let the tombstones left by following uncached lists lapse.
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(list(follow_graph.followers(self.bob.pk)), sorted([self.alice.pk, self.carol.pk]))
+        self.assertTrue(follow_graph.is_following(self.carol.pk, self.bob.pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(self.carol.pk, self.bob.pk))
+            self.assertFalse(follow_graph.is_following(self.carol.pk, self.alice.pk))
+            self.assertEqual(len(follow_graph.followers(self.bob.pk)), 2)
+
+    def test_follow_and_unfollow_views_update_cached_lists(self):
+        follow_graph.following(self.alice.pk)
+        follow_graph.followers(self.bob.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/accounts/follow/{self.bob.pk}/')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(self.alice.pk, self.bob.pk))
+            self.assertIn(self.alice.pk, follow_graph.followers(self.bob.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/accounts/unfollow/{self.bob.pk}/')
+        with self.assertNumQueries(0):
+            self.assertFalse(follow_graph.is_following(self.alice.pk, self.bob.pk))
+        self.assertFalse(UserFollower.objects.exists())
+
+        response = self.client.post('/accounts/follow/999999/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_load_racing_a_follow_is_not_cached(self):
+        query = follow_graph._query
+
+        def racing_query(kind, user_ids):
+            # The follow commits after this read but before it is cached.
+            rows = query(kind, user_ids)
+            self.follow(self.alice, self.bob)
+            return rows
+
+        with mock.patch.object(follow_graph, '_query', racing_query):
+            self.assertNotIn(self.alice.pk, follow_graph.followers(self.bob.pk))
+        self.assertIn(self.alice.pk, follow_graph.followers(self.bob.pk))
+
+    def test_followed_by_following_and_counts(self):
+        for follower in (self.alice, self.carol):
+            self.follow(follower, self.bob)
+        self.follow(self.alice, self.carol)
+        self.follow(self.alice, self.dave)
+        self.follow(self.dave, self.bob)
+
+        self.assertEqual(follow_graph.followed_by_following(self.alice.pk, self.bob.pk), sorted([self.carol.pk, self.dave.pk]))
+        self.assertEqual(follow_graph.counts([self.alice.pk, self.bob.pk]), {
+            self.alice.pk: {'followers': 0, 'following': 3},
+            self.bob.pk: {'followers': 3, 'following': 0},
+        })
+
+    def test_deleting_a_user_drops_them_from_cached_lists(self):
+        self.follow(self.alice, self.bob)
+        follow_graph.following(self.alice.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.delete()
+        self.assertEqual(list(follow_graph.following(self.alice.pk)), [])
+
+    def test_intersection_of_lopsided_lists(self):
+        small = FollowIds([3, 50, 999])
+        large = FollowIds(list(range(0, 1000, 2)))
+        self.assertEqual(small.intersection(large), [50])
+        self.assertEqual(large.intersection({4, 5, 6}), [4, 6])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FollowCountTestCase(IndexUsageMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob, self.carol = (
+            User.objects.create_user(username=name, email=f"{name}@example.com", password="pass1234") for name in ('alice', 'bob', 'carol')
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def counts(self, user):
+        user.refresh_from_db()
+        return user.followers_count, user.following_count
+
+    def test_follow_views_and_m2m_changes_keep_counts(self):
+        self.client.post(f'/accounts/follow/{self.bob.pk}/')
+        self.client.post(f'/accounts/follow/{self.bob.pk}/')
+        self.carol.following.add(self.alice, self.bob)
+        self.assertEqual(self.counts(self.alice), (1, 1))
+        self.assertEqual(self.counts(self.bob), (2, 0))
+        self.assertEqual(self.counts(self.carol), (0, 2))
+
+        # Removing a pair that doesn't exist changes nothing.
+        self.client.post(f'/accounts/unfollow/{self.carol.pk}/')
+        self.client.post(f'/accounts/unfollow/{self.bob.pk}/')
+        self.assertEqual(self.counts(self.alice), (1, 0))
+        self.assertEqual(self.counts(self.bob), (1, 0))
+
+        self.carol.following.clear()
+        self.assertEqual(self.counts(self.carol), (0, 0))
+        self.assertEqual(self.counts(self.alice), (0, 0))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+
+    def test_deleting_a_user_updates_the_other_side(self):
+        self.alice.following.add(self.bob)
+        self.carol.following.add(self.alice)
+        self.alice.delete()
+        self.assertEqual(self.counts(self.bob), (0, 0))
+        self.assertEqual(self.counts(self.carol), (0, 0))
+
+    def test_profile_shows_counts_and_relations_are_paginated(self):
+        for user in (self.bob, self.carol):
+            user.following.add(self.alice)
+        self.alice.refresh_from_db()
+        response = self.client.get('/accounts/profile/')
+        self.assertEqual((response.data['followers_count'], response.data['following_count']), (2, 0))
+        self.assertNotIn('followers', response.data)
+        self.assertEqual(response.data['email'], 'alice@example.com')
+
+        # Someone else's profile leaves out private fields.
+        response = self.client.get(f'/accounts/users/{self.bob.pk}/')
+        self.assertEqual(response.data['username'], 'bob')
+        self.assertNotIn('email', response.data)
+        self.assertNotIn('password', response.data)
+        response = self.client.get(f'/accounts/users/{self.alice.pk}/')
+        self.assertIn('email', response.data)
+
+        response = self.client.get(f'/accounts/{self.alice.pk}/followers/', {'page_size': 1})
+        self.assertEqual([item['username'] for item in response.data['results']], ['carol'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([item['username'] for item in response.data['results']], ['bob'])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(f'/accounts/{self.bob.pk}/following/')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.alice.pk])
+
+    def test_relation_pages_are_one_narrow_query(self):
+        for i in range(15):
+            User.objects.create_user(username=f"fan{i}", password="pass1234").following.add(self.bob)
+        with self.assertNumQueries(1) as queries:
+            response = self.client.get(f'/accounts/{self.bob.pk}/followers/')
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['results'][0]['username'], 'fan14')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'username', 'profile_picture', 'followed_at'})
+        self.assertNotIn('password', queries.captured_queries[0]['sql'])
+
+        seen = [item['id'] for item in response.data['results']]
+        response = self.client.get(response.data['next'])
+        seen += [item['id'] for item in response.data['results']]
+        self.assertEqual(len(set(seen)), 15)
+        self.assertIsNone(response.data['next'])
+
+    def test_relation_pages_walk_an_index(self):
+        for field, index in (('to_user', 'accounts_follower_recent_idx'), ('from_user', 'accounts_following_recent_idx')):
+            self.assertUsesIndex(UserFollower.objects.filter(**{field: self.bob}).order_by('-created_at', '-id'), index)
+
+    def test_recount_follow_counts_repairs_drift(self):
+        self.alice.following.add(self.bob)
+        User.objects.update(followers_count=5, following_count=5)
+        call_command('recount_follow_counts', stdout=StringIO())
+        self.assertEqual(self.counts(self.alice), (0, 1))
+        self.assertEqual(self.counts(self.bob), (1, 0))
+        self.assertEqual(self.counts(self.carol), (0, 0))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, FOLLOW_SUGGESTIONS_PER_USER=3)
+class FollowSuggestionTestCase(IndexUsageMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.users = {
+            name: User.objects.create_user(username=name, password="pass1234")
+            for name in ('alice', 'bob', 'carol', 'dave', 'erin', 'frank')
+        }
+        for follower, author in (
+            ('alice', 'bob'), ('alice', 'carol'), ('bob', 'dave'), ('bob', 'erin'),
+            ('carol', 'dave'), ('carol', 'alice'), ('erin', 'frank'),
+        ):
+            self.users[follower].following.add(self.users[author])
+        self.client = APIClient()
+        self.client.force_authenticate(self.users['alice'])
+
+    def suggested(self, name):
+        rows = FollowSuggestion.objects.filter(user=self.users[name]).order_by('-score', 'suggested_id')
+        return [(row.suggested.username, row.mutual_count) for row in rows]
+
+    def test_adjacency_two_hop_counts(self):
+        adjacency = FollowAdjacency.load()
+        ids = {user.pk: name for name, user in self.users.items()}
+        counts = adjacency.friends_of_friends(self.users['alice'].pk)
+        self.assertEqual({ids[pk]: n for pk, n in counts.items()}, {'dave': 2, 'erin': 1})
+        self.assertEqual(list(adjacency.following(self.users['dave'].pk)), [])
+
+    def test_build_ranks_mutuals_then_popular_accounts(self):
+        # Load graph, popular accounts and user ids, then one DELETE + INSERT per batch.
+        with self.assertNumQueries(7):
+            self.assertEqual(build_suggestions(), (6, 18))
+        self.assertEqual(self.suggested('alice'), [('dave', 2), ('erin', 1), ('frank', 0)])
+        # No follows at all: popularity only, most-followed first.
+        self.assertEqual(self.suggested('frank'), [('dave', 0), ('alice', 0), ('bob', 0)])
+
+        # A rebuild replaces the old rows.
+        build_suggestions()
+        self.assertEqual(FollowSuggestion.objects.count(), 18)
+
+    def test_endpoint_reads_precomputed_rows_in_one_query(self):
+        call_command('build_follow_suggestions', stdout=StringIO())
+        follow_graph.following(self.users['alice'].pk)
+        with self.assertNumQueries(1):
+            response = self.client.get('/accounts/suggestions/')
+        self.assertEqual([(item['username'], item['mutual_count']) for item in response.data], [
+            ('dave', 2), ('erin', 1), ('frank', 0),
+        ])
+
+        # Accounts followed since the last build are left out.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.users['alice'].following.add(self.users['dave'])
+        response = self.client.get('/accounts/suggestions/')
+        self.assertEqual([item['username'] for item in response.data], ['erin', 'frank'])
+
+    def test_suggestions_read_through_index(self):
+        queryset = FollowSuggestion.objects.filter(user=self.users['alice']).order_by('-score', 'suggested_id')
+        self.assertUsesIndex(queryset, 'accounts_suggestion_user_idx')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, TOKEN_AUTH_LOCAL_MAX_ENTRIES=2)
+class CachedTokenAuthenticationTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear_local()
+        self.user = User.objects.create_user(username="alice", password="pass1234")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get(self):
+        return self.client.get(f'/accounts/{self.user.pk}/following/')
+
+    def test_repeat_requests_skip_the_token_query(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get().status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get().status_code, 200)
+        # Another process: only the shared tier is warm.
+        token_cache.clear_local()
+        with self.assertNumQueries(1):
+            self.get()
+        self.assertFalse(any(self.token.key in str(key) for key in cache._cache))
+
+    def test_local_tier_is_bounded(self):
+        self.get()
+        for name in ('bob', 'carol'):
+            token = Token.objects.create(user=User.objects.create_user(username=name))
+            APIClient().get('/accounts/suggestions/', HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(len(token_cache._local), 2)
+
+    def test_deleted_token_and_deactivated_user_are_rejected(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.get().status_code, 401)
+
+        self.user.is_active = True
+        self.user.save()
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_fill_that_raced_an_invalidation_is_not_served(self):
+        key = self.token.key
+        # A request misses and reads the token from the database...
+        token, version = token_cache.get(key)
+        self.assertIsNone(token)
+        stale = Token.objects.select_related('user').get(key=key)
+        # ...the token is revoked and invalidated before it caches it.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        token_cache.set(key, stale, version)
+        self.assertIsNone(token_cache.get(key)[0])
+        token_cache.clear_local()
+        self.assertIsNone(token_cache.get(key)[0])
+
+    def test_snapshot_leaves_out_the_password_hash(self):
+        self.get()
+        token_cache.clear_local()
+        for value in cache._cache.values():
+            self.assertNotIn(self.user.password.encode(), value)
+        user = token_cache.get(self.token.key)[0].user
+        self.assertEqual(user.username, 'alice')
+        # The password is loaded on access, and saving the snapshot keeps it.
+        user.bio = "hi"
+        user.save()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("pass1234"))
+
+    def test_bench_token_auth_reports_saved_queries(self):
+        out = StringIO()
+        call_command('bench_token_auth', requests=20, users=2, stdout=out)
+        self.assertIn('TokenAuthentication         1.000 queries/request', out.getvalue())
+        self.assertIn('CachedTokenAuthentication   0.100 queries/request', out.getvalue())
@@ -1,11 +1,16 @@
 from django.urls import path
-from .views import RegisterView, LoginView, ProfileView
-from .views import FollowUserView, UnfollowUserView
+from .views import RegisterUserView, LoginView, ProfileView
+from .views import FollowUserView, UnfollowUserView, FollowerListView, FollowingListView
+from .views import FollowSuggestionListView
 
 urlpatterns = [
-    path('register/', RegisterView.as_view(), name='register'),
+    path('register/', RegisterUserView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('profile/', ProfileView.as_view(), name='profile'),
+    path('users/<int:user_id>/', ProfileView.as_view(), name='user-profile'),
+    path('suggestions/', FollowSuggestionListView.as_view(), name='follow-suggestions'),
+    path('<int:user_id>/followers/', FollowerListView.as_view(), name='user-followers'),
+    path('<int:user_id>/following/', FollowingListView.as_view(), name='user-following'),
    path('follow/<int:user_id>/', FollowUserView.as_view(), name='follow-user'),
     path('unfollow/<int:user_id>/', UnfollowUserView.as_view(), name='unfollow-user'),
 ]
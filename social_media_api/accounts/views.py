@@ -3,17 +3,40 @@ from rest_framework.response import Response
 from django.contrib.auth import authenticate, get_user_model
 from rest_framework.authtoken.models import Token
 from rest_framework.views import APIView
-from .serializers import CustomUserSerializer, TokenSerializer
+from .graph import follow_graph
+from .recommendations import suggestions_per_user
+from .serializers import (
+    CustomUserSerializer, FollowerSerializer, FollowingSerializer, FollowSuggestionSerializer, OwnProfileSerializer,
+    PublicUserSerializer, TokenSerializer,
+)
 from rest_framework import permissions
-from accounts.models import CustomUser
+from accounts.models import CustomUser, FollowSuggestion, UserFollower
 
 # Create your views here.
 
 class RegisterUserView(generics.CreateAPIView):
     queryset = get_user_model().objects.all()
     serializer_class = CustomUserSerializer
+    permission_classes = [permissions.AllowAny]
+
+
+class ProfileView(generics.RetrieveAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_serializer_class(self):
+        # Only your own profile includes your email address.
+        if self.kwargs.get('user_id', self.request.user.pk) == self.request.user.pk:
+            return OwnProfileSerializer
+        return PublicUserSerializer
+
+    def get_object(self):
+        # Not request.user: that can be a cached snapshot (accounts.authentication)
+        # and the counts move without saving the user.
+        return generics.get_object_or_404(CustomUser, pk=self.kwargs.get('user_id', self.request.user.pk))
 
 class LoginView(APIView):
+    permission_classes = [permissions.AllowAny]
+
     def post(self, request):
         username = request.data.get('username')
         password = request.data.get('password')
@@ -37,10 +60,10 @@ class FollowUserView(generics.GenericAPIView):
 
     def post(self, request, user_id):
         try:
-            user_to_follow = User.objects.get(id=user_id)
+            user_to_follow = CustomUser.objects.get(id=user_id)
             request.user.following.add(user_to_follow)
             return Response({'status': 'followed'}, status=status.HTTP_200_OK)
-        except User.DoesNotExist:
+        except CustomUser.DoesNotExist:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
 class UnfollowUserView(generics.GenericAPIView):
@@ -49,8 +72,66 @@ class UnfollowUserView(generics.GenericAPIView):
 
     def post(self, request, user_id):
         try:
-            user_to_unfollow = User.objects.get(id=user_id)
+            user_to_unfollow = CustomUser.objects.get(id=user_id)
             request.user.following.remove(user_to_unfollow)
             return Response({'status': 'unfollowed'}, status=status.HTTP_200_OK)
-        except User.DoesNotExist:
+        except CustomUser.DoesNotExist:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
+STUB_FIELDS = ('username', 'profile_picture')
+
+
+class FollowerListView(generics.ListAPIView):
+    """
+    Users following `user_id`, most recent first, one keyset page at a time.
+    """
+    serializer_class = FollowerSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return (
+            UserFollower.objects.filter(to_user_id=self.kwargs['user_id'])
+            .select_related('from_user')
+            .only('created_at', 'from_user_id', *(f'from_user__{field}' for field in STUB_FIELDS))
+        )
+
+
+class FollowingListView(generics.ListAPIView):
+    """
+    Users `user_id` follows, most recent first, one keyset page at a time.
+    """
+    serializer_class = FollowingSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return (
+            UserFollower.objects.filter(from_user_id=self.kwargs['user_id'])
+            .select_related('to_user')
+            .only('created_at', 'to_user_id', *(f'to_user__{field}' for field in STUB_FIELDS))
+        )
+
+
+class FollowSuggestionListView(generics.ListAPIView):
+    """
+    The current user's precomputed "who to follow" list (build_follow_suggestions).
+
+    One query on (user, -score); accounts followed since the last build are
+    dropped using the cached follow graph.
+    """
+    serializer_class = FollowSuggestionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        return (
+            FollowSuggestion.objects.filter(user=self.request.user)
+            .select_related('suggested')
+            .only('score', 'mutual_count', 'suggested_id', *(f'suggested__{field}' for field in STUB_FIELDS))
+            .order_by('-score', 'suggested_id')[:suggestions_per_user()]
+        )
+
+    def list(self, request, *args, **kwargs):
+        following = follow_graph.following(request.user.pk)
+        suggestions = [entry for entry in self.get_queryset() if entry.suggested_id not in following]
+        return Response(self.get_serializer(suggestions, many=True).data)
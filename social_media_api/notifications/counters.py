@@ -0,0 +1,57 @@
+"""
+Per-user unread notification counter kept in the cache.
+
+The cached count is stored with the user's counter version, read *before*
+the COUNT that produced it, and only served while that version is current.
+The writer (after commit) and `mark_as_read` bump the version instead of
+adjusting the number, so a count that raced a write or a mark-as-read is
+never served: the next read recounts with one indexed COUNT. Polling
+`/notifications/unread_count/` between changes is a cache hit.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Notification
+
+
+def _key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def _version_key(user_id):
+    return f'notifications:unread:{user_id}:version'
+
+
+def _timeout():
+    return getattr(settings, 'NOTIFICATION_UNREAD_CACHE_SECONDS', 24 * 60 * 60)
+
+
+def _version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # A lost version is replaced by a new one, which only invalidates.
+        cache.add(_version_key(user_id), time.time_ns(), _timeout() * 2)
+        version = cache.get(_version_key(user_id)) or time.time_ns()
+    return version
+
+
+def unread_count(user_id):
+    found = cache.get_many([_key(user_id), _version_key(user_id)])
+    version = found.get(_version_key(user_id))
+    stored = found.get(_key(user_id))
+    if version is not None and stored is not None and stored[0] == version:
+        return stored[1]
+    if version is None:
+        version = _version(user_id)
+    count = Notification.objects.filter(recipient_id=user_id, read=False).count()
+    cache.set(_key(user_id), (version, count), _timeout())
+    return count
+
+
+def invalidate_unread(user_id):
+    """
+    Call after a committed change to the user's unread notifications.
+    """
+    cache.set(_version_key(user_id), time.time_ns(), _timeout() * 2)
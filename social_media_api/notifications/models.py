@@ -8,13 +8,30 @@ from posts.models import Post
 
 User = get_user_model()
 class Notification(models.Model):
-    recipient = models.ForeignKey(User, related_name='notifications', on_delete=models.CASCADE)
+    # Leads every index below.
+    recipient = models.ForeignKey(User, related_name='notifications', on_delete=models.CASCADE, db_index=False)
+    # Most recent actor when several events are coalesced into one row.
     actor = models.ForeignKey(User, related_name='actor_notifications', on_delete=models.CASCADE)
     verb = models.CharField(max_length=255)
     target_content_type = models.ForeignKey(ContentType, related_name='target_object', on_delete=models.CASCADE)
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
-    target = GenericForeignKey('target_content_type','post')
+    target = GenericForeignKey('target_content_type', 'post_id')
+    # Number of events folded into this row ("N people liked your post").
+    actor_count = models.PositiveIntegerField(default=1)
+    read = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Finds the open row to coalesce into for (recipient, verb, target).
+            models.Index(fields=['recipient', 'post', 'verb', '-timestamp'], name='notif_coalesce_idx'),
+            # Unread lists and mark_as_read for one recipient.
+            models.Index(fields=['recipient', 'read', '-timestamp'], name='notif_recipient_unread_idx'),
+            # All of one recipient's notifications, newest first.
+            models.Index(fields=['recipient', '-timestamp'], name='notif_recipient_time_idx'),
+        ]
     
     def __str__(self):
+        if self.actor_count > 1:
+            return f'{self.actor} and {self.actor_count - 1} others {self.verb} {self.target} to {self.recipient}'
         return f'{self.actor} {self.verb} {self.target} to {self.recipient}'
@@ -1,8 +1,27 @@
 from rest_framework import serializers
+from posts.fast_serializers import FastSerializer
 from .models import Notification
 
 class NotificationSerializer(serializers.ModelSerializer):
+    actor = serializers.ReadOnlyField(source='actor.username')
+    post_title = serializers.ReadOnlyField(source='post.title')
+
     class Meta:
         model = Notification
-        fields = ['id', 'recipient', 'actor', 'verb', 'target', 'timestamp']
-        depth = 1
+        fields = ['id', 'recipient', 'actor', 'actor_count', 'verb', 'post', 'post_title', 'read', 'timestamp']
+
+
+class NotificationFastSerializer(FastSerializer):
+    # Read-only list counterpart of NotificationSerializer.
+    model = Notification
+    fields = (
+        ('id', 'id'),
+        ('recipient', 'recipient_id'),
+        ('actor', 'actor__username'),
+        ('actor_count', 'actor_count'),
+        ('verb', 'verb'),
+        ('post', 'post_id'),
+        ('post_title', 'post__title'),
+        ('read', 'read'),
+        ('timestamp', 'timestamp'),
+    )
@@ -0,0 +1,284 @@
+"""
+Server-sent event stream of new notifications.
+
+A client keeps one connection to `/api/notifications/stream/` instead of
+polling the list endpoint. The stream sends every notification that is new or
+was coalesced since the client's last event, then waits on a broker until the
+writer publishes more for that recipient. A comment line is sent every
+`NOTIFICATION_STREAM_HEARTBEAT_SECONDS` to keep proxies from closing an idle
+connection, and the stream ends after `NOTIFICATION_STREAM_MAX_SECONDS` so
+workers are recycled; browsers reconnect with `Last-Event-ID` and resume where
+they stopped.
+
+Brokers only say "recipient X has something new"; the rows always come from
+the database. `InProcessBroker` works when the writer and the stream run in
+the same process. `CacheBroker` publishes a per-user version number through
+the Django cache so it also works across processes with a shared cache.
+Select one with `NOTIFICATION_STREAM_BROKER`.
+
+The view serves `event_stream()` under ASGI, where an idle stream costs a
+coroutine. Under WSGI (the default deployment) Django would buffer an async
+iterator until it finished, so `iter_events()`, the same stream as a plain
+generator, is sent instead; each open stream then holds a worker thread.
+"""
+import asyncio
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+from posts.pagination import KeysetPagination
+from .models import Notification
+from .serializers import NotificationSerializer
+
+_cursor_codec = KeysetPagination()
+
+
+class InProcessSubscription:
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def notify(self):
+        self._event.set()
+
+    def wait(self, timeout):
+        """
+        True if something was published before `timeout` seconds passed.
+        """
+        if not self._event.wait(timeout):
+            return False
+        self._event.clear()
+        return True
+
+
+class AsyncInProcessSubscription:
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+
+    def notify(self):
+        self._loop.call_soon_threadsafe(self._event.set)
+
+    async def wait(self, timeout):
+        """
+        True if something was published before `timeout` seconds passed.
+        """
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+
+class InProcessBroker:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def _add(self, user_id, subscription):
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def subscribe(self, user_id):
+        return self._add(user_id, InProcessSubscription())
+
+    async def asubscribe(self, user_id):
+        return self._add(user_id, AsyncInProcessSubscription())
+
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(user_id, None)
+
+    def publish(self, user_id):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.notify()
+
+
+class CacheSubscription:
+
+    def __init__(self, key, poll_seconds, version):
+        self._key = key
+        self._poll_seconds = poll_seconds
+        self._version = version
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            version = cache.get(self._key, 0)
+            if version != self._version:
+                self._version = version
+                return True
+            time.sleep(min(self._poll_seconds, max(0, deadline - time.monotonic())))
+        return False
+
+
+class AsyncCacheSubscription(CacheSubscription):
+
+    async def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            version = await sync_to_async(cache.get)(self._key, 0)
+            if version != self._version:
+                self._version = version
+                return True
+            await asyncio.sleep(min(self._poll_seconds, max(0, deadline - time.monotonic())))
+        return False
+
+
+class CacheBroker:
+
+    def _key(self, user_id):
+        return f'notifications:stream:{user_id}'
+
+    def _poll_seconds(self):
+        return getattr(settings, 'NOTIFICATION_STREAM_POLL_SECONDS', 1.0)
+
+    def subscribe(self, user_id):
+        key = self._key(user_id)
+        return CacheSubscription(key, self._poll_seconds(), cache.get(key, 0))
+
+    async def asubscribe(self, user_id):
+        key = self._key(user_id)
+        return AsyncCacheSubscription(key, self._poll_seconds(), await sync_to_async(cache.get)(key, 0))
+
+    def unsubscribe(self, user_id, subscription):
+        pass
+
+    def publish(self, user_id):
+        key = self._key(user_id)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, 'NOTIFICATION_STREAM_BROKER', 'notifications.stream.InProcessBroker'))()
+    return _broker
+
+
+def publish(user_ids):
+    broker = get_broker()
+    for user_id in user_ids:
+        broker.publish(user_id)
+
+
+def encode_event_id(notification):
+    return _cursor_codec.encode_cursor(notification.timestamp, notification.pk)
+
+
+def decode_event_id(value):
+    """
+    (timestamp, id) for a Last-Event-ID value, or None if it is not one of ours.
+    """
+    if not value:
+        return None
+    try:
+        return _cursor_codec.decode_cursor_value(value)
+    except ValueError:
+        return None
+
+
+def notifications_after(user_id, position, limit):
+    """
+    The recipient's notifications after `position`, oldest first.
+
+    Coalesced rows move forward in time, so they are sent again with their
+    new count.
+    """
+    rows = Notification.objects.filter(recipient_id=user_id).select_related('actor', 'post')
+    if position is not None:
+        timestamp, pk = position
+        rows = rows.filter(timestamp__gte=timestamp).exclude(timestamp=timestamp, pk__lte=pk)
+    return list(rows.order_by('timestamp', 'pk')[:limit])
+
+
+def format_event(notification):
+    data = json.dumps(NotificationSerializer(notification).data, cls=JSONEncoder)
+    return f'id: {encode_event_id(notification)}\nevent: notification\ndata: {data}\n\n'
+
+
+def latest_position(user_id):
+    latest = Notification.objects.filter(recipient_id=user_id).order_by('-timestamp', '-pk').first()
+    return None if latest is None else (latest.timestamp, latest.pk)
+
+
+def _stream_settings():
+    heartbeat = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT_SECONDS', 15)
+    deadline = time.monotonic() + getattr(settings, 'NOTIFICATION_STREAM_MAX_SECONDS', 300)
+    batch_size = getattr(settings, 'NOTIFICATION_STREAM_BATCH_SIZE', 100)
+    return heartbeat, deadline, batch_size
+
+
+def iter_events(user_id, position):
+    """
+    `event_stream()` as a blocking generator, for WSGI workers.
+    """
+    heartbeat, deadline, batch_size = _stream_settings()
+    broker = get_broker()
+    # Subscribe before the first read so nothing published in between is lost.
+    subscription = broker.subscribe(user_id)
+    try:
+        yield f'retry: {int(heartbeat * 1000)}\n\n'
+        if position is None:
+            position = latest_position(user_id)
+        while time.monotonic() < deadline:
+            rows = notifications_after(user_id, position, batch_size)
+            for notification in rows:
+                position = (notification.timestamp, notification.pk)
+                yield format_event(notification)
+            if len(rows) == batch_size:
+                continue
+            if not subscription.wait(min(heartbeat, max(0, deadline - time.monotonic()))):
+                yield ': heartbeat\n\n'
+    finally:
+        broker.unsubscribe(user_id, subscription)
+
+
+async def event_stream(user_id, position):
+    """
+    Yield SSE frames for `user_id`, starting after `position`.
+
+    With no position the stream starts from "now": only notifications written
+    after the connection opened are sent.
+    """
+    heartbeat, deadline, batch_size = _stream_settings()
+    broker = get_broker()
+    subscription = await broker.asubscribe(user_id)
+    fetch = sync_to_async(notifications_after)
+    try:
+        yield f'retry: {int(heartbeat * 1000)}\n\n'
+        if position is None:
+            position = await sync_to_async(latest_position)(user_id)
+        while time.monotonic() < deadline:
+            rows = await fetch(user_id, position, batch_size)
+            for notification in rows:
+                position = (notification.timestamp, notification.pk)
+                yield await sync_to_async(format_event)(notification)
+            if len(rows) == batch_size:
+                continue
+            if not await subscription.wait(min(heartbeat, max(0, deadline - time.monotonic()))):
+                yield ': heartbeat\n\n'
+    finally:
+        broker.unsubscribe(user_id, subscription)
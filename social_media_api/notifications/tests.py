@@ -0,0 +1,221 @@
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from posts.models import Post
+from posts.tests import IndexUsageMixin
+from .models import Notification
+from .stream import decode_event_id, encode_event_id, event_stream, iter_events
+from .writer import NotificationBatch, notification_queue, notify
+
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class NotificationWriterTestCase(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="pass1234")
+        self.fans = [User.objects.create_user(username=f"fan{i}", password="pass1234") for i in range(3)]
+        self.post = Post.objects.create(author=self.author, title="t", content="x")
+
+    def test_likes_on_one_post_coalesce_into_one_row(self):
+        for fan in self.fans:
+            client = APIClient()
+            client.force_authenticate(fan)
+            with self.captureOnCommitCallbacks(execute=True):
+                client.post(f'/api/posts/posts/{self.post.pk}/like/')
+        notification_queue.flush()
+
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.actor_count, 3)
+        self.assertEqual(notification.actor, self.fans[-1])
+
+    def test_later_batch_updates_the_open_row_in_place(self):
+        batch = NotificationBatch()
+        batch.add(self.author.pk, self.fans[0].pk, 'liked your post', self.post.pk)
+        batch.write()
+        batch.add(self.author.pk, self.fans[1].pk, 'liked your post', self.post.pk)
+        created, updated = batch.write()
+
+        self.assertEqual((len(created), len(updated)), (0, 1))
+        self.assertEqual(Notification.objects.get().actor_count, 2)
+
+    def test_counts_are_added_in_the_database(self):
+        batch = NotificationBatch()
+        batch.add(self.author.pk, self.fans[0].pk, 'liked your post', self.post.pk)
+        batch.write()
+        stale = Notification.objects.get()
+        # Another flush lands between reading the open row and writing it.
+        Notification.objects.update(actor_count=5)
+        batch.add(self.author.pk, self.fans[1].pk, 'liked your post', self.post.pk)
+        key = (self.author.pk, 'liked your post', self.post.pk)
+        with mock.patch.object(NotificationBatch, '_open_rows', return_value={key: stale}):
+            batch.write()
+        self.assertEqual(Notification.objects.get().actor_count, 6)
+
+    def test_rolled_back_like_sends_nothing(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                notify(self.author, self.fans[0], 'liked your post', self.post)
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+        notification_queue.flush()
+        self.assertFalse(Notification.objects.exists())
+
+    @override_settings(NOTIFICATION_MAX_PENDING=1)
+    def test_full_queue_is_flushed_on_the_timer_thread(self):
+        self.addCleanup(notification_queue.flush)
+        with mock.patch('notifications.writer.threading.Timer') as timer:
+            notification_queue.add(self.author.pk, self.fans[0].pk, 'liked your post', self.post.pk)
+        self.assertFalse(Notification.objects.exists())
+        timer.assert_called_once_with(0, notification_queue._flush_from_timer)
+        timer.return_value.start.assert_called_once_with()
+
+    @override_settings(NOTIFICATION_COALESCE_SECONDS=60)
+    def test_rows_outside_the_window_are_not_reused(self):
+        batch = NotificationBatch()
+        batch.add(self.author.pk, self.fans[0].pk, 'liked your post', self.post.pk)
+        batch.write()
+        Notification.objects.update(timestamp=Notification.objects.get().timestamp - timedelta(minutes=5))
+        batch.add(self.author.pk, self.fans[1].pk, 'liked your post', self.post.pk)
+        batch.write()
+
+        self.assertEqual(Notification.objects.count(), 2)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class UnreadCountTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", password="pass1234")
+        self.fan = User.objects.create_user(username="fan", password="pass1234")
+        self.posts = [Post.objects.create(author=self.author, title=f"p{i}", content="x") for i in range(2)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def write(self, post):
+        batch = NotificationBatch()
+        batch.add(self.author.pk, self.fan.pk, 'liked your post', post.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            batch.write()
+
+    def test_unread_count_is_served_from_the_cached_counter(self):
+        self.assertEqual(self.client.get('/api/notifications/unread_count/').data['unread_count'], 0)
+        for post in self.posts:
+            self.write(post)
+        self.assertEqual(self.client.get('/api/notifications/unread_count/').data['unread_count'], 2)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/notifications/unread_count/')
+        self.assertEqual(response.data['unread_count'], 2)
+
+    def test_update_and_delete_expire_the_counter(self):
+        for post in self.posts:
+            self.write(post)
+        self.assertEqual(self.client.get('/api/notifications/unread_count/').data['unread_count'], 2)
+        first, second = Notification.objects.all()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/notifications/{first.pk}/', {'read': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/notifications/unread_count/').data['unread_count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/notifications/{second.pk}/')
+        self.assertEqual(self.client.get('/api/notifications/unread_count/').data['unread_count'], 0)
+
+    def test_count_that_raced_a_write_is_not_served(self):
+        count = QuerySet.count
+        def count_then_write(queryset):
+            result = count(queryset)
+            if not Notification.objects.exists():
+                # Commits after the COUNT, before the count is cached.
+                self.write(self.posts[0])
+            return result
+
+        with mock.patch.object(QuerySet, 'count', autospec=True, side_effect=count_then_write):
+            self.assertEqual(self.client.get('/api/notifications/unread_count/').data['unread_count'], 0)
+        self.assertEqual(self.client.get('/api/notifications/unread_count/').data['unread_count'], 1)
+
+    def test_mark_as_read_resets_and_new_activity_counts_again(self):
+        self.write(self.posts[0])
+        self.assertEqual(self.client.get('/api/notifications/unread_count/').data['unread_count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/notifications/mark_as_read/')
+        self.assertEqual(self.client.get('/api/notifications/unread_count/').data['unread_count'], 0)
+        self.assertFalse(Notification.objects.filter(read=False).exists())
+
+        self.write(self.posts[0])
+        self.assertEqual(self.client.get('/api/notifications/unread_count/').data['unread_count'], 1)
+
+
+def take(stream, count):
+    async def collect():
+        frames = []
+        async for frame in stream:
+            frames.append(frame)
+            if len(frames) == count:
+                break
+        await stream.aclose()
+        return frames
+    return async_to_sync(collect)()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, NOTIFICATION_STREAM_HEARTBEAT_SECONDS=0.01, NOTIFICATION_STREAM_MAX_SECONDS=5)
+class NotificationStreamTestCase(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="pass1234")
+        self.fan = User.objects.create_user(username="fan", password="pass1234")
+        self.posts = [Post.objects.create(author=self.author, title=f"p{i}", content="x") for i in range(2)]
+        batch = NotificationBatch()
+        for post in self.posts:
+            batch.add(self.author.pk, self.fan.pk, 'liked your post', post.pk)
+        batch.write()
+        self.first, self.second = Notification.objects.order_by('timestamp', 'pk')
+
+    def test_resumes_after_last_event_id(self):
+        frames = take(event_stream(self.author.pk, decode_event_id(encode_event_id(self.first))), 2)
+        self.assertTrue(frames[0].startswith('retry:'))
+        self.assertIn(f'id: {encode_event_id(self.second)}\n', frames[1])
+        self.assertIn('"post_title": "p1"', frames[1])
+
+    def test_new_connection_starts_from_now_and_sends_heartbeats(self):
+        frames = take(event_stream(self.author.pk, None), 2)
+        self.assertEqual(frames[1], ': heartbeat\n\n')
+
+    def test_blocking_stream_sends_the_same_frames(self):
+        stream = iter_events(self.author.pk, decode_event_id(encode_event_id(self.first)))
+        frames = [next(stream), next(stream)]
+        stream.close()
+        self.assertIn(f'id: {encode_event_id(self.second)}\n', frames[1])
+
+    def test_wsgi_stream_is_not_buffered(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.author).key}')
+        response = client.get('/api/notifications/stream/', HTTP_LAST_EVENT_ID=encode_event_id(self.first))
+        self.assertFalse(response.is_async)
+        frames = iter(response.streaming_content)
+        self.assertTrue(next(frames).startswith(b'retry:'))
+        self.assertIn(f'id: {encode_event_id(self.second)}\n'.encode(), next(frames))
+        response.close()
+
+    def test_stream_requires_authentication(self):
+        response = self.client.get('/api/notifications/stream/')
+        self.assertEqual(response.status_code, 401)
+
+
+class IndexUsageTestCase(IndexUsageMixin, TestCase):
+
+    def test_recipient_notifications_newest_first(self):
+        user = User.objects.create_user(username="recipient", password="pass1234")
+        self.assertUsesIndex(
+            Notification.objects.filter(recipient=user).order_by('-timestamp'), 'notif_recipient_time_idx'
+        )
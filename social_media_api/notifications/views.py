@@ -1,18 +1,80 @@
-from rest_framework import viewsets, status
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import exceptions, viewsets, status
+from rest_framework.decorators import action
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from .counters import invalidate_unread, unread_count
 from .models import Notification
-from .serializers import NotificationSerializer
+from posts.fast_serializers import FastListMixin
+from posts.query_planning import QueryPlanMixin
+from .serializers import NotificationFastSerializer, NotificationSerializer
+from .stream import decode_event_id, event_stream, iter_events
 
 # Create your views here.
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(QueryPlanMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
+    fast_serializer_class = NotificationFastSerializer
+    # Keyset pagination orders by (timestamp, id) instead of created_at.
+    keyset_field = 'timestamp'
 
     def get_queryset(self):
-        return self.queryset.filter(recipient=self.request.user).order_by('-timestamp')
+        return super().get_queryset().filter(recipient=self.request.user).order_by('-timestamp')
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        user_id = self.request.user.pk
+        transaction.on_commit(lambda: invalidate_unread(user_id))
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        user_id = self.request.user.pk
+        transaction.on_commit(lambda: invalidate_unread(user_id))
 
     @action(detail=False, methods=['post'])
     def mark_as_read(self, request):
         notifications = self.get_queryset().filter(read=False)
         notifications.update(read=True)
+        user_id = request.user.pk
+        transaction.on_commit(lambda: invalidate_unread(user_id))
         return Response({'status': 'notifications marked as read'}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        # Served from the per-user cached counter; only a cache miss hits the table.
+        return Response({'unread_count': unread_count(request.user.pk)})
+
+
+def _authenticate(request):
+    # DRF views are sync-only, so run the configured authentication classes by hand.
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        return drf_request.user
+    except exceptions.AuthenticationFailed:
+        return None
+
+
+async def notification_stream(request):
+    """
+    Server-sent events for the authenticated user's new notifications.
+
+    Under ASGI (`social_media_api.asgi`) an idle stream costs a coroutine.
+    Under WSGI Django would buffer an async iterator until the stream ended,
+    so a blocking generator is sent instead and holds the worker thread.
+    """
+    user = await sync_to_async(_authenticate)(request)
+    if user is None or not user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    stream = event_stream if isinstance(request, ASGIRequest) else iter_events
+    response = StreamingHttpResponse(
+        stream(user.pk, decode_event_id(last_event_id)),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
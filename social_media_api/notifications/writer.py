@@ -0,0 +1,195 @@
+"""
+Batched, coalescing notification writer.
+
+Events are grouped by (recipient, verb, post). A group that already has a row
+newer than `NOTIFICATION_COALESCE_SECONDS` is folded into it - `actor_count`
+goes up, `actor` and `timestamp` move to the latest event - so a popular post
+produces one "N people liked your post" row per window instead of one row per
+like. Everything else is written with a single `bulk_create`.
+
+`notification_queue` collects events from request handlers and writes them
+together once `NOTIFICATION_MAX_PENDING` are queued or
+`NOTIFICATION_FLUSH_SECONDS` after the first one. Both run on the timer
+thread, never in the request that queued the event.
+"""
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, transaction
+from django.db.models import BigIntegerField, Case, F, PositiveIntegerField, Q, Value, When
+from django.utils import timezone
+
+from posts.models import Post
+from .counters import invalidate_unread
+from .models import Notification
+from .stream import publish
+
+LOOKUP_CHUNK_SIZE = 200
+UPDATE_CHUNK_SIZE = 500
+
+
+def coalesce_window():
+    return timedelta(seconds=getattr(settings, 'NOTIFICATION_COALESCE_SECONDS', 3600))
+
+
+class NotificationBatch:
+    """
+    Events to be written together. Not thread-safe; see NotificationQueue.
+    """
+
+    def __init__(self):
+        self._groups = {}
+
+    def __len__(self):
+        return len(self._groups)
+
+    def add(self, recipient_id, actor_id, verb, post_id):
+        count, _ = self._groups.get((recipient_id, verb, post_id), (0, None))
+        self._groups[(recipient_id, verb, post_id)] = (count + 1, actor_id)
+
+    def _open_rows(self, keys, cutoff):
+        rows = {}
+        for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+            match = Q()
+            for recipient_id, verb, post_id in keys[start:start + LOOKUP_CHUNK_SIZE]:
+                match |= Q(recipient_id=recipient_id, verb=verb, post_id=post_id)
+            # Ascending, so the newest row per group is the one kept.
+            for notification in Notification.objects.filter(match, timestamp__gte=cutoff).order_by('timestamp', 'pk'):
+                rows[(notification.recipient_id, notification.verb, notification.post_id)] = notification
+        return rows
+
+    def write(self):
+        """
+        Coalesce and write the batch. Returns (created, updated) notifications.
+        """
+        groups, self._groups = self._groups, {}
+        if not groups:
+            return [], []
+        now = timezone.now()
+        open_rows = self._open_rows(list(groups), now - coalesce_window())
+        post_type = ContentType.objects.get_for_model(Post)
+
+        created, updated = [], []
+        deltas = {}
+        newly_unread = Counter()
+        for (recipient_id, verb, post_id), (count, actor_id) in groups.items():
+            notification = open_rows.get((recipient_id, verb, post_id))
+            if notification is None:
+                created.append(Notification(
+                    recipient_id=recipient_id,
+                    actor_id=actor_id,
+                    verb=verb,
+                    target_content_type=post_type,
+                    post_id=post_id,
+                    actor_count=count,
+                ))
+                newly_unread[recipient_id] += 1
+            else:
+                deltas[notification.pk] = (count, actor_id)
+                updated.append(notification)
+
+        with transaction.atomic():
+            if deltas:
+                # Locked so a concurrent flush waits for this one, then sees
+                # its read flags and adds to its counts.
+                was_read = set(
+                    Notification.objects.select_for_update()
+                    .filter(pk__in=list(deltas), read=True)
+                    .values_list('pk', flat=True)
+                )
+                self._apply(deltas, now)
+                for notification in updated:
+                    # New activity on a row the user already read brings it back as unread.
+                    if notification.pk in was_read:
+                        newly_unread[notification.recipient_id] += 1
+                    count, notification.actor_id = deltas[notification.pk]
+                    notification.actor_count += count
+                    notification.read = False
+                    notification.timestamp = now
+            Notification.objects.bulk_create(created, batch_size=500)
+            recipients = {recipient_id for recipient_id, _, _ in groups}
+            transaction.on_commit(lambda: self._after_commit(newly_unread, recipients))
+        return created, updated
+
+    @staticmethod
+    def _apply(deltas, now):
+        # actor_count is incremented in the database, not written back from
+        # the rows read above, so concurrent flushes can't lose events.
+        ids = list(deltas)
+        for start in range(0, len(ids), UPDATE_CHUNK_SIZE):
+            chunk = ids[start:start + UPDATE_CHUNK_SIZE]
+            Notification.objects.filter(pk__in=chunk).update(
+                actor_count=F('actor_count') + Case(
+                    *[When(pk=pk, then=Value(deltas[pk][0])) for pk in chunk], output_field=PositiveIntegerField()
+                ),
+                actor_id=Case(*[When(pk=pk, then=Value(deltas[pk][1])) for pk in chunk], output_field=BigIntegerField()),
+                read=False,
+                timestamp=now,
+            )
+
+    @staticmethod
+    def _after_commit(newly_unread, recipients):
+        for recipient_id in newly_unread:
+            invalidate_unread(recipient_id)
+        # Wake any open notification streams for these recipients.
+        publish(recipients)
+
+
+class NotificationQueue:
+    """
+    Process-wide, thread-safe front for NotificationBatch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._batch = NotificationBatch()
+        self._timer = None
+        self._flush_now = False
+
+    def _schedule(self, delay):
+        # Called with the lock held.
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._flush_from_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def add(self, recipient_id, actor_id, verb, post_id):
+        with self._lock:
+            self._batch.add(recipient_id, actor_id, verb, post_id)
+            if len(self._batch) >= getattr(settings, 'NOTIFICATION_MAX_PENDING', 200):
+                if not self._flush_now:
+                    self._flush_now = True
+                    self._schedule(0)
+            elif self._timer is None:
+                self._schedule(getattr(settings, 'NOTIFICATION_FLUSH_SECONDS', 1.0))
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._flush_now = False
+            batch, self._batch = self._batch, NotificationBatch()
+        return batch.write()
+
+
+notification_queue = NotificationQueue()
+
+
+def notify(recipient, actor, verb, post):
+    """
+    Queue a notification unless the actor is the recipient, once the current
+    transaction (if any) commits.
+    """
+    if recipient.pk != actor.pk:
+        transaction.on_commit(lambda: notification_queue.add(recipient.pk, actor.pk, verb, post.pk))
@@ -0,0 +1,118 @@
+# Byte-identical copies of this module live at:
+#   social_media_api/posts/conditional.py
+#   advanced-api-project/api/conditional.py
+# Apply every change to all of them.
+"""
+Conditional GET for DRF list and retrieve actions.
+
+`ConditionalGetMixin` answers `If-None-Match` before anything is serialized:
+the ETag is a hash of one aggregate query over the rows the response is built
+from, by default `Max('updated_at')` and `Count('pk')`, plus the sum, min and
+max of the row ids, the query string (and so the cursor or page number) and
+the negotiated media type. A row edit moves the max, a new row moves the max
+and the count, and a delete changes which ids are in the window, so the
+fingerprint changes whenever the payload can.
+
+For a paginated list only the page being served is aggregated: a bounded
+`pk IN (... LIMIT n)` subquery, so a 304 costs what the page itself would
+and never a scan or COUNT over everything the filters match. Page-number
+pages also render the total count, so that one is added as a subquery.
+
+This relies on every change to a listed row going through `updated_at`:
+models need `auto_now=True`, and queryset `.update()` calls have to set it
+too. Views whose payload includes related rows (an author's name, nested
+books) list those rows' `updated_at` in `etag_aggregates` as well.
+"""
+import hashlib
+
+from django.db.models import Count, F, Func, Max, Min, Subquery, Sum
+from django.utils.cache import get_conditional_response, quote_etag
+from rest_framework.pagination import PageNumberPagination
+
+
+def _rows(queryset):
+    # Bare rows matching `queryset`, which may be sliced or annotated.
+    return queryset.model._default_manager.filter(pk__in=queryset.values('pk'))
+
+
+class ConditionalGetMixin:
+    # {name: aggregate} fingerprinting the rows; None means updated_at + count.
+    etag_aggregates = None
+
+    def get_etag_aggregates(self):
+        if self.etag_aggregates is not None:
+            return self.etag_aggregates
+        return {'updated': Max('updated_at'), 'count': Count('pk')}
+
+    def get_page_fingerprint(self, queryset):
+        """
+        (rows a list response is built from, extra aggregates), or None when
+        the page can't be told without running the paginator.
+        """
+        paginator = self.paginator
+        if paginator is None:
+            return queryset, {}
+        if hasattr(paginator, 'page_queryset'):
+            return _rows(paginator.page_queryset(queryset, self.request, self)), {}
+        if isinstance(paginator, PageNumberPagination):
+            page_size = paginator.get_page_size(self.request)
+            if not page_size:
+                return queryset, {}
+            try:
+                number = int(self.request.query_params.get(paginator.page_query_param, 1))
+            except ValueError:
+                return None
+            if number < 1:
+                return None
+            page = _rows(queryset[(number - 1) * page_size:number * page_size])
+            # Plain COUNT, not an aggregate, so it doesn't group the subquery.
+            total = _rows(queryset).order_by().values(rows=Func(F('pk'), function='COUNT'))
+            return page, {'total': Max(Subquery(total))}
+        return queryset, {}
+
+    def get_etag(self, queryset, extra_aggregates=None):
+        fingerprint = queryset.order_by().aggregate(
+            **self.get_etag_aggregates(),
+            # Which rows are on the page: a delete pulls an older row in
+            # without moving the max or the count.
+            ids=Sum('pk', distinct=True),
+            first_id=Min('pk'),
+            last_id=Max('pk'),
+            **(extra_aggregates or {}),
+        )
+        if not fingerprint.get('count', True):
+            return None
+        parts = [
+            type(self).__name__,
+            getattr(self, 'action', None),
+            self.request.accepted_media_type,
+            self.request.META.get('QUERY_STRING', ''),
+            repr(sorted(fingerprint.items())),
+        ]
+        return quote_etag(hashlib.md5('\n'.join(map(str, parts)).encode(), usedforsecurity=False).hexdigest())
+
+    def _conditional(self, request, fingerprint, respond, *args, **kwargs):
+        # The browsable API renders per-user forms; leave it unconditional.
+        if fingerprint is None or getattr(request.accepted_renderer, 'format', None) == 'api':
+            return respond(request, *args, **kwargs)
+        etag = self.get_etag(*fingerprint)
+        if etag is None:
+            return respond(request, *args, **kwargs)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = respond(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._conditional(request, self.get_page_fingerprint(queryset), super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return self._conditional(request, (queryset, {}), super().retrieve, *args, **kwargs)
@@ -0,0 +1,113 @@
+"""
+Read-only "fast" serializers for list endpoints.
+
+DRF's ModelSerializer builds and walks a tree of field objects for every row.
+For read-only list pages that cost dominates the request, so these
+serializers skip it: the output shape is declared once as (output key, ORM
+lookup) pairs, rows come straight from `values_list(..., named=True)` (or from
+`select_related` instances), and each row becomes a dict with one `zip`.
+
+The output matches the matching ModelSerializer field for field, including
+DRF's datetime format, so clients cannot tell which path served them.
+"""
+from datetime import datetime
+from operator import attrgetter
+
+from django.utils import timezone
+from rest_framework.response import Response
+
+
+def format_datetime(value, tz=None):
+    # Same output as rest_framework.fields.DateTimeField.to_representation.
+    # Pass `tz` when formatting many values; looking up the current timezone
+    # per value costs more than the formatting itself.
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(tz or timezone.get_current_timezone())
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+class FastSerializer:
+    """
+    Subclasses set `model` and `fields`, a sequence of (key, lookup) pairs.
+    """
+    model = None
+    fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.keys = tuple(key for key, _ in cls.fields)
+        cls.lookups = tuple(lookup for _, lookup in cls.fields)
+        cls.datetime_keys = tuple(
+            key for key, lookup in cls.fields
+            if cls._is_datetime(lookup)
+        )
+        cls._getters = tuple(attrgetter(lookup.replace('__', '.')) for lookup in cls.lookups)
+
+    @classmethod
+    def _is_datetime(cls, lookup):
+        model = cls.model
+        *path, name = lookup.split('__')
+        for part in path:
+            model = model._meta.get_field(part).related_model
+        field = model._meta.get_field(name)
+        return field.get_internal_type() == 'DateTimeField'
+
+    @classmethod
+    def values(cls, queryset):
+        """
+        Narrow `queryset` to the columns this serializer needs.
+
+        Joins come from the lookups themselves, so select_related, prefetch
+        and only() hints on `queryset` are dropped.
+        """
+        queryset = queryset.select_related(None).prefetch_related(None).defer(None)
+        return queryset.values_list(*cls.lookups, named=True)
+
+    @classmethod
+    def _finish(cls, data):
+        tz = timezone.get_current_timezone()
+        for item in data:
+            for key in cls.datetime_keys:
+                value = item[key]
+                if isinstance(value, datetime):
+                    item[key] = format_datetime(value, tz)
+        return data
+
+    @classmethod
+    def dump_rows(cls, rows):
+        """
+        Serialize rows produced by `values()`.
+        """
+        keys = cls.keys
+        return cls._finish([dict(zip(keys, row)) for row in rows])
+
+    @classmethod
+    def dump_objects(cls, objects):
+        """
+        Serialize model instances; related lookups should be select_related.
+        """
+        keys = cls.keys
+        getters = cls._getters
+        return cls._finish([dict(zip(keys, [get(obj) for get in getters])) for obj in objects])
+
+
+class FastListMixin:
+    """
+    Serve `list` through `fast_serializer_class` instead of the ModelSerializer.
+
+    Everything else (filters, pagination, the other actions) is unchanged.
+    """
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        fast = self.fast_serializer_class
+        queryset = fast.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.dump_rows(page))
+        return Response(fast.dump_rows(queryset))
@@ -0,0 +1,172 @@
+"""
+Materialized home feed.
+
+New posts are pushed into a `FeedEntry` row for every follower of the author
+when they are created (fan-out-on-write), so reading a feed is a single indexed
+range scan instead of a join over everyone the user follows.
+
+Authors with more than `FEED_FANOUT_MAX_FOLLOWERS` followers are skipped at
+write time; their posts are pulled in when the feed is read (fan-out-on-read),
+so one post from a huge account never turns into millions of inserts.
+
+Follower and following ids come from the cached follow graph
+(`accounts.graph`), not the join table.
+"""
+import heapq
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from accounts.graph import follow_graph
+from accounts.models import CustomUser
+from .models import FeedEntry, Post
+from .pagination import keyset_filter
+
+BATCH_SIZE = 1000
+HIGH_FANOUT_CACHE_KEY = 'posts:feed:high_fanout_authors'
+
+
+def feed_max_entries():
+    return getattr(settings, 'FEED_MAX_ENTRIES', 500)
+
+
+def fanout_max_followers():
+    return getattr(settings, 'FEED_FANOUT_MAX_FOLLOWERS', 10000)
+
+
+def is_high_fanout(author_id):
+    """
+    True when `author_id` has too many followers to fan out on write.
+    """
+    return CustomUser.objects.filter(pk=author_id, followers_count__gt=fanout_max_followers()).exists()
+
+
+def high_fanout_author_ids():
+    """
+    Ids of every author whose posts are pulled at read time.
+
+    The set is read from the denormalized `followers_count` and cached for
+    `FEED_HIGH_FANOUT_CACHE_SECONDS`.
+    """
+    author_ids = cache.get(HIGH_FANOUT_CACHE_KEY)
+    if author_ids is None:
+        author_ids = frozenset(
+            CustomUser.objects.filter(followers_count__gt=fanout_max_followers()).values_list('pk', flat=True)
+        )
+        cache.set(HIGH_FANOUT_CACHE_KEY, author_ids, getattr(settings, 'FEED_HIGH_FANOUT_CACHE_SECONDS', 300))
+    return author_ids
+
+
+def _write_entries(entries):
+    FeedEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def trim_feeds(user_ids):
+    """
+    Delete everything past `FEED_MAX_ENTRIES` in each of the given feeds.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    overflow = FeedEntry.objects.filter(user_id__in=user_ids).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=F('user_id'),
+            order_by=[F('created_at').desc(), F('post_id').desc()],
+        )
+    ).filter(position__gt=feed_max_entries()).values_list('pk', flat=True)
+    deleted, _ = FeedEntry.objects.filter(pk__in=list(overflow)).delete()
+    return deleted
+
+
+def fan_out_post(post):
+    """
+    Push `post` into the feed of every follower of its author.
+
+    Returns the number of feeds written, or 0 when the author is too big to
+    fan out and the post will be pulled at read time instead.
+    """
+    if is_high_fanout(post.author_id):
+        return 0
+    written = 0
+    batch = []
+    for user_id in follow_graph.followers(post.author_id):
+        batch.append(FeedEntry(user_id=user_id, post_id=post.pk, created_at=post.created_at))
+        if len(batch) >= BATCH_SIZE:
+            _write_entries(batch)
+            trim_feeds(entry.user_id for entry in batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        _write_entries(batch)
+        trim_feeds(entry.user_id for entry in batch)
+        written += len(batch)
+    return written
+
+
+def backfill_feed(user_id, author_id):
+    """
+    Copy the latest posts of `author_id` into `user_id`'s feed after a follow.
+    """
+    if is_high_fanout(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by('-created_at', '-id').values_list('pk', 'created_at')
+    _write_entries([
+        FeedEntry(user_id=user_id, post_id=post_id, created_at=created_at)
+        for post_id, created_at in posts[:feed_max_entries()]
+    ])
+    trim_feeds([user_id])
+
+
+def remove_author_from_feed(user_id, author_id):
+    """
+    Drop the posts of `author_id` from `user_id`'s feed after an unfollow.
+    """
+    FeedEntry.objects.filter(user_id=user_id, post__author_id=author_id).delete()
+
+
+def _pulled_posts(user, limit, before):
+    celebrities = high_fanout_author_ids()
+    if not celebrities:
+        return []
+    followed = follow_graph.following(user.pk).intersection(celebrities)
+    if not followed:
+        return []
+    posts = Post.objects.filter(author_id__in=followed)
+    if before is not None:
+        posts = posts.filter(keyset_filter('created_at', *before))
+    return posts.select_related('author').order_by('-created_at', '-id')[:limit]
+
+
+def get_feed(user, limit, before=None):
+    """
+    Return up to `limit` posts for `user`'s home feed, newest first.
+
+    `before` is an optional (created_at, id) keyset position; only older posts
+    are returned. Materialized entries and posts pulled from high-fanout
+    authors are merged on (created_at, id); both sides read at most `limit` rows.
+    """
+    entries = FeedEntry.objects.filter(user=user)
+    if before is not None:
+        entries = entries.filter(keyset_filter('created_at', *before, pk_field='post_id'))
+    pushed = (
+        entry.post
+        for entry in entries.select_related('post__author').order_by('-created_at', '-post_id')[:limit]
+    )
+    merged = heapq.merge(pushed, _pulled_posts(user, limit, before), key=lambda post: (post.created_at, post.pk), reverse=True)
+    posts = []
+    seen = set()
+    # An author crossing the fan-out threshold can briefly be on both sides,
+    # so duplicates are dropped before counting rows. A side that returned
+    # `limit` rows has no duplicates of its own, so if either side is full
+    # `limit` distinct rows are always found here, in order, and the next
+    # page starts after the last of them.
+    for post in merged:
+        if post.pk not in seen:
+            seen.add(post.pk)
+            posts.append(post)
+            if len(posts) == limit:
+                break
+    return posts
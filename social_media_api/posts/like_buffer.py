@@ -0,0 +1,164 @@
+"""
+Write-behind buffer for likes.
+
+With `LIKE_BUFFER_ENABLED = True`, LikePostView and UnlikePostView record an
+intent here instead of writing a `Like` row per click. Intents are
+deduplicated per (user, post) - the last one wins - and flushed with one
+`bulk_create`, one delete per post and one recount of the changed posts'
+`like_count`, either when `LIKE_BUFFER_MAX_PENDING` intents are queued or
+`LIKE_BUFFER_FLUSH_SECONDS` after the first one arrived. Both run on the timer thread, never inside the
+request (and its transaction) that queued the intent. A flush that fails puts
+its intents back in the queue for the next one.
+
+The buffer is per process. `has_liked` overlays pending intents on the
+database so a user always sees their own like state, even before a flush.
+"""
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.db.models.functions import Now
+
+from notifications.writer import NotificationBatch
+from .models import Like, Post, count_per_post
+
+
+class LikeBuffer:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flushing = {}
+        self._timer = None
+        self._flush_now = False
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'LIKE_BUFFER_ENABLED', False)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, 'LIKE_BUFFER_MAX_PENDING', 500)
+
+    @property
+    def flush_seconds(self):
+        return getattr(settings, 'LIKE_BUFFER_FLUSH_SECONDS', 2.0)
+
+    def pending_state(self, user_id, post_id):
+        """
+        True/False for a queued like/unlike, or None when nothing is queued.
+        """
+        key = (user_id, post_id)
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            return self._flushing.get(key)
+
+    def has_liked(self, user_id, post_id):
+        state = self.pending_state(user_id, post_id)
+        if state is not None:
+            return state
+        return Like.objects.filter(user_id=user_id, post_id=post_id).exists()
+
+    def _schedule(self, delay):
+        # Called with the lock held.
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._flush_from_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def add(self, user_id, post_id, liked):
+        with self._lock:
+            self._pending[(user_id, post_id)] = liked
+            if len(self._pending) >= self.max_pending:
+                if not self._flush_now:
+                    self._flush_now = True
+                    self._schedule(0)
+            elif self._timer is None:
+                self._schedule(self.flush_seconds)
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        """
+        Write every queued intent and return how many were applied.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._flush_now = False
+            intents, self._pending = self._pending, {}
+            self._flushing.update(intents)
+        if not intents:
+            return 0
+        try:
+            self._write(intents)
+        except Exception:
+            with self._lock:
+                # Intents queued since this flush started are newer; keep those.
+                for key, liked in intents.items():
+                    self._pending.setdefault(key, liked)
+                if self._timer is None:
+                    self._schedule(self.flush_seconds)
+            raise
+        finally:
+            with self._lock:
+                for key in intents:
+                    if self._flushing.get(key) == intents[key]:
+                        del self._flushing[key]
+        return len(intents)
+
+    def _write(self, intents):
+        # Posts deleted since the intent was queued are skipped.
+        posts = Post.objects.select_related('author').in_bulk({post_id for _, post_id in intents})
+        likes = defaultdict(set)
+        unlikes = defaultdict(set)
+        for (user_id, post_id), liked in intents.items():
+            if post_id in posts:
+                (likes if liked else unlikes)[post_id].add(user_id)
+
+        with transaction.atomic():
+            new_likes = []
+            if likes:
+                existing = Q()
+                for post_id, user_ids in likes.items():
+                    existing |= Q(post_id=post_id, user_id__in=user_ids)
+                already = set(Like.objects.filter(existing).values_list('user_id', 'post_id'))
+                new_likes = [
+                    Like(user_id=user_id, post_id=post_id)
+                    for post_id, user_ids in likes.items()
+                    for user_id in user_ids
+                    if (user_id, post_id) not in already
+                ]
+                Like.objects.bulk_create(new_likes, ignore_conflicts=True)
+
+            changed = {like.post_id for like in new_likes}
+            for post_id, user_ids in unlikes.items():
+                deleted, _ = Like.objects.filter(post_id=post_id, user_id__in=user_ids).delete()
+                if deleted:
+                    changed.add(post_id)
+
+            if changed:
+                # Recounted rather than adjusted: ignore_conflicts skips a like
+                # that another writer inserted since the check above.
+                Post.objects.filter(pk__in=changed).update(like_count=count_per_post(Like), updated_at=Now())
+
+            self._notify(new_likes, posts)
+
+    def _notify(self, new_likes, posts):
+        batch = NotificationBatch()
+        for like in new_likes:
+            post = posts[like.post_id]
+            if post.author_id != like.user_id:
+                batch.add(post.author_id, like.user_id, 'liked your post', post.pk)
+        batch.write()
+
+like_buffer = LikeBuffer()
@@ -0,0 +1,59 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Comment, Post
+from posts.serializers import CommentFastSerializer, CommentSerializer, PostFastSerializer, PostSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare PostSerializer/CommentSerializer with their fast counterparts on one large page. "
+        "Sample rows are created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="Rows per page.")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per serializer; the best is reported.")
+
+    def best_of(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with transaction.atomic():
+            author = get_user_model().objects.create_user(username='bench-serializers-author')
+            Post.objects.bulk_create(
+                [Post(author=author, title=f"Post {i}", content="x" * 200) for i in range(rows)],
+                batch_size=1000,
+            )
+            post = Post.objects.filter(author=author).first()
+            Comment.objects.bulk_create(
+                [Comment(post=post, author=author, content="y" * 100) for _ in range(rows)],
+                batch_size=1000,
+            )
+            posts = Post.objects.filter(author=author).select_related('author')
+            comments = Comment.objects.filter(author=author).select_related('author', 'post')
+
+            cases = [
+                ('PostSerializer', lambda: PostSerializer(list(posts.all()), many=True).data),
+                ('PostFastSerializer', lambda: PostFastSerializer.dump_rows(PostFastSerializer.values(posts.all()))),
+                ('CommentSerializer', lambda: CommentSerializer(list(comments.all()), many=True).data),
+                ('CommentFastSerializer', lambda: CommentFastSerializer.dump_rows(CommentFastSerializer.values(comments.all()))),
+            ]
+            results = {name: self.best_of(repeat, func) for name, func in cases}
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{rows} rows per page, best of {repeat} (query + serialization):")
+        for name, seconds in results.items():
+            self.stdout.write(f"  {name:<22} {seconds * 1000:9.1f} ms")
+        for model in ('Post', 'Comment'):
+            speedup = results[f'{model}Serializer'] / results[f'{model}FastSerializer']
+            self.stdout.write(self.style.SUCCESS(f"  {model}: fast path is {speedup:.1f}x faster"))
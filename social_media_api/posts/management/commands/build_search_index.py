@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import post_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the in-process post search index and write its snapshot.'
+
+    def handle(self, *args, **options):
+        count = post_index.rebuild()
+        self.stdout.write(f'Indexed {count} posts into {post_index.path or "memory only"}.')
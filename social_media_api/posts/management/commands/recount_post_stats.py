@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.db.models.functions import Now
+
+from posts.models import Comment, Like, Post, count_per_post
+
+
+class Command(BaseCommand):
+    help = "Recompute Post.like_count and Post.comment_count from the Like and Comment tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help="Number of post ids updated per UPDATE statement.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        updated = 0
+        # One correlated UPDATE per id range keeps each transaction short.
+        for start in range(0, last_id + 1, batch_size):
+            updated += Post.objects.filter(pk__gte=start, pk__lt=start + batch_size).update(
+                like_count=count_per_post(Like),
+                comment_count=count_per_post(Comment),
+                updated_at=Now(),
+            )
+        self.stdout.write(self.style.SUCCESS(f"Recounted likes and comments for {updated} posts."))
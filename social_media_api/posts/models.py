@@ -1,35 +1,94 @@
 from django.db import models
 from django.conf import settings
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 # Create your models here.
 class Post(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now_add=True)
-    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Bumped on every change, including the counter updates below, so ETags
+    # (posts.conditional) can fingerprint rows without reading them.
+    updated_at = models.DateTimeField(auto_now=True)
+    # Indexed by posts_post_author_created_idx below.
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    # Denormalized counters, kept in step by the like/comment views with F()
+    # updates that also set updated_at. `manage.py recount_post_stats`
+    # rebuilds them if they drift.
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # An author's posts newest first (feed pull and backfill).
+            models.Index(fields=['author', '-created_at', '-id'], name='posts_post_author_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} by {self.author.username.capitalize()} with {self.content.title()}"
 
 
 class Comment(models.Model):
-    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    # Indexed by posts_comment_post_created_idx below.
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, db_index=False)
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # A post's comments in order.
+            models.Index(fields=['post', 'created_at'], name='posts_comment_post_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.author.username} commented on {self.post.title}"
     
 class Like(models.Model):
-    post = models.ForeignKey(Post, on_delete=models.CASCADE)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Both columns lead one of the indexes below.
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, db_index=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         unique_together = ('post', 'user')
+        indexes = [
+            # The unique index covers (post, user); this one serves "what did
+            # this user like" lookups.
+            models.Index(fields=['user', 'post'], name='posts_like_user_post_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} liked {self.post.title}"
+
+
+class FeedEntry(models.Model):
+    """
+    One row per (follower, post) in a user's materialized home feed.
+
+    Rows are written when a post is created (fan-out-on-write) and trimmed to
+    `settings.FEED_MAX_ENTRIES` per user. `created_at` is copied from the post so
+    the feed can be read in order without joining `Post`.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='feed_entries', on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, related_name='feed_entries', on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='posts_feed_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.post.title} in {self.user.username}'s feed"
+
+
+def count_per_post(model):
+    """
+    Expression for a Post update: how many `model` rows point at the post.
+    """
+    rows = model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(total=Count('pk'))
+    return Coalesce(Subquery(rows.values('total')), 0)
@@ -0,0 +1,128 @@
+"""
+Keyset (cursor) pagination on (timestamp, id).
+
+Each page is fetched with `WHERE (ts, id) < (cursor_ts, cursor_id) ORDER BY ts
+DESC, id DESC LIMIT n`, so page N costs the same index range scan as page 1.
+There is no OFFSET and no COUNT(*); responses only carry a `next` link.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def keyset_filter(field, value, pk, pk_field='pk'):
+    """
+    Rows strictly after (value, pk) in descending (field, pk) order.
+
+    Written as `field <= value AND (field < value OR pk < pk)` so the
+    database can range-scan an index on `field`.
+    """
+    return Q(**{f'{field}__lte': value}) & (Q(**{f'{field}__lt': value}) | Q(**{f'{pk_field}__lt': pk}))
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque cursor pagination ordered newest first.
+
+    Views can set `keyset_field` to paginate on something other than
+    `created_at` (e.g. `timestamp` for notifications).
+    """
+    page_size = api_settings.PAGE_SIZE or 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    keyset_field = 'created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, value, pk):
+        raw = f'{value.isoformat()}|{pk}'.encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor_value(self, encoded):
+        """
+        (timestamp, id) for an encoded cursor; raises ValueError if malformed.
+        """
+        raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)).decode()
+        value, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(value), int(pk)
+
+    def decode_cursor(self, request):
+        """
+        Return the (timestamp, id) position for this request, or None for page 1.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            return self.decode_cursor_value(encoded)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def page_queryset(self, queryset, request, view=None):
+        """
+        The unevaluated `page_size + 1` rows this request's page is cut from.
+        """
+        field = getattr(view, 'keyset_field', self.keyset_field)
+        cursor = self.decode_cursor(request)
+        queryset = queryset.order_by(f'-{field}', '-pk')
+        if cursor is not None:
+            queryset = queryset.filter(keyset_filter(field, *cursor))
+        return queryset[:self.get_page_size(request) + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        field = getattr(view, 'keyset_field', self.keyset_field)
+        rows = self.page_queryset(queryset, request, view)
+        return self.paginate_rows(rows, request, self.get_page_size(request), field)
+
+    def paginate_rows(self, rows, request, page_size, field='created_at'):
+        """
+        Cut `page_size` rows from an already ordered and filtered sequence.
+
+        `rows` should hold up to `page_size + 1` items; the extra one only
+        tells us whether there is a next page.
+        """
+        self.request = request
+        rows = list(rows)
+        page = rows[:page_size]
+        self.next_cursor = None
+        if len(rows) > page_size:
+            last = page[-1]
+            # Named `values_list` rows (fast serializers) carry `id`, not `pk`.
+            pk = last.pk if hasattr(last, 'pk') else last.id
+            self.next_cursor = self.encode_cursor(getattr(last, field), pk)
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
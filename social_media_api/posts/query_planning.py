@@ -0,0 +1,125 @@
+"""
+Derive select_related / prefetch_related / only() from a serializer.
+
+A serializer already says which attributes it reads: `author.username` needs a
+join to the author, a nested `books` list needs a prefetch, and plain fields
+name the columns to load. `plan_queryset` walks the declared fields and applies
+exactly that, so a list page costs the same number of queries for 1 row as for
+100. `QueryPlanMixin` does it for a viewset's `get_queryset`.
+
+`only()` is applied only when every field maps onto model fields; a
+SerializerMethodField or a model property could read anything, so those
+serializers load whole rows (joins and prefetches are still planned).
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+class QueryPlan:
+
+    def __init__(self):
+        self.select = set()
+        self.prefetch = {}
+        self.columns = set()
+        self.can_defer = True
+
+    def apply(self, queryset, defer=True):
+        if self.select:
+            queryset = queryset.select_related(*sorted(self.select))
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*self.prefetch.values())
+        if defer and self.can_defer and self.columns:
+            queryset = queryset.only(*sorted(self.columns))
+        return queryset
+
+
+def _walk(serializer, model, prefix, plan):
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            if isinstance(field, serializers.BaseSerializer):
+                _walk(field, model, prefix, plan)
+            else:
+                plan.can_defer = False
+            continue
+
+        current, path = model, list(prefix)
+        for index, attr in enumerate(field.source_attrs):
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # A property or method; nothing to plan past this point.
+                plan.can_defer = False
+                break
+            path.append(attr)
+            lookup = '__'.join(path)
+            last = index == len(field.source_attrs) - 1
+
+            if not model_field.is_relation:
+                plan.columns.add(lookup)
+                break
+            if model_field.many_to_many or model_field.one_to_many:
+                plan.prefetch[lookup] = _prefetch(field, model_field, lookup) if last else lookup
+                break
+            if last and isinstance(field, serializers.RelatedField) and model_field.concrete:
+                # A primary key field only needs the `<name>_id` column.
+                plan.columns.add(lookup)
+                break
+            if model_field.concrete:
+                plan.columns.add(lookup)
+            plan.select.add(lookup)
+            current = model_field.related_model
+        else:
+            if isinstance(field, serializers.Serializer):
+                _walk(field, current, path, plan)
+
+
+def _prefetch(field, model_field, lookup):
+    child = getattr(field, 'child', None)
+    if not isinstance(child, serializers.ModelSerializer):
+        return lookup
+    queryset = model_field.related_model._default_manager.all()
+    child_plan = QueryPlan()
+    _walk(child, model_field.related_model, [], child_plan)
+    if model_field.one_to_many:
+        # Prefetching matches rows back to their parent through this column.
+        child_plan.columns.add(model_field.field.name)
+    return Prefetch(lookup, queryset=child_plan.apply(queryset))
+
+
+_plans = {}
+
+
+def plan_for(serializer_class):
+    """
+    The QueryPlan for `serializer_class`, built once per class.
+    """
+    plan = _plans.get(serializer_class)
+    if plan is None:
+        plan = QueryPlan()
+        _walk(serializer_class(), serializer_class.Meta.model, [], plan)
+        _plans[serializer_class] = plan
+    return plan
+
+
+def plan_queryset(queryset, serializer_class, defer=True):
+    return plan_for(serializer_class).apply(queryset, defer=defer)
+
+
+class QueryPlanMixin:
+    """
+    Apply the serializer's query plan to `get_queryset()`.
+
+    Columns are narrowed with only() for reads; writes load full rows so
+    saving an instance never drops a field the serializer did not list.
+    """
+
+    def get_queryset(self):
+        return plan_queryset(
+            super().get_queryset(),
+            self.get_serializer_class(),
+            defer=self.request.method in SAFE_METHODS,
+        )
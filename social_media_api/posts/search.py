@@ -0,0 +1,15 @@
+"""
+Inverted-index search over posts (see posts.inverted_index).
+
+Used by InvertedIndexSearchFilter on PostViewSet when SEARCH_INDEX_ENABLED
+is on; otherwise the viewset keeps DRF's icontains SearchFilter.
+"""
+from .inverted_index import ModelIndex
+from .models import Post
+
+
+def post_document(post):
+    return [(post.title, 3), (post.content, 1)]
+
+
+post_index = ModelIndex(Post, post_document, 'posts')
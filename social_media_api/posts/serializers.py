@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .fast_serializers import FastSerializer
 from .models import Post, Comment
 
 class PostSerializer(serializers.ModelSerializer):
@@ -6,7 +7,8 @@ class PostSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Post
-        fields = ['id', 'author', 'title', 'content', 'created_at', 'updated_at']
+        fields = ['id', 'author', 'title', 'content', 'created_at', 'updated_at', 'like_count', 'comment_count']
+        read_only_fields = ['like_count', 'comment_count']
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -17,3 +19,38 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ['id', 'post', 'post_title', 'author', 'content', 'created_at', 'updated_at']
 
+    def get_extra_kwargs(self):
+        extra_kwargs = super().get_extra_kwargs()
+        if self.instance is not None:
+            # Moving a comment would leave both posts' comment_count wrong.
+            extra_kwargs['post'] = {**extra_kwargs.get('post', {}), 'read_only': True}
+        return extra_kwargs
+
+
+# Read-only list counterparts of the serializers above; same output, no
+# per-row field machinery.
+class PostFastSerializer(FastSerializer):
+    model = Post
+    fields = (
+        ('id', 'id'),
+        ('author', 'author__username'),
+        ('title', 'title'),
+        ('content', 'content'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+        ('like_count', 'like_count'),
+        ('comment_count', 'comment_count'),
+    )
+
+
+class CommentFastSerializer(FastSerializer):
+    model = Comment
+    fields = (
+        ('id', 'id'),
+        ('post', 'post_id'),
+        ('post_title', 'post__title'),
+        ('author', 'author__username'),
+        ('content', 'content'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    )
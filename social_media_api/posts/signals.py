@@ -0,0 +1,25 @@
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from accounts.models import UserFollower
+from accounts.signals import follow_pairs
+from .feed import backfill_feed, remove_author_from_feed
+from .search import post_index
+
+
+@receiver(m2m_changed, sender=UserFollower)
+def sync_feed_on_follow(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        related = instance.following if reverse else instance.followers
+        pk_set = set(related.values_list('pk', flat=True))
+    elif action not in ('post_add', 'post_remove'):
+        return
+    for follower_id, author_id in follow_pairs(instance, reverse, pk_set):
+        if action == 'post_add':
+            backfill_feed(follower_id, author_id)
+        else:
+            remove_author_from_feed(follower_id, author_id)
+
+
+# Keep the in-process search index (posts.search) current.
+post_index.connect()
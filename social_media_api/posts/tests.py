@@ -1,3 +1,509 @@
-from django.test import TestCase
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models import F
+from django.db.models.functions import Now
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from social_media_api.instrumentation import QueryBudgetExceeded, request_stats
+
+from .feed import fan_out_post, get_feed
+from .inverted_index import InvertedIndex
+from .like_buffer import like_buffer
+from .models import Comment, FeedEntry, Like, Post
+from .query_planning import plan_queryset
+from .search import post_index
+from .serializers import CommentFastSerializer, CommentSerializer, PostFastSerializer, PostSerializer
+
+User = get_user_model()
+
+
+class ConstantQueryCountMixin:
+    """
+    TestCase mixin: assert a list endpoint does not issue N+1 queries.
+    """
+
+    def assertListQueriesConstant(self, url, add_rows, sizes=(1, 5)):
+        """
+        `add_rows(n)` must create `n` more rows that `url` lists. The endpoint
+        is fetched with 1 and then 5 rows (by default) on the page and must
+        issue the same number of queries both times.
+        """
+        counts, created = [], 0
+        for size in sizes:
+            add_rows(size - created)
+            created = size
+            separator = '&' if '?' in url else '?'
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(f'{url}{separator}page_size={size}')
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(context.captured_queries))
+        if len(set(counts)) > 1:
+            queries = '\n'.join(query['sql'] for query in context.captured_queries)
+            self.fail(f'{url} issued {counts} queries for {list(sizes)} rows:\n{queries}')
+
+
+class IndexUsageMixin:
+    """
+    TestCase mixin: assert a query is answered from an index (SQLite).
+    """
+
+    def assertUsesIndex(self, queryset, index, ordered=True):
+        """
+        `queryset` must read its table through `index` (a regular expression
+        matched against the index name) and, with `ordered`, return rows in
+        index order without a temporary sort.
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN checks are written for SQLite')
+        plan = queryset.explain()
+        self.assertRegex(plan, rf'(SEARCH|SCAN) \S+ USING (COVERING )?INDEX {index}\b', plan)
+        if ordered:
+            self.assertNotIn('TEMP B-TREE', plan, plan)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FeedTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", password="pass1234")
+        self.reader = User.objects.create_user(username="reader", password="pass1234")
+        self.reader.following.add(self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def test_create_post_fans_out_to_followers(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        client.post('/api/posts/posts/', {'title': 'Hello', 'content': 'World'})
+        post = Post.objects.get(title='Hello')
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader, post=post).exists())
+
+        response = self.client.get('/api/posts/feed/')
+        self.assertEqual([item['id'] for item in response.data['results']], [post.id])
+
+    @override_settings(FEED_MAX_ENTRIES=2)
+    def test_feed_is_trimmed_to_max_entries(self):
+        posts = [Post.objects.create(author=self.author, title=f"p{i}", content="x") for i in range(4)]
+        for post in posts:
+            fan_out_post(post)
+        self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(), 2)
+        self.assertEqual(get_feed(self.reader, limit=10), posts[:1:-1])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_high_fanout_author_is_pulled_at_read_time(self):
+        post = Post.objects.create(author=self.author, title="big", content="x")
+        self.assertEqual(fan_out_post(post), 0)
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(get_feed(self.reader, limit=10), [post])
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        other = User.objects.create_user(username="other", password="pass1234")
+        post = Post.objects.create(author=other, title="old", content="x")
+        self.reader.following.add(other)
+        self.assertEqual(get_feed(self.reader, limit=10), [post])
+        self.reader.following.remove(other)
+        self.assertEqual(get_feed(self.reader, limit=10), [])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class KeysetPaginationTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", password="pass1234")
+        self.reader = User.objects.create_user(username="reader", password="pass1234")
+        self.reader.following.add(self.author)
+        self.posts = [Post.objects.create(author=self.author, title=f"p{i}", content="x") for i in range(5)]
+        for post in self.posts:
+            fan_out_post(post)
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_post_list_walks_all_pages_newest_first(self):
+        expected = [post.id for post in reversed(self.posts)]
+        self.assertEqual(self.collect('/api/posts/posts/?page_size=2'), expected)
+
+    def test_feed_walks_all_pages_newest_first(self):
+        expected = [post.id for post in reversed(self.posts)]
+        self.assertEqual(self.collect('/api/posts/feed/?page_size=2'), expected)
+
+    def test_feed_pages_are_full_when_posts_are_on_both_sides(self):
+        other = User.objects.create_user(username="other", password="pass1234")
+        self.reader.following.add(other)
+        extra = [Post.objects.create(author=other, title=f"o{i}", content="x") for i in range(3)]
+        for post in extra:
+            fan_out_post(post)
+        # `author` is pulled as well now, so its posts come from both sides.
+        User.objects.filter(pk=self.author.pk).update(followers_count=2)
+        cache.clear()
+        with override_settings(FEED_FANOUT_MAX_FOLLOWERS=1):
+            for page_size in (1, 2, 3):
+                ids = self.collect(f'/api/posts/feed/?page_size={page_size}')
+                self.assertEqual(ids, [post.id for post in reversed(self.posts + extra)])
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get('/api/posts/posts/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PostCounterTestCase(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="pass1234")
+        self.reader = User.objects.create_user(username="reader", password="pass1234")
+        self.post = Post.objects.create(author=self.author, title="t", content="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def test_like_and_unlike_update_like_count(self):
+        # Liking your own post skips the notification path.
+        self.client.force_authenticate(self.author)
+        self.client.post(f'/api/posts/posts/{self.post.pk}/like/')
+        self.client.post(f'/api/posts/posts/{self.post.pk}/like/')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+        self.client.post(f'/api/posts/posts/{self.post.pk}/unlike/')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_comment_create_and_delete_update_comment_count(self):
+        response = self.client.post('/api/posts/comments/', {'post': self.post.pk, 'content': 'hi'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+        self.client.delete(f"/api/posts/comments/{response.data['id']}/")
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_comment_update_cannot_move_it_to_another_post(self):
+        other = Post.objects.create(author=self.author, title="other", content="x")
+        response = self.client.post('/api/posts/comments/', {'post': self.post.pk, 'content': 'hi'})
+        response = self.client.patch(f"/api/posts/comments/{response.data['id']}/", {'post': other.pk, 'content': 'edited'})
+        self.assertEqual((response.data['post'], response.data['content']), (self.post.pk, 'edited'))
+        self.post.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.post.comment_count, other.comment_count), (1, 0))
+
+    def test_recount_command_fixes_drift(self):
+        Like.objects.create(post=self.post, user=self.reader)
+        Comment.objects.create(post=self.post, author=self.reader, content="hi")
+        Post.objects.filter(pk=self.post.pk).update(like_count=7, comment_count=0)
+        call_command('recount_post_stats', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 1))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, LIKE_BUFFER_ENABLED=True, LIKE_BUFFER_MAX_PENDING=100, LIKE_BUFFER_FLUSH_SECONDS=60)
+class LikeBufferTestCase(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="pass1234")
+        self.post = Post.objects.create(author=self.author, title="t", content="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        self.addCleanup(like_buffer.flush)
+
+    def test_like_is_visible_to_the_user_before_flush(self):
+        self.client.post(f'/api/posts/posts/{self.post.pk}/like/')
+        self.assertFalse(Like.objects.exists())
+        self.assertTrue(like_buffer.has_liked(self.author.pk, self.post.pk))
+
+        response = self.client.post(f'/api/posts/posts/{self.post.pk}/like/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_flush_writes_deduplicated_intents_and_counts(self):
+        self.client.post(f'/api/posts/posts/{self.post.pk}/like/')
+        self.client.post(f'/api/posts/posts/{self.post.pk}/unlike/')
+        self.client.post(f'/api/posts/posts/{self.post.pk}/like/')
+        self.assertEqual(like_buffer.flush(), 1)
+
+        self.post.refresh_from_db()
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 1)
+        self.assertEqual(self.post.like_count, 1)
+
+    def test_unlike_is_flushed_as_a_delete(self):
+        Like.objects.create(post=self.post, user=self.author)
+        Post.objects.filter(pk=self.post.pk).update(like_count=1)
+        self.client.post(f'/api/posts/posts/{self.post.pk}/unlike/')
+        like_buffer.flush()
+
+        self.post.refresh_from_db()
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_like_inserted_by_another_writer_is_not_counted_twice(self):
+        self.client.post(f'/api/posts/posts/{self.post.pk}/like/')
+        bulk_create = Like.objects.bulk_create
+        def race(likes, **kwargs):
+            # An unbuffered like lands after the buffer checked for one.
+            Like.objects.create(post=self.post, user=self.author)
+            Post.objects.filter(pk=self.post.pk).update(like_count=F('like_count') + 1)
+            return bulk_create(likes, **kwargs)
+        with mock.patch.object(Like.objects, 'bulk_create', side_effect=race):
+            like_buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+    def test_failed_flush_keeps_the_intents(self):
+        self.client.post(f'/api/posts/posts/{self.post.pk}/like/')
+        with mock.patch.object(like_buffer, '_write', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                like_buffer.flush()
+        self.assertTrue(like_buffer.has_liked(self.author.pk, self.post.pk))
+
+        self.assertEqual(like_buffer.flush(), 1)
+        self.assertTrue(Like.objects.filter(post=self.post, user=self.author).exists())
+
+    @override_settings(LIKE_BUFFER_MAX_PENDING=1)
+    def test_full_buffer_is_flushed_on_the_timer_thread(self):
+        with mock.patch('posts.like_buffer.threading.Timer') as timer:
+            self.client.post(f'/api/posts/posts/{self.post.pk}/like/')
+        self.assertFalse(Like.objects.exists())
+        timer.assert_called_once_with(0, like_buffer._flush_from_timer)
+        timer.return_value.start.assert_called_once_with()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ConditionalGetTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", password="pass1234")
+        self.post = Post.objects.create(author=self.author, title="t", content="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def etag(self, url):
+        response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_unchanged_list_and_detail_return_304(self):
+        for url in ('/api/posts/posts/', f'/api/posts/posts/{self.post.pk}/'):
+            etag = self.etag(url)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT='application/json')
+            self.assertEqual(response.status_code, 304)
+
+    def test_edits_and_counter_updates_change_the_etag(self):
+        url = f'/api/posts/posts/{self.post.pk}/'
+        etag = self.etag(url)
+        self.client.patch(url, {'title': 'edited'}, format='json')
+        self.assertNotEqual(self.etag(url), etag)
+
+        etag = self.etag(url)
+        self.client.post(f'/api/posts/posts/{self.post.pk}/like/')
+        self.assertNotEqual(self.etag(url), etag)
+
+    def test_author_rename_changes_the_etag(self):
+        for url in ('/api/posts/posts/', f'/api/posts/posts/{self.post.pk}/'):
+            etag = self.etag(url)
+            self.author.username = f"renamed{len(url)}"
+            self.author.save()
+            self.assertNotEqual(self.etag(url), etag)
+
+    def test_list_etag_only_covers_the_page(self):
+        for i in range(4):
+            Post.objects.create(author=self.author, title=f"p{i}", content="x")
+        url = '/api/posts/posts/?page_size=2'
+        etag = self.etag(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('LIMIT 3', queries.captured_queries[-1]['sql'])
+
+        # Deleting a row in the middle pulls an older one onto the page.
+        middle = Post.objects.order_by('-created_at', '-pk')[1]
+        middle.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(middle.pk, [row['id'] for row in response.data['results']])
+        etag = response['ETag']
+
+        # An edit on another page leaves this one's ETag alone.
+        Post.objects.filter(pk=self.post.pk).update(title="edited", updated_at=Now())
+        self.assertEqual(self.etag(url), etag)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FastSerializerTestCase(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="pass1234")
+        self.post = Post.objects.create(author=self.author, title="t", content="x", like_count=2)
+        self.comment = Comment.objects.create(post=self.post, author=self.author, content="c")
+
+    def test_output_matches_model_serializers(self):
+        self.assertEqual(
+            PostFastSerializer.dump_rows(PostFastSerializer.values(Post.objects.all())),
+            PostSerializer(Post.objects.all(), many=True).data,
+        )
+        self.assertEqual(
+            PostFastSerializer.dump_objects(Post.objects.select_related('author')),
+            PostSerializer(Post.objects.all(), many=True).data,
+        )
+        self.assertEqual(
+            CommentFastSerializer.dump_rows(CommentFastSerializer.values(Comment.objects.all())),
+            CommentSerializer(Comment.objects.all(), many=True).data,
+        )
+
+    def test_list_endpoint_uses_fast_path(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.get('/api/posts/comments/')
+        self.assertEqual(response.json()['results'], CommentSerializer([self.comment], many=True).data)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class QueryPlanningTestCase(ConstantQueryCountMixin, TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="pass1234")
+        self.post = Post.objects.create(author=self.author, title="t", content="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def add_comments(self, count):
+        for _ in range(count):
+            commenter = User.objects.create_user(username=f"c{User.objects.count()}", password="pass1234")
+            post = Post.objects.create(author=commenter, title="p", content="x")
+            Comment.objects.create(post=post, author=commenter, content="c")
+
+    def test_list_endpoints_do_not_grow_with_page_size(self):
+        self.assertListQueriesConstant('/api/posts/comments/', self.add_comments)
+        self.assertListQueriesConstant('/api/posts/posts/', self.add_comments)
+
+    def test_planned_queryset_serializes_without_extra_queries(self):
+        self.add_comments(3)
+        comments = list(plan_queryset(Comment.objects.all(), CommentSerializer))
+        with self.assertNumQueries(0):
+            CommentSerializer(comments, many=True).data
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, REQUEST_SERVER_TIMING=True, REQUEST_BUDGETS={}, REQUEST_BUDGET_ACTION='raise')
+class RequestMetricsTestCase(TestCase):
+
+    def setUp(self):
+        request_stats.clear()
+        self.user = User.objects.create_user(username="reader", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_and_percentiles(self):
+        response = self.client.get('/api/posts/feed/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('render;dur=', response['Server-Timing'])
+
+        stats = request_stats.percentiles('feed')
+        self.assertEqual(stats['count'], 1)
+        self.assertEqual(stats['bytes']['p50'], len(response.content))
+
+    def test_route_over_budget_raises(self):
+        with override_settings(REQUEST_BUDGETS={'feed': {'queries': 0}}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/posts/feed/')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class InvertedIndexTestCase(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(SEARCH_INDEX_ENABLED=True, SEARCH_INDEX_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        post_index.reset()
+        self.addCleanup(post_index.reset)
+        self.author = User.objects.create_user(username="author", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def search(self, query):
+        response = self.client.get('/api/posts/posts/', {'search': query})
+        return [row['id'] for row in response.json()['results']]
+
+    def test_bm25_ranking_and_prefixes(self):
+        index = InvertedIndex()
+        index.add(1, [('notes', 3), ('django django tips', 1)])
+        index.add(2, [('django', 3), ('misc', 1)])
+        index.add(3, [('flask', 3), ('', 1)])
+        self.assertEqual(index.search('djan'), [2, 1])
+        self.assertEqual(index.search('django tips'), [1])
+        index.remove(1)
+        self.assertEqual(index.search('django'), [2])
+
+    def test_snapshot_round_trip(self):
+        index = InvertedIndex()
+        index.add(1, [('caching with redis', 1)])
+        index.add(2, [('redis streams', 1)])
+        path = f'{post_index.path}.test'
+        index.save(path)
+        loaded = InvertedIndex.load(path)
+        self.assertEqual(loaded.search('redis'), index.search('redis'))
+        loaded.remove(1)
+        loaded.add(3, [('redis', 1)])
+        self.assertEqual(sorted(loaded.search('redis')), [2, 3])
+
+    def test_search_filter_follows_signals(self):
+        post = Post.objects.create(author=self.author, title="Caching", content="memcached")
+        self.assertEqual(self.search('memcached'), [post.pk])
+
+        post.content = "redis"
+        post.save()
+        self.assertEqual(self.search('memcached'), [])
+        self.assertEqual(self.search('redis'), [post.pk])
+
+        post.delete()
+        self.assertEqual(self.search('redis'), [])
+
+    def test_workers_start_from_the_snapshot(self):
+        post = Post.objects.create(author=self.author, title="Snapshot", content="x")
+        post_index.rebuild()
+        post_index.reset()
+        Post.objects.filter(pk=post.pk).update(title="Renamed")
+        # Loaded from the file, not rebuilt from the (changed) table.
+        self.assertEqual(post_index.search('snapshot'), [post.pk])
+
+
+class IndexUsageTestCase(IndexUsageMixin, TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="pass1234")
+        self.other = User.objects.create_user(username="other", password="pass1234")
+        self.post = Post.objects.create(author=self.author, title="t", content="x")
+
+    def test_posts_by_author_newest_first(self):
+        index = 'posts_post_author_created_idx'
+        self.assertUsesIndex(Post.objects.filter(author=self.author).order_by('-created_at', '-id'), index)
+        # Several authors still search the index; SQLite merges them with a sort.
+        queryset = Post.objects.filter(author__in=[self.author, self.other]).order_by('-created_at')
+        self.assertUsesIndex(queryset, index, ordered=False)
+
+    def test_comments_of_a_post_in_order(self):
+        self.assertUsesIndex(
+            Comment.objects.filter(post=self.post).order_by('created_at'), 'posts_comment_post_created_idx'
+        )
+
+    def test_likes_in_both_directions(self):
+        self.assertUsesIndex(Like.objects.filter(user=self.other).values_list('post_id'), 'posts_like_user_post_idx')
+        self.assertUsesIndex(Like.objects.filter(post=self.post).values_list('user_id'), r'posts_like_post_id_\w+_uniq')
@@ -1,73 +1,103 @@
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.db.models.functions import Greatest, Now
 from django.shortcuts import render
 from rest_framework import viewsets, permissions
 from .models import Post, Comment
-from .serializers import CommentSerializer, PostSerializer
-from rest_framework import filters
+from .fast_serializers import FastListMixin
+from .serializers import CommentFastSerializer, CommentSerializer, PostFastSerializer, PostSerializer
 #  Classes to implementation feeds for post of this social media app.
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from .feed import fan_out_post, get_feed
+from .pagination import KeysetPagination
+from .query_planning import QueryPlanMixin
+from .conditional import ConditionalGetMixin
+from .filters import InvertedIndexSearchFilter
+from .search import post_index
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ConditionalGetMixin, QueryPlanMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Post.objects.all().order_by('-created_at')
     serializer_class = PostSerializer
+    fast_serializer_class = PostFastSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [InvertedIndexSearchFilter]
     search_fields = ['title', 'content']
+    search_index = post_index
+    # Posts render their author's username, so a rename must change the ETag.
+    etag_aggregates = {
+        'updated': Max('updated_at'),
+        'count': Count('pk'),
+        'authors_updated': Max('author__updated_at'),
+    }
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        # Push the new post into every follower's materialized feed.
+        fan_out_post(post)
         
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(QueryPlanMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Comment.objects.all().order_by('-created_at')
     serializer_class = CommentSerializer
+    fast_serializer_class = CommentFastSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        comment = serializer.save(author=self.request.user)
+        Post.objects.filter(pk=comment.post_id).update(comment_count=F('comment_count') + 1, updated_at=Now())
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        post_id = instance.post_id
+        instance.delete()
+        Post.objects.filter(pk=post_id).update(comment_count=Greatest(F('comment_count') - 1, 0), updated_at=Now())
         
 # --------------- #####################------------------------------#
 #  Classes for the implementation of feeds for post of this social media app.
 #----------------######################------------------------------#
 class FeedView(APIView):
     permission_classes = [IsAuthenticated]
-    
+    pagination_class = KeysetPagination
+
     def get(self, request):
-        following_users = request.user.following.all()
-        posts = Post.objects.filter(author__in=following_users).order_by('-created_at')
-        feed_data = [
-            {
-                "id": posts.id,
-                "author": posts.author.username,
-                "title": posts.title,
-                "content": posts.content,
-                "created_at": posts.created_at,
-            }
-            for post in posts
-        ]
-        return Response(feed_data)
+        # Read one keyset page of the materialized feed instead of joining
+        # over everyone the user follows.
+        paginator = self.pagination_class()
+        page_size = paginator.get_page_size(request)
+        posts = get_feed(request.user, limit=page_size + 1, before=paginator.decode_cursor(request))
+        posts = paginator.paginate_rows(posts, request, page_size)
+        feed_data = PostFastSerializer.dump_objects(posts)
+        return paginator.get_paginated_response(feed_data)
     
 # from django.shortcuts import get_object_or_404
 from .models import Post, Like
 from rest_framework import generics
-from notifications.models import Notification
+from notifications.writer import notify
+from .like_buffer import like_buffer
 
 class LikePostView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @transaction.atomic
     def post(self, request, pk):
         post = generics.get_object_or_404(Post, pk=pk)
+        if like_buffer.enabled:
+            # Queue the like; the buffer writes it (and the counter and
+            # notification) in bulk on its next flush.
+            if like_buffer.has_liked(request.user.pk, post.pk):
+                return Response({'message': 'you already liked this post.'}, status=400)
+            like_buffer.add(request.user.pk, post.pk, liked=True)
+            return Response({'message': 'Post liked successfuly!'})
+
         like, created = Like.objects.get_or_create(user=request.user, post=post)
         
         if created:
-            # create a notification for the post's author
-            if post.author != request.user:
-                Notification.objects.create(
-                    recipient=post.author,
-                    actor = request.user,
-                    verb='liked your post',
-                    target=post,
-                )
+            Post.objects.filter(pk=post.pk).update(like_count=F('like_count') + 1, updated_at=Now())
+            # Queue a notification for the post's author; the writer batches
+            # and coalesces them into one row per post.
+            notify(post.author, request.user, 'liked your post', post)
             return Response({'message': 'Post liked successfuly!'})
         else:
             return Response({'message': 'you already liked this post.'}, status=400)
@@ -75,12 +105,19 @@ class LikePostView(APIView):
 class UnlikePostView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @transaction.atomic
     def post(self, request, pk):
         post = generics.get_object_or_404(Post, pk=pk)
-        like = Like.objects.filter(user=request.user, post=post)
+        if like_buffer.enabled:
+            if not like_buffer.has_liked(request.user.pk, post.pk):
+                return Response({'message': 'You have not liked this post yet.'}, status=400)
+            like_buffer.add(request.user.pk, post.pk, liked=False)
+            return Response({'message': 'Post unliked successfully!'})
+
+        deleted, _ = Like.objects.filter(user=request.user, post=post).delete()
         
-        if like.exists():
-            like.delete()
+        if deleted:
+            Post.objects.filter(pk=post.pk).update(like_count=Greatest(F('like_count') - deleted, 0), updated_at=Now())
             return Response({'message': 'Post unliked successfully!'})
         else:
             return Response({'message': 'You have not liked this post yet.'}, status=400)
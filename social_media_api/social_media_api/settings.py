@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
+import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -41,10 +42,13 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'accounts',
     'rest_framework',
+    'rest_framework.authtoken',
     'posts',
+    'notifications',
 ]
 
 MIDDLEWARE = [
+    'social_media_api.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -130,16 +134,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'accounts.CustomUser'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
- 
-
-    }
-REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Keyset pagination on (created_at, id): no OFFSET scans and no COUNT(*).
+    'DEFAULT_PAGINATION_CLASS': 'posts.pagination.KeysetPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
         'rest_framework.filters.SearchFilter',
@@ -159,7 +160,61 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'fallback-secret-key')
 
-import os
-
 PORT = os.environ.get('PORT', '8000')  # Default to port 8000 if PORT is not in the environment
 
+# Token lookup cache (accounts.authentication): lifetime in the shared cache,
+# and how long and how many entries each process keeps in its own LRU. A
+# deleted token or deactivated user can outlive the change in other processes
+# for up to TOKEN_AUTH_LOCAL_SECONDS.
+TOKEN_AUTH_CACHE_SECONDS = 300
+TOKEN_AUTH_LOCAL_SECONDS = 10
+TOKEN_AUTH_LOCAL_MAX_ENTRIES = 10000
+
+# Lifetime of the cached following/follower id lists (accounts.graph).
+FOLLOW_GRAPH_CACHE_SECONDS = 60 * 60
+# "Who to follow" entries kept per user (accounts.recommendations); rebuilt by
+# the build_follow_suggestions command, which should be scheduled periodically.
+FOLLOW_SUGGESTIONS_PER_USER = 20
+
+# Home feed (posts.feed): entries kept per user, and the follower count above
+# which an author's posts are pulled at read time instead of fanned out on write.
+FEED_MAX_ENTRIES = 500
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+FEED_HIGH_FANOUT_CACHE_SECONDS = 300
+
+# Write-behind like buffer (posts.like_buffer): queue like/unlike intents per
+# process and flush them in bulk when this many are pending or after this delay.
+LIKE_BUFFER_ENABLED = False
+LIKE_BUFFER_MAX_PENDING = 500
+LIKE_BUFFER_FLUSH_SECONDS = 2.0
+
+# Notification writer (notifications.writer): events for the same
+# (recipient, verb, post) within this window are coalesced into one row, and
+# queued events are written in bulk when this many are pending or after this delay.
+NOTIFICATION_COALESCE_SECONDS = 3600
+NOTIFICATION_MAX_PENDING = 200
+NOTIFICATION_FLUSH_SECONDS = 1.0
+# Lifetime of the cached per-user unread counter (notifications.counters).
+NOTIFICATION_UNREAD_CACHE_SECONDS = 24 * 60 * 60
+# Notification stream (notifications.stream). Use CacheBroker with a shared
+# cache when the stream and the writer run in different processes.
+NOTIFICATION_STREAM_BROKER = 'notifications.stream.InProcessBroker'
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = 15
+NOTIFICATION_STREAM_MAX_SECONDS = 300
+
+# Request metrics (social_media_api.instrumentation): Server-Timing headers,
+# in-memory percentiles over the last REQUEST_METRICS_WINDOW requests per
+# route, and per-route budgets, e.g. {'feed': {'queries': 10, 'db_ms': 50}}.
+# REQUEST_BUDGET_ACTION is 'log' or 'raise'.
+REQUEST_SERVER_TIMING = DEBUG
+REQUEST_METRICS_WINDOW = 1000
+REQUEST_BUDGETS = {}
+REQUEST_BUDGET_ACTION = 'log'
+SLOW_QUERY_MS = 200
+
+# In-process inverted index for ?search= on PostViewSet (posts.inverted_index).
+# Off by default: each worker holds its own copy, and writes from other workers
+# appear after `manage.py build_search_index` refreshes the shared snapshot.
+SEARCH_INDEX_ENABLED = False
+SEARCH_INDEX_DIR = os.path.join(BASE_DIR, 'search_index')
+SEARCH_INDEX_MAX_RESULTS = 1000
@@ -21,5 +21,6 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
     path('api/posts/', include('posts.urls')),
+    path('api/', include('notifications.urls')),
 ]
 